@@ -0,0 +1,615 @@
+# -*- coding: utf-8 -*-
+"""Benchmarks for LDR Importer.
+
+Generates a synthetic LDraw library and models from 10 to 100,000 parts,
+then measures color parsing, model parsing throughput, peak memory,
+end-to-end import time, loading the flattened scene back, which must
+place every object like the import did, and building meshes shared by
+worker processes, which must match those built directly. Results are
+written as JSON so runs from different versions can be compared with
+--compare.
+
+Run the benchmarks inside Blender:
+
+    blender -b -P Testing/benchmark.py -- --output results.json
+
+or under a plain Python interpreter, where the headless bpy/mathutils
+stand-in in Testing/headless is used and Blender API calls are
+reported as call counts instead of being timed:
+
+    python Testing/benchmark.py --output results.json
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program; if not, write to the Free Software Foundation,
+Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+
+"""
+
+
+import os
+import sys
+import json
+import time
+import types
+import shutil
+import argparse
+import platform
+import tempfile
+import importlib
+import tracemalloc
+
+TESTING_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(TESTING_DIR)
+sys.path.insert(0, TESTING_DIR)
+
+import headless  # noqa
+import synthlib  # noqa
+
+# The name the add-on is loaded under
+PACKAGE = "io_scene_ldrimporter"
+
+DEFAULT_SIZES = (10, 100, 1000, 10000, 100000)
+QUICK_SIZES = (10, 100, 1000)
+
+# The meshes the worker processes share, inherited when they are forked
+_sharedMeshes = []
+
+
+def loadModule(name):
+    """Import an add-on module without running the add-on registration.
+
+    @param {String} name The module name relative to the add-on root.
+    @return {Module} The imported module.
+    """
+    if PACKAGE not in sys.modules:
+        package = types.ModuleType(PACKAGE)
+        package.__path__ = [ROOT_DIR]
+        sys.modules[PACKAGE] = package
+    return importlib.import_module("{0}.{1}".format(PACKAGE, name))
+
+
+def hasBlender():
+    """Check if the Blender Python modules are available.
+
+    @return {Boolean} True if bpy and mathutils can be imported.
+    """
+    try:
+        import bpy  # noqa
+        import mathutils  # noqa
+        return True
+    except ImportError:
+        return False
+
+
+def timeIt(func, repeat):
+    """Run a function several times and keep the fastest run.
+
+    @param {Function} func The function to time.
+    @param {Number} repeat The number of runs.
+    @return {Tuple} The fastest time in seconds and the last return value.
+    """
+    best, result = None, None
+    for _ in range(max(1, repeat)):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return (best, result)
+
+
+def peakMemory(func):
+    """Measure the peak Python memory allocated by a function.
+
+    @param {Function} func The function to measure.
+    @return {Number} The peak allocated memory in bytes.
+    """
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def benchColors(libPath, repeat):
+    """Time parsing the color definitions with and without the cache.
+
+    @param {String} libPath The synthetic library.
+    @param {Number} repeat The number of runs.
+    @return {List} The benchmark results.
+    """
+    ldcolors = loadModule("src.ldcolors")
+
+    def parse():
+        ldcolors.clearCache()
+        colors = ldcolors.Colors(libPath, False)
+        return len(colors.load())
+
+    def cached():
+        return len(ldcolors.Colors(libPath, False).load())
+
+    seconds, count = timeIt(parse, repeat)
+    cachedSeconds, _ = timeIt(cached, repeat)
+    return [
+        {"benchmark": "colors.parse", "colors": count,
+         "seconds": seconds, "colors_per_second": count / seconds},
+        {"benchmark": "colors.cached", "colors": count,
+         "seconds": cachedSeconds}
+    ]
+
+
+def setupParser(importer, libPath, modelPath):
+    """Prepare the importer globals the parser relies on.
+
+    @param {Module} importer The import_ldraw module.
+    @param {String} libPath The synthetic library.
+    @param {String} modelPath The model to parse.
+    """
+    importer.LinkParts = False
+    importer.fileName = modelPath
+    importer.modelDir = os.path.dirname(modelPath)
+    importer.library = loadModule("src.ldlibrary").Library(libPath)
+    importer.stats = loadModule("src.ldstats").ImportStats()
+    importer.flatCache.clear()
+
+
+def benchParse(libPath, modelPath, numParts, repeat):
+    """Time parsing a model without creating any Blender data.
+
+    @param {String} libPath The synthetic library.
+    @param {String} modelPath The model to parse.
+    @param {Number} numParts The number of parts in the model.
+    @param {Number} repeat The number of runs.
+    @return {Dictionary} The benchmark result.
+    """
+    import mathutils
+    importer = loadModule("import_ldraw")
+
+    def parse():
+        setupParser(importer, libPath, modelPath)
+        model, placements = importer.read_model(
+            modelPath, mathutils.Matrix.Identity(4))
+        for _ in importer.flatten_parts(placements):
+            pass
+        return importer.stats.get("triangles")
+
+    seconds, triangles = timeIt(parse, repeat)
+    return {
+        "benchmark": "parse", "parts": numParts,
+        "triangles": triangles, "seconds": seconds,
+        "parts_per_second": numParts / seconds,
+        "triangles_per_second": triangles / seconds,
+        "peak_memory": peakMemory(parse)
+    }
+
+
+class BenchImport:
+    """Stand in for the import operator when calling it from a script."""
+
+    class Prefs:
+        """Preferences that are never written."""
+
+        def setLDraw(self, ldPath):
+            """Ignore the LDraw installation."""
+            return True
+
+        def save(self, importOpts):
+            """Ignore the import options."""
+            return True
+
+        def getCacheDir(self):
+            """There is no cache folder."""
+            return None
+
+    def __init__(self, libPath, modelPath):
+        """Instance the class.
+
+        @param {String} libPath The synthetic library.
+        @param {String} modelPath The model to import.
+        """
+        self.filepath = modelPath
+        self.ldrawPath = libPath
+        self.importScale = 1.0
+        self.resPrims = "StandardRes"
+        self.cleanUpParts = False
+        self.altColors = False
+        self.addGaps = False
+        self.lsynthParts = False
+        self.linkParts = False
+        self.cacheColors = False
+        self.importReport = False
+        self.profileMemory = False
+        self.saveScene = False
+        self.updateExisting = False
+        self.modalImport = False
+        self.analyzeOnly = False
+        self.logLevel = "WARNING"
+        self.prefs = BenchImport.Prefs()
+        self.errors = []
+
+    def report(self, kind, message):
+        """Keep the messages the importer reports."""
+        self.errors.append(message)
+
+
+def resetScene():
+    """Start from an empty scene."""
+    if headless.isInstalled():
+        headless.reset()
+    else:
+        import bpy
+        bpy.ops.wm.read_homefile(use_empty=True)
+
+
+def benchImport(libPath, modelPath, numParts, repeat, memory=False):
+    """Time a complete import, including the creation of Blender data.
+
+    @param {String} libPath The synthetic library.
+    @param {String} modelPath The model to import.
+    @param {Number} numParts The number of parts in the model.
+    @param {Number} repeat The number of runs.
+    @param {Boolean} memory True to add a memory profile of the import.
+    @return {Dictionary} The benchmark result.
+    """
+    import bpy
+    importer = loadModule("import_ldraw")
+
+    def run():
+        resetScene()
+        operator = BenchImport(libPath, modelPath)
+        importer.LDRImporterOps.execute(operator, bpy.context)
+        if operator.errors:
+            raise RuntimeError(operator.errors[0])
+        return importer.stats.report()
+
+    seconds, report = timeIt(run, repeat)
+
+    # Profile memory in a separate run so the timings are not affected
+    if memory:
+        def profile():
+            resetScene()
+            operator = BenchImport(libPath, modelPath)
+            operator.profileMemory = True
+            importer.LDRImporterOps.execute(operator, bpy.context)
+            return importer.stats.report()["memory"]
+        memoryReport = profile()
+
+    result = {
+        "benchmark": "import", "parts": numParts, "seconds": seconds,
+        "parts_per_second": numParts / seconds,
+        "phases": report["phases"], "counters": report["counters"]
+    }
+
+    if memory:
+        result["memory"] = memoryReport
+
+    # Without Blender, show what the import asked Blender to do
+    if headless.isInstalled():
+        result["blender_api"] = headless.report()
+    return result
+
+
+def benchScene(libPath, modelPath, numParts, repeat):
+    """Time loading a flattened scene and check it matches the import.
+
+    The model is imported with linked parts and saved as a flattened
+    scene, then the scene is loaded back. Each object must end up with
+    the same world space box.
+
+    @param {String} libPath The synthetic library.
+    @param {String} modelPath The model to import.
+    @param {Number} numParts The number of parts in the model.
+    @param {Number} repeat The number of runs.
+    @return {!Dictionary} The benchmark result, None without NumPy.
+    @throws {RuntimeError} The loaded scene differs from the import.
+    """
+    import bpy
+    importer = loadModule("import_ldraw")
+    ldscene = loadModule("src.ldscene")
+    if not ldscene.SceneData.isAvailable():
+        return None
+
+    def run(path, saveScene):
+        resetScene()
+        operator = BenchImport(libPath, path)
+        operator.linkParts = True
+        operator.saveScene = saveScene
+        importer.LDRImporterOps.execute(operator, bpy.context)
+        if operator.errors:
+            raise RuntimeError(operator.errors[0])
+        return sorted((ob.name, tuple(round(value, 4) for value in bounds))
+                      for ob, bounds in importer.spatial.items())
+
+    imported = run(modelPath, True)
+    scenePath = "{0}{1}".format(os.path.splitext(modelPath)[0],
+                                ldscene.SCENE_EXT)
+    seconds, loaded = timeIt(lambda: run(scenePath, False), repeat)
+    if loaded != imported:
+        raise RuntimeError("{0} does not place the objects like {1}".format(
+                           scenePath, modelPath))
+
+    return {
+        "benchmark": "scene", "parts": numParts, "seconds": seconds,
+        "parts_per_second": numParts / seconds
+    }
+
+
+def shareMesh(index):
+    """Write a flattened mesh into shared memory, in a worker process.
+
+    @param {Number} index The mesh in `_sharedMeshes`.
+    @return {!Tuple} The descriptor of the shared mesh,
+                     None if it has no faces.
+    """
+    shared = loadModule("import_ldraw").share_mesh(_sharedMeshes[index])
+    if shared is None:
+        return None
+    descriptor = shared.descriptor
+    shared.close()
+    return descriptor
+
+
+def meshSummary(ob):
+    """Describe the mesh of an object to compare it with another.
+
+    Objects built twice from a part get numbered names,
+    which are left out.
+
+    @param {Object} ob The object.
+    @return {Tuple} The name, the vertex coordinates, the face corners,
+                    starts, sizes and material slots, and the materials.
+    """
+    arrays = []
+    for elements, attr, size in (
+            (ob.data.vertices, "co", 3), (ob.data.loops, "vertex_index", 1),
+            (ob.data.polygons, "loop_start", 1),
+            (ob.data.polygons, "loop_total", 1),
+            (ob.data.polygons, "material_index", 1)):
+        values = [0] * (len(elements) * size)
+        elements.foreach_get(attr, values)
+        arrays.append(values)
+    return (ob.name.split(".")[0], arrays[0], arrays[1:],
+            [mat.name for mat in ob.data.materials])
+
+
+def sameMeshes(expected, actual):
+    """Check that two lists of mesh summaries match.
+
+    Shared meshes store their coordinates as 32-bit floats.
+
+    @param {List} expected The summaries from `meshSummary`.
+    @param {List} actual The summaries to check.
+    @return {Boolean} True if they match.
+    """
+    if len(expected) != len(actual):
+        return False
+    for (name, coords, topology, mats), (name2, coords2, topology2,
+                                         mats2) in zip(expected, actual):
+        if (name, topology, mats) != (name2, topology2, mats2):
+            return False
+        if len(coords) != len(coords2) or any(
+                abs(a - b) > 1e-3 for a, b in zip(coords, coords2)):
+            return False
+    return True
+
+
+def benchShared(libPath, modelPath, numParts, repeat):
+    """Time building meshes that worker processes flattened.
+
+    The parts are shared by forked workers through shared memory,
+    then built in this process. Each mesh must match the one built
+    directly from the flattened part.
+
+    @param {String} libPath The synthetic library.
+    @param {String} modelPath The model to flatten.
+    @param {Number} numParts The number of parts in the model.
+    @param {Number} repeat The number of runs.
+    @return {!Dictionary} The benchmark result, None without shared
+                          memory or forked processes.
+    @throws {RuntimeError} A shared mesh differs from the flattened one.
+    """
+    import bpy
+    import mathutils
+    import multiprocessing
+    importer = loadModule("import_ldraw")
+    ldshared = loadModule("src.ldshared")
+    if not (ldshared.isAvailable() and
+            "fork" in multiprocessing.get_all_start_methods()):
+        return None
+
+    resetScene()
+    setupParser(importer, libPath, modelPath)
+    importer.objects = []
+    importer.spatial.clear()
+    colors = loadModule("src.ldcolors").Colors(libPath, False)
+    colors.load()
+    importer.ldMaterials = loadModule("src.ldmaterials").Materials(
+        colors, bpy.context.scene.render.engine)
+
+    model, placements = importer.read_model(
+        modelPath, mathutils.Matrix.Identity(4))
+    meshes = [mesh for mesh in
+              [model] + list(importer.flatten_parts(placements))
+              if mesh.faces]
+    materials = {}
+    importer.add_materials(set().union(
+        *(mesh.material_codes for mesh in meshes)), materials)
+    expected = [meshSummary(importer.build_mesh(mesh, materials))
+                for mesh in meshes]
+
+    def run():
+        with multiprocessing.get_context("fork").Pool() as pool:
+            descriptors = pool.map(shareMesh, range(len(meshes)))
+        return [meshSummary(importer.build_shared(descriptor, materials))
+                for descriptor in descriptors]
+
+    _sharedMeshes[:] = meshes
+    ldshared.prepare()
+    try:
+        seconds, actual = timeIt(run, repeat)
+    finally:
+        del _sharedMeshes[:]
+    if not sameMeshes(expected, actual):
+        raise RuntimeError("The meshes shared by the workers differ "
+                           "from the flattened meshes")
+
+    return {
+        "benchmark": "shared", "parts": numParts, "seconds": seconds,
+        "parts_per_second": numParts / seconds
+    }
+
+
+def runAll(args):
+    """Generate the synthetic data and run every benchmark.
+
+    @param {Namespace} args The command line arguments.
+    @return {Dictionary} The complete benchmark results.
+    """
+    workDir = args.workdir or tempfile.mkdtemp(prefix="ldr-bench-")
+    libPath = synthlib.makeLibrary(os.path.join(workDir, "ldraw"))
+    results = benchColors(libPath, args.repeat)
+
+    useHeadless = (args.headless or not args.no_headless) and (
+        headless.install(args.headless))
+    blender = hasBlender()
+    if not blender:
+        print("bpy and mathutils are not available, "
+              "only the color benchmarks were run")
+
+    for numParts in args.sizes:
+        if not blender:
+            break
+        modelPath = synthlib.makeModel(os.path.join(
+            workDir, "models", "bench-{0}.ldr".format(numParts)), numParts)
+        results.append(benchParse(libPath, modelPath, numParts,
+                                  args.repeat))
+        if not args.skip_import:
+            results.append(benchImport(libPath, modelPath, numParts,
+                                       args.repeat, args.memory))
+            for bench in (benchScene, benchShared):
+                result = bench(libPath, modelPath, numParts, args.repeat)
+                if result is not None:
+                    results.append(result)
+        print("Finished {0} parts".format(numParts))
+
+    if args.workdir is None:
+        shutil.rmtree(workDir, ignore_errors=True)
+
+    version = loadModule("__version__").version
+    return {
+        "version": ".".join(str(v) for v in version),
+        "headless": useHeadless,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "results": results
+    }
+
+
+def compare(baseline, current, threshold):
+    """Find benchmarks that became slower than a previous run.
+
+    @param {Dictionary} baseline The results of the previous run.
+    @param {Dictionary} current The results of this run.
+    @param {Number} threshold The allowed slowdown, 0.1 being 10%.
+    @return {List} A description of each regression.
+    """
+    def key(result):
+        return (result["benchmark"], result.get("parts"))
+
+    # Blender API calls are not timed by the stand-in,
+    # so headless runs are only comparable with each other
+    if baseline.get("headless") != current.get("headless"):
+        print("Warning: comparing a headless run with a Blender run")
+
+    previous = {key(result): result for result in baseline["results"]}
+    regressions = []
+    for result in current["results"]:
+        old = previous.get(key(result))
+        if old is None or old["seconds"] <= 0:
+            continue
+        change = result["seconds"] / old["seconds"] - 1
+        if change > threshold:
+            regressions.append("{0} ({1} parts): {2:.3f}s -> {3:.3f}s "
+                               "(+{4:.0%})".format(
+                                   result["benchmark"], result.get("parts"),
+                                   old["seconds"], result["seconds"],
+                                   change))
+    return regressions
+
+
+def parseArgs(argv):
+    """Read the command line arguments.
+
+    @param {List} argv The arguments, without those meant for Blender.
+    @return {Namespace} The parsed arguments.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--sizes", type=int, nargs="+",
+                        default=list(DEFAULT_SIZES),
+                        help="number of parts in each generated model")
+    parser.add_argument("--quick", action="store_true",
+                        help="only run models up to 1,000 parts")
+    parser.add_argument("--repeat", type=int, default=1,
+                        help="runs per benchmark, the fastest is kept")
+    parser.add_argument("--skip-import", action="store_true",
+                        help="do not run the end-to-end import")
+    parser.add_argument("--memory", action="store_true",
+                        help="add a tracemalloc profile of each import")
+    parser.add_argument("--headless", action="store_true",
+                        help="use the bpy stand-in even inside Blender")
+    parser.add_argument("--no-headless", action="store_true",
+                        help="never use the bpy stand-in")
+    parser.add_argument("--workdir",
+                        help="keep the generated library in this folder")
+    parser.add_argument("--output", help="write the results to this file")
+    parser.add_argument("--compare",
+                        help="results of a previous run to compare with")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="allowed slowdown when comparing (0.1 = 10%%)")
+    args = parser.parse_args(argv)
+    if args.quick:
+        args.sizes = list(QUICK_SIZES)
+    return args
+
+
+def main(argv):
+    """Run the benchmarks.
+
+    @param {List} argv The command line arguments.
+    @return {Number} 1 if a regression was found, 0 otherwise.
+    """
+    # Blender passes its own arguments before "--"
+    if "--" in argv:
+        argv = argv[argv.index("--") + 1:]
+    args = parseArgs(argv)
+    results = runAll(args)
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "wt", encoding="utf_8") as f:
+            f.write(output)
+    else:
+        print(output)
+
+    if args.compare:
+        with open(args.compare, "rt", encoding="utf_8") as f:
+            regressions = compare(json.load(f), results, args.threshold)
+        for regression in regressions:
+            print("Regression: {0}".format(regression))
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
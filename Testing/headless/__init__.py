@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""Headless stand-in for the Blender Python modules.
+
+Provides just enough of bpy, bpy_extras and mathutils (Blender 2.7x API)
+to run the complete LDR Importer pipeline under a plain Python
+interpreter. Every Blender API call is counted and the amount of
+data handed to Blender is recorded, so benchmarks and profiles show
+the cost of the Blender side as call counts.
+
+    import headless
+    headless.install()
+    ...
+    print(headless.report())
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program; if not, write to the Free Software Foundation,
+Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+
+"""
+
+
+import os
+import sys
+
+
+__all__ = ("install", "isInstalled", "report", "reset")
+
+HEADLESS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def isInstalled():
+    """Check if the stand-in modules are the ones in use.
+
+    @return {Boolean} True if bpy is the headless stand-in.
+    """
+    bpy = sys.modules.get("bpy")
+    return bpy is not None and getattr(bpy, "HEADLESS", False)
+
+
+def install(force=False):
+    """Make the stand-in modules importable as bpy and mathutils.
+
+    @param {Boolean} force Use the stand-in even inside Blender.
+    @return {Boolean} True if the stand-in is in use, False if the
+                      real Blender modules are available.
+    """
+    if not force:
+        try:
+            import bpy  # noqa
+            return isInstalled()
+        except ImportError:
+            pass
+
+    for name in ("bpy", "bpy_extras", "bpy_extras.io_utils", "mathutils"):
+        sys.modules.pop(name, None)
+    if HEADLESS_DIR not in sys.path:
+        sys.path.insert(0, HEADLESS_DIR)
+
+    import bpy  # noqa
+    return True
+
+
+def report():
+    """Summarize the Blender API usage recorded so far.
+
+    @return {Dictionary} The number of calls of each function and
+                         the amount of each kind of data.
+    """
+    import bpy
+    return {
+        "calls": dict(sorted(bpy.calls.items())),
+        "sizes": dict(sorted(bpy.sizes.items()))
+    }
+
+
+def reset():
+    """Forget the recorded calls and start from an empty file."""
+    import bpy
+    bpy.resetStats()
+    bpy.resetData()
@@ -0,0 +1,888 @@
+# -*- coding: utf-8 -*-
+"""Headless stand-in for the parts of bpy LDR Importer uses.
+
+Records every Blender API call and the amount of data handed to
+Blender, so the importer can be benchmarked and profiled under a
+plain Python interpreter. Follows the Blender 2.7x API.
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program; if not, write to the Free Software Foundation,
+Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+
+"""
+
+
+import copy
+from collections import Counter
+
+import mathutils
+
+
+# Number of calls of each Blender API function
+calls = Counter()
+
+# Amount of data handed to Blender, such as vertices and polygons
+sizes = Counter()
+
+# This is not Blender, but pretend to be a background instance
+HEADLESS = True
+
+
+def record(name, **amounts):
+    """Count a call to the Blender API.
+
+    @param {String} name The full name of the called function.
+    @param {Dictionary} amounts The amount of each kind of data passed.
+    """
+    calls[name] += 1
+    for kind, amount in amounts.items():
+        sizes[kind] += amount
+
+
+def resetStats():
+    """Forget all recorded calls and data sizes."""
+    calls.clear()
+    sizes.clear()
+
+
+class Struct:
+    """A plain structure accepting any attribute."""
+
+    def __init__(self, **attrs):
+        """Instance the class.
+
+        @param {Dictionary} attrs The initial attributes.
+        """
+        self.__dict__.update(attrs)
+
+
+class IDProperties:
+    """Custom properties, as available on every datablock."""
+
+    def __getitem__(self, key):
+        return self._props[key]
+
+    def __setitem__(self, key, value):
+        self._props[key] = value
+
+    def __delitem__(self, key):
+        del self._props[key]
+
+    def __contains__(self, key):
+        return key in self._props
+
+    def get(self, key, default=None):
+        """Get a custom property."""
+        return self._props.get(key, default)
+
+    def keys(self):
+        """Get the custom property names."""
+        return self._props.keys()
+
+
+class ID(IDProperties):
+    """A datablock stored in bpy.data."""
+
+    def __init__(self, collection, name):
+        """Instance the class.
+
+        @param {BlendDataCollection} collection The owning collection.
+        @param {String} name The requested name.
+        """
+        self._props = {}
+        self._collection = collection
+        self._name = collection.uniqueName(name)
+        self.users = 0
+        self.use_fake_user = False
+
+    @property
+    def name(self):
+        """The unique name of the datablock."""
+        return self._name
+
+    @name.setter
+    def name(self, value):
+        if value != self._name:
+            self._collection.rename(self, value)
+
+    def __repr__(self):
+        return "bpy.data.{0}['{1}']".format(self._collection.kind,
+                                            self._name)
+
+    def copy(self):
+        """Create a copy of the datablock."""
+        record("bpy.types.{0}.copy".format(type(self).__name__))
+        clone = copy.copy(self)
+        clone._props = copy.deepcopy(self._props)
+        clone._name = self._collection.uniqueName(self._name)
+        self._collection.add(clone)
+        return clone
+
+
+class BlendDataCollection:
+    """A collection of datablocks such as bpy.data.meshes."""
+
+    def __init__(self, kind, factory):
+        """Instance the class.
+
+        @param {String} kind The name of the collection.
+        @param {Function} factory Creates a new datablock.
+        """
+        self.kind = kind
+        self._factory = factory
+        self._items = {}
+
+    def uniqueName(self, name):
+        """Get a name not used in this collection, as Blender does.
+
+        @param {String} name The requested name.
+        @return {String} The name, numbered if already in use.
+        """
+        name = name[:63]
+        if name not in self._items:
+            return name
+        base = name.rsplit(".", 1)[0] if name[-4:-3] == "." else name
+        i = 1
+        while "{0}.{1:03}".format(base, i) in self._items:
+            i += 1
+        return "{0}.{1:03}".format(base, i)
+
+    def add(self, item):
+        """Store a datablock."""
+        self._items[item.name] = item
+
+    def rename(self, item, name):
+        """Change the name of a datablock."""
+        del self._items[item.name]
+        item._name = self.uniqueName(name)
+        self._items[item.name] = item
+
+    def new(self, name, *args):
+        """Create a new datablock."""
+        record("bpy.data.{0}.new".format(self.kind))
+        item = self._factory(self, name, *args)
+        self.add(item)
+        return item
+
+    def remove(self, item, do_unlink=True):
+        """Delete a datablock."""
+        record("bpy.data.{0}.remove".format(self.kind))
+        self._items.pop(item.name, None)
+
+    def get(self, name, default=None):
+        """Find a datablock by name."""
+        return self._items.get(name, default)
+
+    def clear(self):
+        """Delete every datablock."""
+        self._items.clear()
+
+    def __getitem__(self, key):
+        if isinstance(key, int):
+            return list(self._items.values())[key]
+        return self._items[key]
+
+    def __contains__(self, name):
+        return name in self._items
+
+    def __iter__(self):
+        return iter(list(self._items.values()))
+
+    def __len__(self):
+        return len(self._items)
+
+
+# ------------ Meshes ------------ #
+
+
+class Element:
+    """A single vertex, edge, loop or polygon."""
+
+    __slots__ = ("_owner", "index")
+
+    def __init__(self, owner, index):
+        object.__setattr__(self, "_owner", owner)
+        object.__setattr__(self, "index", index)
+
+    def __getattr__(self, attr):
+        return self._owner.getValue(self.index, attr)
+
+    def __setattr__(self, attr, value):
+        self._owner.setValue(self.index, attr, value)
+
+
+class ElementCollection:
+    """Mesh elements stored as one flat array per attribute."""
+
+    def __init__(self, kind, mesh, schema):
+        """Instance the class.
+
+        @param {String} kind The element type, such as "vertices".
+        @param {Mesh} mesh The owning mesh.
+        @param {Dictionary} schema The size and default of each attribute.
+        """
+        self.kind = kind
+        self._mesh = mesh
+        self._schema = schema
+        self._count = 0
+        self._data = {attr: [] for attr in schema}
+
+    def add(self, count):
+        """Add elements with default values."""
+        record("bpy.types.Mesh{0}.add".format(self.kind.title()),
+               **{self.kind: count})
+        self._count += count
+        for attr, (size, default) in self._schema.items():
+            self._data[attr].extend([default] * (count * size))
+
+    def foreach_set(self, attr, seq):
+        """Set an attribute of all elements from a flat sequence."""
+        size = self._schema[attr][0]
+        if len(seq) != self._count * size:
+            raise RuntimeError("internal error setting the array")
+        record("bpy.types.Mesh{0}.foreach_set".format(self.kind.title()),
+               **{"{0}.{1}".format(self.kind, attr): len(seq)})
+        self._data[attr] = list(seq)
+
+    def foreach_get(self, attr, seq):
+        """Read an attribute of all elements into a flat sequence."""
+        record("bpy.types.Mesh{0}.foreach_get".format(self.kind.title()))
+        seq[:] = self._data[attr]
+
+    def getValue(self, index, attr):
+        """Read an attribute of a single element."""
+        if attr == "vertices" and self.kind == "polygons":
+            start = self._data["loop_start"][index]
+            total = self._data["loop_total"][index]
+            loops = self._mesh.loops._data["vertex_index"]
+            return tuple(loops[start:start + total])
+        size = self._schema[attr][0]
+        values = self._data[attr]
+        if size == 1:
+            return values[index]
+        return tuple(values[index * size:(index + 1) * size])
+
+    def setValue(self, index, attr, value):
+        """Change an attribute of a single element."""
+        size = self._schema[attr][0]
+        if size == 1:
+            self._data[attr][index] = value
+        else:
+            self._data[attr][index * size:(index + 1) * size] = list(value)
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError("bpy_prop_collection index out of range")
+        return Element(self, index)
+
+    def __iter__(self):
+        return (Element(self, i) for i in range(self._count))
+
+
+class MeshMaterials:
+    """The material slots of a mesh."""
+
+    def __init__(self):
+        self._items = []
+
+    def append(self, material):
+        """Add a material slot."""
+        record("bpy.types.IDMaterials.append")
+        self._items.append(material)
+
+    def get(self, name, default=None):
+        """Find a material by name."""
+        for material in self._items:
+            if material is not None and material.name == name:
+                return material
+        return default
+
+    def find(self, name):
+        """Find the slot index of a material."""
+        for i, material in enumerate(self._items):
+            if material is not None and material.name == name:
+                return i
+        return -1
+
+    def __getitem__(self, index):
+        return self._items[index]
+
+    def __iter__(self):
+        return iter(self._items)
+
+    def __len__(self):
+        return len(self._items)
+
+
+class Mesh(ID):
+    """Mesh geometry."""
+
+    def __init__(self, collection, name):
+        super().__init__(collection, name)
+        self.vertices = ElementCollection("vertices", self, {
+            "co": (3, 0.0), "select": (1, False)})
+        self.edges = ElementCollection("edges", self, {
+            "vertices": (2, 0), "use_edge_sharp": (1, False),
+            "use_seam": (1, False)})
+        self.loops = ElementCollection("loops", self, {
+            "vertex_index": (1, 0)})
+        self.polygons = ElementCollection("polygons", self, {
+            "loop_start": (1, 0), "loop_total": (1, 0),
+            "material_index": (1, 0), "use_smooth": (1, False)})
+        self.materials = MeshMaterials()
+        self.use_auto_smooth = False
+        self.auto_smooth_angle = 0.523599
+        self.show_edge_sharp = False
+
+    def from_pydata(self, vertices, edges, faces):
+        """Fill the mesh from lists of vertices, edges and faces."""
+        record("bpy.types.Mesh.from_pydata", vertices=len(vertices),
+               polygons=len(faces))
+        self.vertices.add(len(vertices))
+        self.vertices.foreach_set("co", [c for v in vertices for c in v])
+
+        loops = [i for face in faces for i in face]
+        self.loops.add(len(loops))
+        self.loops.foreach_set("vertex_index", loops)
+
+        self.polygons.add(len(faces))
+        starts, start = [], 0
+        for face in faces:
+            starts.append(start)
+            start += len(face)
+        self.polygons.foreach_set("loop_start", starts)
+        self.polygons.foreach_set("loop_total", [len(f) for f in faces])
+
+        if edges:
+            self.edges.add(len(edges))
+            self.edges.foreach_set("vertices", [i for e in edges for i in e])
+        else:
+            self.update(calc_edges=True)
+
+    def update(self, calc_edges=False):
+        """Finish changes to the mesh, creating edges if requested."""
+        record("bpy.types.Mesh.update")
+        if not calc_edges and len(self.edges) > 0:
+            return
+
+        seen, pairs = set(), []
+        for poly in self.polygons:
+            verts = poly.vertices
+            for a, b in zip(verts, verts[1:] + verts[:1]):
+                key = (a, b) if a < b else (b, a)
+                if key not in seen:
+                    seen.add(key)
+                    pairs.extend(key)
+
+        self.edges = ElementCollection("edges", self, self.edges._schema)
+        self.edges.add(len(pairs) // 2)
+        self.edges.foreach_set("vertices", pairs)
+
+    def validate(self, verbose=False):
+        """Check the mesh, returning True if it had to be corrected."""
+        record("bpy.types.Mesh.validate")
+        return False
+
+    def bounds(self):
+        """Get the smallest and largest vertex coordinates."""
+        co = self.vertices._data["co"]
+        if not co:
+            return ((0.0, 0.0, 0.0), (0.0, 0.0, 0.0))
+        axes = (co[0::3], co[1::3], co[2::3])
+        return (tuple(min(a) for a in axes), tuple(max(a) for a in axes))
+
+
+# ------------ Materials ------------ #
+
+
+class Socket:
+    """A node input or output."""
+
+    def __init__(self, name, default_value=None):
+        self.name = name
+        self.default_value = default_value
+        self.links = []
+
+
+class Sockets:
+    """The inputs or outputs of a node."""
+
+    def __init__(self, names):
+        self._items = [Socket(name, 0.0) for name in names]
+
+    def __getitem__(self, key):
+        if isinstance(key, int):
+            return self._items[key]
+        for socket in self._items:
+            if socket.name == key:
+                return socket
+        raise KeyError(key)
+
+    def __iter__(self):
+        return iter(self._items)
+
+    def __len__(self):
+        return len(self._items)
+
+
+class Node:
+    """A shader node."""
+
+    # Inputs of the shader nodes the importer creates
+    INPUTS = ("Fac", "Color", "Roughness", "IOR", "Strength",
+              "Shader", "Shader", "Surface", "Volume", "Displacement")
+
+    def __init__(self, nodeType, name):
+        self.bl_idname = nodeType
+        self.type = nodeType
+        self.name = name
+        self.label = ""
+        self.location = (0, 0)
+        self.distribution = "BECKMANN"
+        self.inputs = Sockets(Node.INPUTS)
+        self.outputs = Sockets(("BSDF", "Shader", "Emission"))
+
+
+class Nodes:
+    """The nodes of a node tree."""
+
+    def __init__(self):
+        self._items = []
+
+    def new(self, nodeType):
+        """Create a node."""
+        record("bpy.types.Nodes.new", nodes=1)
+        names = {node.name for node in self._items}
+        name, i = nodeType, 1
+        while name in names:
+            name = "{0}.{1:03}".format(nodeType, i)
+            i += 1
+        node = Node(nodeType, name)
+        self._items.append(node)
+        return node
+
+    def remove(self, node):
+        """Delete a node."""
+        record("bpy.types.Nodes.remove")
+        self._items.remove(node)
+
+    def get(self, name, default=None):
+        """Find a node by name."""
+        for node in self._items:
+            if node.name == name:
+                return node
+        return default
+
+    def __iter__(self):
+        return iter(list(self._items))
+
+    def __len__(self):
+        return len(self._items)
+
+
+class Links:
+    """The links of a node tree."""
+
+    def __init__(self):
+        self._items = []
+
+    def new(self, output, input):
+        """Connect two sockets."""
+        record("bpy.types.NodeLinks.new")
+        link = Struct(from_socket=output, to_socket=input)
+        self._items.append(link)
+        return link
+
+    def __iter__(self):
+        return iter(self._items)
+
+    def __len__(self):
+        return len(self._items)
+
+
+class NodeTree:
+    """The shader nodes of a material."""
+
+    def __init__(self):
+        self.nodes = Nodes()
+        self.links = Links()
+        self.nodes.new("ShaderNodeBsdfDiffuse")
+        self.nodes.new("ShaderNodeOutputMaterial")
+
+
+class Material(ID):
+    """A material."""
+
+    def __init__(self, collection, name):
+        super().__init__(collection, name)
+        self.diffuse_color = (0.8, 0.8, 0.8)
+        self.node_tree = None
+        self.raytrace_mirror = Struct(use=False, reflect_factor=0.0)
+        self._use_nodes = False
+
+    @property
+    def use_nodes(self):
+        """True if the material uses a node tree."""
+        return self._use_nodes
+
+    @use_nodes.setter
+    def use_nodes(self, value):
+        self._use_nodes = value
+        if value and self.node_tree is None:
+            self.node_tree = NodeTree()
+
+    def copy(self):
+        """Create a copy of the material, including its node tree."""
+        clone = super().copy()
+        clone.raytrace_mirror = copy.copy(self.raytrace_mirror)
+        clone.node_tree = copy.deepcopy(self.node_tree)
+        return clone
+
+
+# ------------ Objects and scenes ------------ #
+
+
+class Modifiers:
+    """The modifiers of an object."""
+
+    def __init__(self):
+        self._items = []
+
+    def new(self, name, type):
+        """Add a modifier."""
+        record("bpy.types.ObjectModifiers.new")
+        modifier = Struct(name=name, type=type)
+        self._items.append(modifier)
+        return modifier
+
+    def __iter__(self):
+        return iter(self._items)
+
+    def __len__(self):
+        return len(self._items)
+
+
+class Object(ID):
+    """An object in the scene."""
+
+    def __init__(self, collection, name, objectData):
+        super().__init__(collection, name)
+        self.data = objectData
+        self.type = "MESH" if isinstance(objectData, Mesh) else "EMPTY"
+        self.matrix_world = mathutils.Matrix.Identity(4)
+        self.scale = mathutils.Vector((1.0, 1.0, 1.0))
+        self.select = False
+        self.hide = False
+        self.modifiers = Modifiers()
+
+    @property
+    def location(self):
+        """The translation of the object."""
+        return self.matrix_world.to_translation()
+
+    @location.setter
+    def location(self, value):
+        rows = [list(row) for row in self.matrix_world]
+        for i in range(3):
+            rows[i][3] = value[i]
+        self.matrix_world = mathutils.Matrix(rows)
+
+    @property
+    def material_slots(self):
+        """The material slots of the object's mesh."""
+        if self.type != "MESH":
+            return []
+        return [Struct(material=mat, name=mat.name if mat else "")
+                for mat in self.data.materials]
+
+    @property
+    def dimensions(self):
+        """The size of the object's bounding box."""
+        if self.type != "MESH":
+            return mathutils.Vector((0.0, 0.0, 0.0))
+        low, high = self.data.bounds()
+        return mathutils.Vector((high[i] - low[i]) * abs(self.scale[i])
+                                for i in range(3))
+
+
+class SceneObjects:
+    """The objects linked to a scene."""
+
+    def __init__(self):
+        self._items = []
+        self.active = None
+
+    def link(self, ob):
+        """Link an object to the scene."""
+        record("bpy.types.SceneObjects.link")
+        self._items.append(ob)
+        ob.users += 1
+
+    def unlink(self, ob):
+        """Unlink an object from the scene."""
+        record("bpy.types.SceneObjects.unlink")
+        self._items.remove(ob)
+        ob.users -= 1
+
+    def __iter__(self):
+        return iter(list(self._items))
+
+    def __len__(self):
+        return len(self._items)
+
+
+class Scene:
+    """A scene."""
+
+    def __init__(self):
+        self.objects = SceneObjects()
+        self.render = Struct(engine="BLENDER_RENDER")
+        self.cursor_location = (0.0, 0.0, 0.0)
+        self.frame_current = 1
+
+    def update(self):
+        """Update the scene after changes."""
+        record("bpy.types.Scene.update")
+
+
+class WindowManager:
+    """The window manager, used for progress reports and timers."""
+
+    def __init__(self):
+        self.progress = None
+        self.windows = []
+
+    def progress_begin(self, low, high):
+        """Start a progress report."""
+        record("bpy.types.WindowManager.progress_begin")
+        self.progress = low
+
+    def progress_update(self, value):
+        """Update a progress report."""
+        record("bpy.types.WindowManager.progress_update")
+        self.progress = value
+
+    def progress_end(self):
+        """Finish a progress report."""
+        record("bpy.types.WindowManager.progress_end")
+        self.progress = None
+
+    def event_timer_add(self, time_step, window=None):
+        """Create a timer."""
+        record("bpy.types.WindowManager.event_timer_add")
+        return Struct(time_step=time_step)
+
+    def event_timer_remove(self, timer):
+        """Remove a timer."""
+        record("bpy.types.WindowManager.event_timer_remove")
+
+    def modal_handler_add(self, operator):
+        """Run a modal operator."""
+        record("bpy.types.WindowManager.modal_handler_add")
+        return True
+
+    def fileselect_add(self, operator):
+        """Open the file browser."""
+        record("bpy.types.WindowManager.fileselect_add")
+
+
+class Context:
+    """The current Blender context."""
+
+    def __init__(self):
+        self.scene = Scene()
+        self.window_manager = WindowManager()
+        self.window = None
+        self.area = None
+
+    @property
+    def object(self):
+        """The active object."""
+        return self.scene.objects.active
+
+    @property
+    def selected_objects(self):
+        """The selected objects."""
+        return [ob for ob in self.scene.objects if ob.select]
+
+
+data = Struct(
+    meshes=BlendDataCollection("meshes", Mesh),
+    objects=BlendDataCollection("objects", Object),
+    materials=BlendDataCollection("materials", Material),
+    textures=BlendDataCollection("textures", ID),
+    filepath=""
+)
+context = Context()
+
+
+def resetData():
+    """Start from an empty file, like File > New."""
+    data.meshes.clear()
+    data.objects.clear()
+    data.materials.clear()
+    data.textures.clear()
+    context.scene = Scene()
+
+
+# ------------ Operators ------------ #
+
+
+def _selectAll(action="TOGGLE"):
+    for ob in context.scene.objects:
+        ob.select = action == "SELECT"
+
+
+def _readHomefile(use_empty=False, **kwargs):
+    resetData()
+
+
+# Operators that change the recorded data, the others are only counted
+_operators = {
+    "object.select_all": _selectAll,
+    "wm.read_homefile": _readHomefile
+}
+
+
+class _Operator:
+    """A callable bpy.ops operator."""
+
+    def __init__(self, name):
+        self._name = name
+
+    def __call__(self, *args, **kwargs):
+        record("bpy.ops.{0}".format(self._name))
+        func = _operators.get(self._name)
+        if func is not None:
+            func(**kwargs)
+        return {'FINISHED'}
+
+    def poll(self):
+        """Check if the operator can run."""
+        return True
+
+
+class _OperatorModule:
+    """An operator category such as bpy.ops.object."""
+
+    def __init__(self, name):
+        self._name = name
+
+    def __getattr__(self, name):
+        return _Operator("{0}.{1}".format(self._name, name))
+
+
+class _Ops:
+    """The bpy.ops namespace."""
+
+    def __getattr__(self, name):
+        return _OperatorModule(name)
+
+
+ops = _Ops()
+
+
+# ------------ Types, properties and registration ------------ #
+
+
+class _Menu:
+    """A menu other add-ons can extend."""
+
+    def __init__(self):
+        self.funcs = []
+
+    def append(self, func):
+        """Add a draw function."""
+        self.funcs.append(func)
+
+    def remove(self, func):
+        """Remove a draw function."""
+        self.funcs.remove(func)
+
+
+class OperatorProperties:
+    """The properties of an operator."""
+
+    def __init__(self, operator):
+        self.__operator = operator
+
+    def is_property_set(self, name):
+        """Check if a property was given rather than left to its default."""
+        return name in vars(self.__operator)
+
+
+class Operator:
+    """Base class of operators."""
+
+    bl_idname = ""
+    bl_label = ""
+    bl_options = set()
+
+    @property
+    def properties(self):
+        """The properties of the operator."""
+        return OperatorProperties(self)
+
+    def report(self, kind, message):
+        """Report a message to the user."""
+        record("bpy.types.Operator.report")
+        print("{0}: {1}".format(", ".join(sorted(kind)), message))
+
+
+types = Struct(
+    Operator=Operator,
+    Panel=object,
+    Menu=object,
+    PropertyGroup=object,
+    Mesh=Mesh,
+    Object=Object,
+    Material=Material,
+    INFO_MT_file_import=_Menu(),
+    INFO_MT_file_export=_Menu()
+)
+
+
+def _prop(default):
+    def makeProp(**kwargs):
+        return kwargs.get("default", default)
+    return makeProp
+
+
+props = Struct(
+    BoolProperty=_prop(False),
+    IntProperty=_prop(0),
+    FloatProperty=_prop(0.0),
+    StringProperty=_prop(""),
+    EnumProperty=_prop(""),
+    CollectionProperty=_prop(None),
+    PointerProperty=_prop(None)
+)
+
+utils = Struct(
+    register_module=lambda module: None,
+    unregister_module=lambda module: None,
+    register_class=lambda cls: None,
+    unregister_class=lambda cls: None
+)
+
+app = Struct(
+    version=(2, 79, 0),
+    version_string="2.79 (headless)",
+    background=True,
+    binary_path=""
+)
@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+"""Headless stand-in for bpy_extras.io_utils.
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program; if not, write to the Free Software Foundation,
+Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+
+"""
+
+
+import bpy
+
+
+class ImportHelper:
+    """Mix-in for operators that import a file."""
+
+    filepath = ""
+
+    def invoke(self, context, event):
+        """Open the file browser."""
+        context.window_manager.fileselect_add(self)
+        return {'RUNNING_MODAL'}
+
+
+class ExportHelper(ImportHelper):
+    """Mix-in for operators that export a file."""
+
+    check_extension = True
+
+
+__all__ = ("ImportHelper", "ExportHelper", "bpy")
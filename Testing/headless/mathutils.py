@@ -0,0 +1,279 @@
+# -*- coding: utf-8 -*-
+"""Headless stand-in for the parts of mathutils LDR Importer uses.
+
+Follows the Blender 2.7x API, where `*` multiplies matrices
+and vectors. Only meant for benchmarks and profiling.
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program; if not, write to the Free Software Foundation,
+Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+
+"""
+
+
+import math
+
+
+__all__ = ("Matrix", "Vector")
+
+
+class Vector:
+    """A 2D, 3D or 4D vector."""
+
+    __slots__ = ("_v",)
+
+    def __init__(self, values=(0.0, 0.0, 0.0)):
+        """Instance the class.
+
+        @param {Iterable} values The components of the vector.
+        """
+        self._v = [float(v) for v in values]
+
+    def __len__(self):
+        return len(self._v)
+
+    def __iter__(self):
+        return iter(self._v)
+
+    def __getitem__(self, i):
+        return self._v[i]
+
+    def __setitem__(self, i, value):
+        self._v[i] = float(value)
+
+    def __repr__(self):
+        return "Vector(({0}))".format(", ".join(
+            "{0:.4f}".format(v) for v in self._v))
+
+    def __eq__(self, other):
+        return list(self) == list(other)
+
+    def __add__(self, other):
+        return Vector(a + b for a, b in zip(self._v, other))
+
+    def __sub__(self, other):
+        return Vector(a - b for a, b in zip(self._v, other))
+
+    def __neg__(self):
+        return Vector(-a for a in self._v)
+
+    def __mul__(self, other):
+        if isinstance(other, (int, float)):
+            return Vector(a * other for a in self._v)
+        return NotImplemented
+
+    __rmul__ = __mul__
+
+    @property
+    def x(self):
+        """The first component."""
+        return self._v[0]
+
+    @x.setter
+    def x(self, value):
+        self._v[0] = float(value)
+
+    @property
+    def y(self):
+        """The second component."""
+        return self._v[1]
+
+    @y.setter
+    def y(self, value):
+        self._v[1] = float(value)
+
+    @property
+    def z(self):
+        """The third component."""
+        return self._v[2]
+
+    @z.setter
+    def z(self, value):
+        self._v[2] = float(value)
+
+    @property
+    def length(self):
+        """The length of the vector."""
+        return math.sqrt(sum(a * a for a in self._v))
+
+    def cross(self, other):
+        """Calculate the cross product with another 3D vector."""
+        a, b = self._v, other
+        return Vector((a[1] * b[2] - a[2] * b[1],
+                       a[2] * b[0] - a[0] * b[2],
+                       a[0] * b[1] - a[1] * b[0]))
+
+    def dot(self, other):
+        """Calculate the dot product with another vector."""
+        return sum(a * b for a, b in zip(self._v, other))
+
+    def normalized(self):
+        """Get a unit length copy of the vector."""
+        length = self.length
+        return Vector(self._v) if length == 0 else self * (1 / length)
+
+    def to_tuple(self, precision=-1):
+        """Get the components as a tuple."""
+        if precision == -1:
+            return tuple(self._v)
+        return tuple(round(v, precision) for v in self._v)
+
+    def copy(self):
+        """Get a copy of the vector."""
+        return Vector(self._v)
+
+
+class Matrix:
+    """A square matrix stored as rows."""
+
+    __slots__ = ("_rows",)
+
+    def __init__(self, rows=((1.0, 0.0, 0.0, 0.0), (0.0, 1.0, 0.0, 0.0),
+                             (0.0, 0.0, 1.0, 0.0), (0.0, 0.0, 0.0, 1.0))):
+        """Instance the class.
+
+        @param {Iterable} rows The rows of the matrix.
+        """
+        self._rows = [[float(v) for v in row] for row in rows]
+
+    @staticmethod
+    def Identity(size):
+        """Create an identity matrix."""
+        return Matrix([[1.0 if i == j else 0.0 for j in range(size)]
+                       for i in range(size)])
+
+    @staticmethod
+    def Rotation(angle, size, axis):
+        """Create a rotation matrix around X, Y or Z."""
+        c, s = math.cos(angle), math.sin(angle)
+        rot = {
+            "X": ((1, 0, 0), (0, c, -s), (0, s, c)),
+            "Y": ((c, 0, s), (0, 1, 0), (-s, 0, c)),
+            "Z": ((c, -s, 0), (s, c, 0), (0, 0, 1))
+        }[axis]
+        mat = Matrix.Identity(size)
+        for i in range(3):
+            for j in range(3):
+                mat._rows[i][j] = rot[i][j]
+        return mat
+
+    @staticmethod
+    def Scale(factor, size):
+        """Create a uniform scale matrix."""
+        mat = Matrix.Identity(size)
+        for i in range(min(size, 3)):
+            mat._rows[i][i] = float(factor)
+        return mat
+
+    @staticmethod
+    def Translation(vector):
+        """Create a translation matrix."""
+        mat = Matrix.Identity(4)
+        for i in range(3):
+            mat._rows[i][3] = float(vector[i])
+        return mat
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __iter__(self):
+        return (Vector(row) for row in self._rows)
+
+    def __getitem__(self, i):
+        return Vector(self._rows[i])
+
+    def __setitem__(self, i, values):
+        self._rows[i] = [float(v) for v in values]
+
+    def __repr__(self):
+        return "Matrix(({0}))".format(", ".join(
+            repr(tuple(row)) for row in self._rows))
+
+    def __eq__(self, other):
+        return [list(row) for row in self] == [list(row) for row in other]
+
+    def __mul__(self, other):
+        rows = self._rows
+        if isinstance(other, (int, float)):
+            return Matrix([[v * other for v in row] for row in rows])
+
+        if isinstance(other, Matrix):
+            cols = list(zip(*other._rows))
+            return Matrix([[sum(a * b for a, b in zip(row, col))
+                            for col in cols] for row in rows])
+
+        # A 3D vector is transformed as a point by a 4x4 matrix
+        vec = list(other)
+        if len(vec) == 3 and len(rows) == 4:
+            return Vector([row[0] * vec[0] + row[1] * vec[1] +
+                           row[2] * vec[2] + row[3] for row in rows[:3]])
+        return Vector([sum(a * b for a, b in zip(row, vec))
+                       for row in rows])
+
+    __rmul__ = __mul__
+
+    def copy(self):
+        """Get a copy of the matrix."""
+        return Matrix(self._rows)
+
+    def transposed(self):
+        """Get a transposed copy of the matrix."""
+        return Matrix(zip(*self._rows))
+
+    def determinant(self):
+        """Calculate the determinant of the upper 3x3 part."""
+        (a, b, c), (d, e, f), (g, h, i) = [row[:3] for row in self._rows[:3]]
+        return a * (e * i - f * h) - b * (d * i - f * g) + c * (d * h - e * g)
+
+    def inverted(self):
+        """Get the inverse of the matrix."""
+        size = len(self._rows)
+        rows = [row[:] + [1.0 if i == j else 0.0 for j in range(size)]
+                for i, row in enumerate(self._rows)]
+
+        # Gauss-Jordan elimination with partial pivoting
+        for col in range(size):
+            pivot = max(range(col, size), key=lambda r: abs(rows[r][col]))
+            if abs(rows[pivot][col]) < 1e-12:
+                raise ValueError("Matrix.inverted(): matrix is singular")
+            rows[col], rows[pivot] = rows[pivot], rows[col]
+
+            scale = rows[col][col]
+            rows[col] = [v / scale for v in rows[col]]
+            for r in range(size):
+                if r != col and rows[r][col] != 0:
+                    factor = rows[r][col]
+                    rows[r] = [a - factor * b
+                               for a, b in zip(rows[r], rows[col])]
+        return Matrix([row[size:] for row in rows])
+
+    def normalized(self):
+        """Get a copy with each axis of the 3x3 part at unit length."""
+        result = self.copy()
+        for col in range(3):
+            length = math.sqrt(sum(result._rows[row][col] ** 2
+                                   for row in range(3)))
+            if length != 0:
+                for row in range(3):
+                    result._rows[row][col] /= length
+        return result
+
+    def to_translation(self):
+        """Get the translation part of the matrix."""
+        return Vector(row[3] for row in self._rows[:3])
+
+    def to_scale(self):
+        """Get the scale of each axis of the matrix."""
+        return Vector(math.sqrt(sum(self._rows[row][col] ** 2
+                                    for row in range(3)))
+                      for col in range(3))
@@ -0,0 +1,314 @@
+# -*- coding: utf-8 -*-
+"""Synthetic LDraw library generator for LDR Importer benchmarks.
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program; if not, write to the Free Software Foundation,
+Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+
+"""
+
+
+import os
+import math
+import random
+
+
+__all__ = ("makeLibrary", "makeModel", "COLOR_CODES", "PART_NAMES")
+
+
+# Colors written to the synthetic LDConfig.ldr,
+# covering every attribute the color parser knows about
+COLORS = (
+    ("Black", 0, "#05131D", "#595959", ""),
+    ("Blue", 1, "#0055BF", "#333333", ""),
+    ("Green", 2, "#257A3E", "#333333", ""),
+    ("Dark_Turquoise", 3, "#00838F", "#333333", ""),
+    ("Red", 4, "#C91A09", "#333333", ""),
+    ("Dark_Pink", 5, "#C870A0", "#333333", ""),
+    ("Brown", 6, "#583927", "#1E1E1E", ""),
+    ("Light_Gray", 7, "#9BA19D", "#333333", ""),
+    ("Dark_Gray", 8, "#6D6E5C", "#333333", ""),
+    ("Yellow", 14, "#F2CD37", "#333333", ""),
+    ("White", 15, "#FFFFFF", "#333333", ""),
+    ("Main_Colour", 16, "#FFFF80", "#333333", ""),
+    ("Glow_In_Dark_Opaque", 21, "#E0FFB0", "#A4C2A4",
+     "ALPHA 250 LUMINANCE 15"),
+    ("Edge_Colour", 24, "#7F7F7F", "#333333", ""),
+    ("Trans_Clear", 47, "#FCFCFC", "#C3C3C3", "ALPHA 128"),
+    ("Trans_Red", 36, "#C91A09", "#880000", "ALPHA 128"),
+    ("Milky_White", 79, "#FFFFFF", "#C3C3C3", "ALPHA 240"),
+    ("Pearl_Light_Gray", 135, "#9CA3A8", "#333333", "PEARLESCENT"),
+    ("Chrome_Gold", 334, "#BBA53D", "#BBB23D", "CHROME"),
+    ("Metal_Blue", 137, "#5677BA", "#333333", "METAL"),
+    ("Rubber_Black", 256, "#212121", "#595959", "RUBBER"),
+    ("Glitter_Trans_Dark_Pink", 114, "#DF6695", "#9A2A66",
+     "ALPHA 128 MATERIAL GLITTER VALUE #923978 FRACTION 0.17 "
+     "VFRACTION 0.2 SIZE 1"),
+    ("Speckle_Black_Silver", 132, "#000000", "#898788",
+     "MATERIAL SPECKLE VALUE #898788 FRACTION 0.4 MINSIZE 1 MAXSIZE 3"),
+)
+
+# Additional plain colors so the table is as large as the official one
+EXTRA_COLORS = 180
+
+# Colors models are built from
+COLOR_CODES = tuple(color[1] for color in COLORS
+                    if color[1] not in (16, 24))
+
+# Bricks models are built from, as (width, length, height in plates)
+BRICKS = ((1, 1, 3), (1, 2, 3), (1, 4, 3), (2, 2, 3),
+          (2, 4, 3), (2, 4, 1), (1, 6, 1), (4, 4, 1))
+
+PART_NAMES = tuple("synth{0}x{1}x{2}.dat".format(*brick)
+                   for brick in BRICKS)
+
+# Segments used by each primitive resolution folder
+RESOLUTIONS = (("p", 16), (os.path.join("p", "48"), 48),
+               (os.path.join("p", "8"), 8))
+
+IDENTITY = "1 0 0 0 1 0 0 0 1"
+
+
+def header(title, name, partType):
+    """Create the header of an LDraw file.
+
+    @param {String} title The description of the file.
+    @param {String} name The file name.
+    @param {String} partType The !LDRAW_ORG part type.
+    @return {List} The header lines.
+    """
+    return [
+        "0 {0}".format(title),
+        "0 Name: {0}".format(name),
+        "0 Author: LDR Importer benchmark",
+        "0 !LDRAW_ORG {0}".format(partType),
+        "0 !LICENSE Redistributable under CCAL version 2.0",
+        "",
+        "0 BFC CERTIFY CCW",
+        ""
+    ]
+
+
+def num(value):
+    """Format a number the way LDraw files usually do.
+
+    @param {Number} value The number to format.
+    @return {String} The number without trailing zeros.
+    """
+    text = "{0:.4f}".format(value).rstrip("0").rstrip(".")
+    return "0" if text == "-0" else text
+
+
+def ref(color, x, y, z, matrix, name):
+    """Create a type 1 line.
+
+    @param {Number} color The color code.
+    @param {Number} x The X position.
+    @param {Number} y The Y position.
+    @param {Number} z The Z position.
+    @param {String} matrix The nine rotation and scale values.
+    @param {String} name The referenced file.
+    @return {String} The line.
+    """
+    return "1 {0} {1} {2} {3} {4} {5}".format(
+        color, num(x), num(y), num(z), matrix, name)
+
+
+def writeFile(path, lines):
+    """Write an LDraw file, creating its folder if required.
+
+    @param {String} path The file to write.
+    @param {List} lines The lines of the file.
+    """
+    folder = os.path.dirname(path)
+    if not os.path.exists(folder):
+        os.makedirs(folder)
+    with open(path, "wt", encoding="utf_8") as f:
+        f.write("\n".join(lines))
+        f.write("\n")
+
+
+def makeColors():
+    """Create the lines of LDConfig.ldr.
+
+    @return {List} The lines of the color definitions file.
+    """
+    lines = header("LDraw.org Configuration File", "LDConfig.ldr",
+                   "Configuration")
+    for name, code, value, edge, extra in COLORS:
+        lines.append("0 !COLOUR {0:<30} CODE {1:>3} VALUE {2} "
+                     "EDGE {3} {4}".format(name, code, value,
+                                           edge, extra).rstrip())
+
+    for i in range(EXTRA_COLORS):
+        lines.append("0 !COLOUR Synthetic_{0:<20} CODE {1:>3} "
+                     "VALUE #{2:06X} EDGE #333333".format(
+                         i, 400 + i, i * 0x010305))
+    return lines
+
+
+def makeCircle(segments):
+    """Create the points of a unit circle in the XZ plane.
+
+    @param {Number} segments The number of segments.
+    @return {List} The points of the circle.
+    """
+    points = []
+    for i in range(segments):
+        angle = 2 * math.pi * i / segments
+        points.append((math.cos(angle), 0, math.sin(angle)))
+    return points
+
+
+def makePrimitives(libPath):
+    """Write the circular primitives in every resolution.
+
+    @param {String} libPath The root of the synthetic library.
+    """
+    for folder, segments in RESOLUTIONS:
+        circle = makeCircle(segments)
+        pairs = list(zip(circle, circle[1:] + circle[:1]))
+
+        edge = header("Circle 1.0", "4-4edge.dat", "Primitive")
+        for a, b in pairs:
+            edge.append("2 24 {0} {1} {2} {3} {4} {5}".format(
+                *[num(v) for v in a + b]))
+
+        disc = header("Disc 1.0", "4-4disc.dat", "Primitive")
+        for a, b in pairs:
+            disc.append("3 16 0 0 0 {0} {1} {2} {3} {4} {5}".format(
+                *[num(v) for v in b + a]))
+
+        cyli = header("Cylinder 1.0", "4-4cyli.dat", "Primitive")
+        for a, b in pairs:
+            cyli.append("4 16 {0} {1} {2} {3} {4} {5} {6} {7} {8} "
+                        "{9} {10} {11}".format(*[num(v) for v in (
+                            a[0], 1, a[2], b[0], 1, b[2],
+                            b[0], 0, b[2], a[0], 0, a[2])]))
+            cyli.append("5 24 {0} 1 {1} {0} 0 {1} {2} 1 {3} "
+                        "{4} 1 {5}".format(*[num(v) for v in (
+                            a[0], a[2], b[0], b[2], -a[0], -a[2])]))
+
+        for name, lines in (("4-4edge.dat", edge), ("4-4disc.dat", disc),
+                            ("4-4cyli.dat", cyli)):
+            writeFile(os.path.join(libPath, folder, name), lines)
+
+    # Nested primitives: stud -> stud body -> circular primitives
+    studBody = header("Stud Body", "studbody.dat", "Primitive")
+    studBody.extend([
+        ref(16, 0, 0, 0, "6 0 0 0 1 0 0 0 6", "4-4edge.dat"),
+        ref(16, 0, -4, 0, "6 0 0 0 1 0 0 0 6", "4-4edge.dat"),
+        ref(16, 0, -4, 0, "6 0 0 0 4 0 0 0 6", "4-4cyli.dat"),
+    ])
+    stud = header("Stud", "stud.dat", "Primitive")
+    stud.extend([
+        ref(16, 0, 0, 0, IDENTITY, "studbody.dat"),
+        ref(16, 0, -4, 0, "6 0 0 0 1 0 0 0 6", "4-4disc.dat"),
+    ])
+    box = header("Box with 5 Faces", "box5.dat", "Primitive")
+    box.extend([
+        "4 16 1 1 1 -1 1 1 -1 1 -1 1 1 -1",
+        "4 16 1 1 1 1 0 1 -1 0 1 -1 1 1",
+        "4 16 -1 1 1 -1 0 1 -1 0 -1 -1 1 -1",
+        "4 16 -1 1 -1 -1 0 -1 1 0 -1 1 1 -1",
+        "4 16 1 1 -1 1 0 -1 1 0 1 1 1 1",
+        "2 24 1 1 1 -1 1 1",
+        "2 24 -1 1 1 -1 1 -1",
+        "2 24 -1 1 -1 1 1 -1",
+        "2 24 1 1 -1 1 1 1",
+    ])
+    for name, lines in (("studbody.dat", studBody), ("stud.dat", stud),
+                        ("box5.dat", box)):
+        writeFile(os.path.join(libPath, "p", name), lines)
+
+
+def makeBrick(libPath, width, length, height):
+    """Write a brick and its subpart.
+
+    @param {String} libPath The root of the synthetic library.
+    @param {Number} width The width of the brick in studs.
+    @param {Number} length The length of the brick in studs.
+    @param {Number} height The height of the brick in plates.
+    """
+    name = "synth{0}x{1}x{2}".format(width, length, height)
+    sizeX, sizeZ, sizeY = width * 10, length * 10, height * 8
+
+    # The underside tubes are kept in a subpart
+    sub = header("~Synthetic {0} Underside".format(name),
+                 "s\\{0}s01.dat".format(name), "Subpart")
+    for i in range(width - 1):
+        for j in range(length - 1):
+            sub.append(ref(16, (i + 1) * 20 - sizeX, sizeY, (j + 1) * 20 -
+                           sizeZ, "8 0 0 0 {0} 0 0 0 8".format(
+                               num(-sizeY + 4)), "4-4cyli.dat"))
+    writeFile(os.path.join(libPath, "parts", "s",
+                           "{0}s01.dat".format(name)), sub)
+
+    part = header("Synthetic Brick {0} x {1} x {2}".format(
+                  width, length, height), "{0}.dat".format(name), "Part")
+    part.append(ref(16, 0, sizeY, 0, "{0} 0 0 0 {1} 0 0 0 {2}".format(
+        sizeX, num(-sizeY), sizeZ), "box5.dat"))
+    part.append(ref(16, 0, 0, 0, IDENTITY, "s\\{0}s01.dat".format(name)))
+    for i in range(width):
+        for j in range(length):
+            part.append(ref(16, i * 20 - sizeX + 10, 0,
+                            j * 20 - sizeZ + 10, IDENTITY, "stud.dat"))
+    writeFile(os.path.join(libPath, "parts", "{0}.dat".format(name)), part)
+
+
+def makeLibrary(libPath):
+    """Write a complete synthetic LDraw library.
+
+    @param {String} libPath The root of the synthetic library.
+    @return {String} The root of the synthetic library.
+    """
+    writeFile(os.path.join(libPath, "LDConfig.ldr"), makeColors())
+    writeFile(os.path.join(libPath, "LDCfgalt.ldr"), makeColors())
+    makePrimitives(libPath)
+    for brick in BRICKS:
+        makeBrick(libPath, *brick)
+
+    modelsPath = os.path.join(libPath, "models")
+    if not os.path.exists(modelsPath):
+        os.makedirs(modelsPath)
+    return libPath
+
+
+def makeModel(path, numParts, seed=0, missing=0):
+    """Write a model made of randomly placed synthetic bricks.
+
+    @param {String} path The model file to write.
+    @param {Number} numParts The number of parts in the model.
+    @param {Number} seed The random seed, so models can be reproduced.
+    @param {Number} missing The number of references to a missing part.
+    @return {String} The model file.
+    """
+    rand = random.Random(seed)
+    rotations = (IDENTITY, "0 0 1 0 1 0 -1 0 0",
+                 "-1 0 0 0 1 0 0 0 -1", "0 0 -1 0 1 0 1 0 0")
+    side = max(1, int(math.ceil(numParts ** (1 / 3))))
+
+    lines = ["0 Synthetic model with {0} parts".format(numParts),
+             "0 Name: {0}".format(os.path.basename(path)),
+             "0 Author: LDR Importer benchmark", ""]
+    for i in range(numParts):
+        x, y, z = i % side, (i // side) % side, i // (side * side)
+        lines.append(ref(rand.choice(COLOR_CODES), x * 100, -y * 32,
+                         z * 100, rand.choice(rotations),
+                         rand.choice(PART_NAMES)))
+    for i in range(missing):
+        lines.append(ref(4, 0, 0, 0, IDENTITY, "missing{0}.dat".format(
+            i % 3)))
+
+    writeFile(path, lines)
+    return path
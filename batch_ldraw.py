@@ -0,0 +1,272 @@
+# -*- coding: utf-8 -*-
+"""LDR Importer GPLv2 license.
+
+Convert many LDraw models to .blend files in a background Blender.
+
+    blender -b -P batch_ldraw.py -- [options] models [models ...]
+
+Models may be files, folders or glob patterns, including
+flattened .ldscene.npz scenes. Each model is imported
+into a fresh scene and saved next to it, or in the --output folder.
+The library index, color definitions and parsed part files are
+shared by the whole batch.
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program; if not, write to the Free Software Foundation,
+Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+
+"""
+
+
+import os
+import sys
+import glob
+import json
+import time
+import argparse
+
+import bpy
+
+
+__all__ = ("BatchOptions", "convert", "findModels", "main")
+
+
+class BatchOptions:
+    """The import options of a batch, in place of the import operator."""
+
+    class Prefs:
+        """Keep caches in the preferences folder without saving options."""
+
+        def __init__(self, cacheDir):
+            """Instance the class.
+
+            @param {String} cacheDir The folder for the caches.
+            """
+            self.__cacheDir = cacheDir
+
+        def getCacheDir(self):
+            """Get the folder for the caches.
+
+            @return {String} The folder.
+            """
+            return self.__cacheDir
+
+    def __init__(self, ldrawPath, **options):
+        """Instance the class.
+
+        @param {String} ldrawPath The LDraw Parts Library.
+        @param {Dictionary} options Any import operator option,
+                                    such as importScale or resPrims.
+        """
+        self.filepath = ""
+        self.ldrawPath = ldrawPath
+        self.importScale = 1.0
+        self.resPrims = "StandardRes"
+        self.cleanUpParts = True
+        self.altColors = False
+        self.addGaps = False
+        self.lsynthParts = False
+        self.linkParts = False
+        self.cacheColors = True
+        self.importReport = False
+        self.profileMemory = False
+        self.saveScene = False
+        self.updateExisting = False
+        self.modalImport = False
+        self.analyzeOnly = False
+        self.logLevel = "WARNING"
+
+        for name, value in options.items():
+            if not hasattr(self, name):
+                raise TypeError("Unknown import option {0}".format(name))
+            setattr(self, name, value)
+
+        self.prefs = BatchOptions.Prefs(os.path.join(
+            os.path.dirname(os.path.abspath(__file__)), "prefs", "cache"))
+        self.errors = []
+
+    def report(self, kind, message):
+        """Keep the messages the importer reports.
+
+        @param {Set} kind The message type, such as {'ERROR'}.
+        @param {String} message The message.
+        """
+        self.errors.append(message)
+
+
+def findModels(patterns):
+    """Expand files, folders and glob patterns into a list of models.
+
+    @param {Iterable} patterns The files, folders or patterns.
+    @return {List} The .ldr, .dat and flattened scene files found,
+                   without duplicates.
+    """
+    from .src.ldscene import SCENE_EXT
+
+    models = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            matches = [os.path.join(pattern, name)
+                       for name in sorted(os.listdir(pattern))]
+        else:
+            matches = sorted(glob.glob(pattern)) or [pattern]
+
+        for model in matches:
+            isModel = (model[-4:].lower() in (".ldr", ".dat") or
+                       model.lower().endswith(SCENE_EXT))
+            if isModel and model not in models:
+                models.append(model)
+    return models
+
+
+def convert(models, options, outputDir=None, overwrite=True):
+    """Import each model into a fresh scene and save it as .blend.
+
+    @param {List} models The models to convert.
+    @param {BatchOptions} options The import options.
+    @param {!String} outputDir The folder for the .blend files,
+                               next to each model if not given.
+    @param {Boolean} overwrite False to skip models already converted.
+    @return {List} The models that could not be converted.
+    """
+    from .import_ldraw import import_model
+    from .src.ldconsole import Console
+    from .src.ldscene import SCENE_EXT
+
+    failed = []
+    start = time.perf_counter()
+    for i, model in enumerate(models, 1):
+        baseName = os.path.basename(model)
+        if baseName.lower().endswith(SCENE_EXT):
+            baseName = baseName[:-len(SCENE_EXT)]
+        blendName = "{0}.blend".format(os.path.splitext(baseName)[0])
+        blendFile = os.path.join(outputDir or os.path.dirname(model),
+                                 blendName)
+        if not overwrite and os.path.exists(blendFile):
+            continue
+
+        bpy.ops.wm.read_homefile(use_empty=True)
+        options.filepath = os.path.abspath(model)
+        options.errors = []
+
+        modelStart = time.perf_counter()
+        result = import_model(options, bpy.context, cacheParts=True)
+        if result != {'FINISHED'}:
+            failed.append(model)
+            Console.error("{0}: {1}".format(model, " ".join(options.errors)))
+            continue
+
+        bpy.ops.wm.save_as_mainfile(filepath=blendFile, check_existing=False)
+        print("[{0}/{1}] {2} ({3:.2f} s)".format(
+              i, len(models), blendFile, time.perf_counter() - modelStart))
+
+    print("Converted {0} of {1} models in {2:.2f} seconds".format(
+          len(models) - len(failed), len(models),
+          time.perf_counter() - start))
+    return failed
+
+
+def parseArgs(argv):
+    """Read the command line options.
+
+    @param {List} argv The arguments after Blender's `--`.
+    @return {Namespace} The options.
+    """
+    parser = argparse.ArgumentParser(
+        prog="blender -b -P batch_ldraw.py --",
+        description="Convert LDraw models to .blend files.")
+    parser.add_argument("models", nargs="+",
+                        help="model files, folders or glob patterns")
+    parser.add_argument("--ldraw", required=True,
+                        help="the LDraw Parts Library")
+    parser.add_argument("--output", help="the folder for the .blend files")
+    parser.add_argument("--scale", type=float, default=1.0,
+                        help="the import scale")
+    parser.add_argument("--prims", default="StandardRes",
+                        choices=("HighRes", "StandardRes", "LowRes"),
+                        help="the resolution of part primitives")
+    parser.add_argument("--no-cleanup", action="store_true",
+                        help="skip the model cleanup")
+    parser.add_argument("--alt-colors", action="store_true",
+                        help="use LDCfgalt.ldr for color definitions")
+    parser.add_argument("--gaps", action="store_true",
+                        help="add small spaces between each part")
+    parser.add_argument("--lsynth", action="store_true",
+                        help="use LSynth parts")
+    parser.add_argument("--link-parts", action="store_true",
+                        help="link identical parts by type and color")
+    parser.add_argument("--report", action="store_true",
+                        help="save an import report next to each model")
+    parser.add_argument("--save-scene", action="store_true",
+                        help="save a flattened scene next to each model")
+    parser.add_argument("--analyze", action="store_true",
+                        help="only print the estimated import cost as JSON")
+    parser.add_argument("--skip-existing", action="store_true",
+                        help="skip models already converted")
+    parser.add_argument("--log-level", default="WARNING",
+                        choices=("DEBUG", "INFO", "WARNING", "ERROR"),
+                        help="the least important messages shown")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """Run a batch conversion from the command line.
+
+    @param {!List} argv The arguments, Blender's arguments after `--`
+                        if not given.
+    @return {Number} The exit code, 1 if any model failed.
+    """
+    if argv is None:
+        argv = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else []
+    args = parseArgs(argv)
+
+    models = findModels(args.models)
+    if not models:
+        print("No .ldr or .dat models found")
+        return 1
+
+    # Estimate the imports without creating any Blender data
+    if args.analyze:
+        from .src.ldanalyze import analyze
+        print(json.dumps([analyze(model, args.ldraw, useLSynth=args.lsynth)
+                          for model in models], indent=2))
+        return 0
+
+    if args.output and not os.path.exists(args.output):
+        os.makedirs(args.output)
+
+    options = BatchOptions(
+        args.ldraw,
+        importScale=args.scale,
+        resPrims=args.prims,
+        cleanUpParts=not args.no_cleanup,
+        altColors=args.alt_colors,
+        addGaps=args.gaps,
+        lsynthParts=args.lsynth,
+        linkParts=args.link_parts,
+        importReport=args.report,
+        saveScene=args.save_scene,
+        logLevel=args.log_level
+    )
+    failed = convert(models, options, args.output, not args.skip_existing)
+    return 1 if failed else 0
+
+
+# Run as a script with `blender -b -P`, load the add-on as a package
+# so its relative imports work
+if __name__ == "__main__":
+    addonDir = os.path.dirname(os.path.abspath(__file__))
+    sys.path.insert(0, os.path.dirname(addonDir))
+    batch = __import__("{0}.batch_ldraw".format(
+        os.path.basename(addonDir)), fromlist=["main"])
+    sys.exit(batch.main())
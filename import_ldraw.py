@@ -19,273 +19,433 @@ Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
 
 
 import os
+import json
 import math
+import time
+import hashlib
 import mathutils
+import threading
 import traceback
 
 import bpy
 
 from bpy_extras.io_utils import ImportHelper
 
+from .src.ldarchive import isArchive
 from .src.ldcolors import Colors
+from .src.ldgeometry import (BfcState, parseTriangles, parseQuads,
+                             parseEdges, edgeKeys, sharpFlags)
 from .src.ldconsole import Console
+from .src.ldlibrary import Library, findLibrary, getLibrary, useLibrary
+from .src import ldmatrix
 from .src.ldmaterials import Materials
 from .src.ldprefs import Preferences
-from .src.extras import cleanup as Extra_Cleanup
-from .src.extras import gaps as Extra_Part_Gaps
-from .src.extras import linked_parts as Extra_Part_Linked
+from .src.ldspatial import SpatialIndex, boundsOf
+from .src.ldscene import SCENE_EXT, SceneData
+from .src.ldupdate import Reference, diffReferences
+from .src.ldstats import ImportStats
 
 # Global variables
 objects = []
-paths = []
+library = None
+modelDir = None
+ldColors = None
+ldMaterials = None
 
+# The scale of the import, recorded on its objects for updates
+modelScale = None
 
-class LDrawFile(object):
-    """Scans LDraw files."""
+# The names of the materials that existed before the import
+oldMaterials = set()
 
-    # FIXME: rewrite - Rewrite entire class (#35)
-    def __init__(self, context, filename, level, mat,
-                 colour=None, orientation=None):
+# The import running in the background, the import state is global
+# so no other import may start until it is done
+runningImport = None
+stats = ImportStats()
 
-        self.level = level
-        self.points = []
-        self.faces = []
-        self.material_index = []
-        self.subparts = []
-        self.submodels = []
-        self.part_count = 0
+# The preferences, read the first time the importer is used
+prefs = None
 
-        # Orientation matrix to handle orientation separately
-        # (top-level part only)
-        self.orientation = orientation
-        self.mat = mat
-        self.colour = colour
-        self.parse(filename)
+# The thread preparing the library while the file browser is open,
+# and the library prepared by each thread
+prewarmThread = None
+prewarmedLibraries = {}
 
-        # Deselect all objects before import.
-        # This prevents them from receiving any cleanup (if applicable).
-        bpy.ops.object.select_all(action='DESELECT')
+# The import options kept in the preferences, those shown in the
+# file browser, the hidden ones only apply to the call that sets them
+SAVED_OPTIONS = ("addGaps", "altColors", "cleanUpParts", "importScale",
+                 "linkParts", "lsynthParts", "resPrims")
 
-        if len(self.points) > 0 and len(self.faces) > 0:
-            mesh = bpy.data.meshes.new("LDrawMesh")
-            mesh.from_pydata(self.points, [], self.faces)
-            mesh.validate()
-            mesh.update()
+# The boxes of the objects created by the last import
+spatial = SpatialIndex()
 
-            for i, f in enumerate(mesh.polygons):
-                n = self.material_index[i]
+# The flattened geometry of each file read during an import
+flatCache = {}
 
-                # Get the material depending on the current render engine
-                material = ldMaterials.make(n)
 
-                if material is not None:
-                    if mesh.materials.get(material.name) is None:
-                        mesh.materials.append(material)
+class FlatGeometry(object):
+    """The geometry of a file and every file it places, in its own space.
 
-                    f.material_index = mesh.materials.find(material.name)
+    Faces of the inherited color (16) have no color code.
+    Edge lines are kept as pairs of points, those of conditional
+    lines too since they mark the edges that stay smooth.
+    Faces are wound counter-clockwise if the file and every file
+    it places are BFC certified. The parts that could not be found
+    are counted by name, once for each time they are placed.
+    The sharp flags of the mesh edges are kept for both windings,
+    which order the edges of the built meshes differently.
+    """
 
-            # Naming of objects: filename of .dat-file, without extension
-            self.ob = bpy.data.objects.new("LDrawObj", mesh)
-            self.ob.name = os.path.basename(filename)[:-4]
+    __slots__ = ("points", "faces", "codes", "triangles", "edges",
+                 "conditionals", "certified", "missing", "sharp_flags",
+                 "__sharp")
 
-            if LinkParts:  # noqa
-                # Set top-level part orientation using Blender's 'matrix_world'
-                self.ob.matrix_world = self.orientation.normalized()
+    def __init__(self):
+        """Instance the class."""
+        self.points = []
+        self.faces = []
+        self.codes = []
+        self.triangles = 0
+        self.edges = []
+        self.conditionals = []
+        self.certified = True
+        self.missing = {}
+        self.sharp_flags = {}
+        self.__sharp = None
+
+    @property
+    def sharp(self):
+        """The edges drawn by edge lines and not by conditional lines."""
+        if self.__sharp is None:
+            self.__sharp = (edgeKeys(self.edges) -
+                            edgeKeys(self.conditionals))
+        return self.__sharp
+
+    def add_lines(self, lines, clockwise=False):
+        """Add the triangle, quad, edge and conditional lines of a file.
+
+        The coordinates of each kind of line are converted in bulk,
+        lines without enough coordinates are skipped.
+
+        @param {List} lines The tokens of each line.
+        @param {Boolean} clockwise True if the faces are wound clockwise,
+                                   they are reversed.
+        """
+        self.edges.extend(parseEdges([line for line in lines if
+                                      line[0] == "2" and len(line) >= 8]))
+        self.conditionals.extend(parseEdges([
+            line for line in lines if line[0] == "5" and len(line) >= 14]))
+
+        tris = [line for line in lines if line[0] == "3" and len(line) >= 11]
+        quads = [line for line in lines if line[0] == "4" and len(line) >= 14]
+        for size, group, parse in ((3, tris, parseTriangles),
+                                   (4, quads, parseQuads)):
+            if not group:
+                continue
+
+            start = len(self.points)
+            self.points.extend(parse(group))
+            if clockwise:
+                self.faces.extend([list(range(i + size - 1, i - 1, -1))
+                                   for i in range(start, len(self.points),
+                                                  size)])
             else:
-                self.ob.location = (0, 0, 0)
-
-            objects.append(self.ob)
-
-            # Link object to scene
-            bpy.context.scene.objects.link(self.ob)
-
-        for i in self.subparts:
-            self.submodels.append(LDrawFile(context, i[0], i[1], i[2],
-                                            i[3], i[4]))
-
-    def parse_line(self, line):
-        """Harvest the information from each line."""
-        verts = []
-        color = line[1]
-
-        if color == '16':
-            color = self.colour
-
-        num_points = int((len(line) - 2) / 3)
-        for i in range(num_points):
-                self.points.append(
-                    (self.mat * mathutils.Vector((float(line[i * 3 + 2]),
-                     float(line[i * 3 + 3]), float(line[i * 3 + 4])))).
-                    to_tuple())
-                verts.append(len(self.points) - 1)
-        self.faces.append(verts)
-        self.material_index.append(color)
-
-    def parse_quad(self, line):
-        """Properly construct quads in each brick."""
-        color = line[1]
-        verts = []
-        num_points = 4
-        v = []
-
-        if color == '16':
-            color = self.colour
-
-        v.append(self.mat * mathutils.Vector((float(line[0 * 3 + 2]),
-                 float(line[0 * 3 + 3]), float(line[0 * 3 + 4]))))
-        v.append(self.mat * mathutils.Vector((float(line[1 * 3 + 2]),
-                 float(line[1 * 3 + 3]), float(line[1 * 3 + 4]))))
-        v.append(self.mat * mathutils.Vector((float(line[2 * 3 + 2]),
-                 float(line[2 * 3 + 3]), float(line[2 * 3 + 4]))))
-        v.append(self.mat * mathutils.Vector((float(line[3 * 3 + 2]),
-                 float(line[3 * 3 + 3]), float(line[3 * 3 + 4]))))
-
-        nA = (v[1] - v[0]).cross(v[2] - v[0])
-        nB = (v[2] - v[1]).cross(v[3] - v[1])
-
-        for i in range(num_points):
-            verts.append(len(self.points) + i)
-
-        if nA.dot(nB) < 0:
-            self.points.extend([v[0].to_tuple(), v[1].to_tuple(),
-                                v[3].to_tuple(), v[2].to_tuple()])
+                self.faces.extend([list(range(i, i + size)) for i in
+                                   range(start, len(self.points), size)])
+            self.codes.extend([None if line[1] == "16" else line[1]
+                               for line in group])
+        self.triangles += len(tris) + 2 * len(quads)
+
+    def add_bfc_lines(self, lines, bfc):
+        """Add the lines of a file once the files it places were added.
+
+        @param {List} lines The tokens of each face and edge line,
+                            in the winding they were read with.
+        @param {BfcState} bfc The BFC state at the end of the file.
+        """
+        clockwise = [line for line, cw in lines if cw]
+        self.add_lines([line for line, cw in lines if not cw])
+        self.add_lines(clockwise, True)
+        self.certified = self.certified and bfc.certifies(
+            any(line[0] in ("3", "4") for line, cw in lines))
+
+    def add_geometry(self, geometry, m, colour, invert=False):
+        """Add the geometry of a placed file.
+
+        Its faces are reversed if the placement mirrors them,
+        unless the file is also inverted.
+
+        @param {FlatGeometry} geometry The geometry of the file.
+        @param {Tuple} m The placement of the file.
+        @param {String} colour The color code of the type 1 line.
+        @param {Boolean} invert True if BFC INVERTNEXT preceded the line.
+        """
+        offset = len(self.points)
+        self.points.extend(ldmatrix.transformPoints(m, geometry.points))
+        self.edges.extend(ldmatrix.transformPoints(m, geometry.edges))
+        self.conditionals.extend(ldmatrix.transformPoints(
+            m, geometry.conditionals))
+        if invert != (ldmatrix.determinant(m) < 0):
+            self.faces.extend([[index + offset for index in reversed(face)]
+                               for face in geometry.faces])
         else:
-            self.points.extend([v[0].to_tuple(), v[1].to_tuple(),
-                                v[2].to_tuple(), v[3].to_tuple()])
-
-        self.faces.append(verts)
-        self.material_index.append(color)
-
-    def parse(self, filename):
-        """Construct tri's in each brick."""
-        # FIXME: rewrite - Rework function (#35)
-        subfiles = []
-
-        while True:
-            # Get the path to the part
-            filename = (filename if os.path.exists(filename)
-                        else locatePart(filename))
-
-            # The part does not exist
-            # TODO Do not halt on this condition (#11)
-            if filename is None:
-                return False
-
-            # Read the located part
-            with open(filename, "rt", encoding="utf_8") as f:
-                lines = f.readlines()
-
-            # Some models may not have headers or enough lines
-            # to support a header. Handle this case to avoid
-            # hitting an IndexError trying to extract the header line.
-            partTypeLine = ("" if len(lines) <= 3 else lines[3])
-
-            # Check the part header for top-level part status
-            is_top_part = is_top_level_part(partTypeLine)
-
-            # Linked parts relies on the flawed is_top_part logic (#112)
-            # TODO Correct linked parts to use proper logic
-            # and remove this kludge
-            if LinkParts:  # noqa
-                is_top_part = filename == fileName  # noqa
+            self.faces.extend([[index + offset for index in face]
+                               for face in geometry.faces])
+        self.certified = self.certified and geometry.certified
+        for partName, count in geometry.missing.items():
+            self.missing[partName] = self.missing.get(partName, 0) + count
+        if colour == "16":
+            self.codes.extend(geometry.codes)
+        else:
+            self.codes.extend([colour if code is None else code
+                               for code in geometry.codes])
+        self.triangles += geometry.triangles
+
+
+class FlatMesh(object):
+    """The geometry of one imported object, placed in world space."""
+
+    __slots__ = ("filename", "level", "placement", "colour",
+                 "orientation", "inverted", "geometry")
+
+    def __init__(self, filename, level, placement, colour=None,
+                 orientation=None, geometry=None, inverted=False):
+        """Instance the class.
+
+        @param {String} filename The file, located in the library.
+        @param {Number} level 0 for the model's own geometry,
+                              1 for a part it places.
+        @param {Tuple} placement The transform of the file to world space.
+        @param {!String} colour The color code inherited by the file.
+        @param {!Matrix} orientation The orientation of a linked part.
+        @param {!FlatGeometry} geometry The geometry of the file,
+                                        flattened if not given.
+        @param {Boolean} inverted True if BFC INVERTNEXT preceded
+                                  the line placing the file.
+        """
+        self.filename = filename
+        self.level = level
+        self.placement = placement
+        self.colour = colour
+        self.orientation = orientation
+        self.inverted = inverted
+        self.geometry = (geometry if geometry is not None
+                         else flatten_file(filename))
+
+    @property
+    def name(self):
+        """The object name, the file name without its extension."""
+        return os.path.basename(self.filename)[:-4]
+
+    @property
+    def points(self):
+        """The points in world space."""
+        return ldmatrix.transformPoints(self.placement, self.geometry.points)
+
+    @property
+    def mirrored(self):
+        """True if the faces are reversed to be wound in world space."""
+        return self.inverted != (ldmatrix.determinant(self.placement) < 0)
+
+    @property
+    def faces(self):
+        """The point indices of each face, in world space winding."""
+        if self.mirrored:
+            return [face[::-1] for face in self.geometry.faces]
+        return self.geometry.faces
+
+    @property
+    def material_index(self):
+        """The color code of each face, None if it has no color."""
+        return [self.colour if code is None else code
+                for code in self.geometry.codes]
+
+    @property
+    def material_codes(self):
+        """The color codes used by the faces, None if some have no color."""
+        codes = set(self.geometry.codes)
+        if None in codes:
+            codes.discard(None)
+            codes.add(self.colour)
+        return codes
+
+    @property
+    def matrix(self):
+        """The placement as a 4x4 matrix."""
+        return mathutils.Matrix(ldmatrix.toRows(self.placement))
+
+    @property
+    def world_matrix(self):
+        """The placement and the orientation of a linked part together."""
+        if self.orientation is None:
+            return self.matrix
+        return self.orientation.normalized() * self.matrix
+
+
+def find_file(filename):
+    """Find a file by its path or in the library.
+
+    @param {String} filename The file name, as written in a type 1 line.
+    @return {!String} The absolute path to the file if found.
+    """
+    return filename if library.exists(filename) else locatePart(filename)
 
-            self.part_count += 1
-            if self.part_count > 1 and self.level == 0:
-                self.subparts.append([filename, self.level + 1, self.mat,
-                                      self.colour, self.orientation])
-            else:
-                for retval in lines:
-                    tmpdate = retval.strip()
-                    if tmpdate != "":
-                        tmpdate = tmpdate.split()
-
-                        # Part content
-                        if tmpdate[0] == "1":
-                            new_file = tmpdate[14]
-                            (
-                                x, y, z, a, b, c,
-                                d, e, f, g, h, i
-                            ) = map(float, tmpdate[2:14])
-
-                            # Reset orientation of top-level part,
-                            # track original orientation
-                            # TODO Use corrected isPart logic
-                            if self.part_count == 1 and is_top_part and LinkParts:  # noqa
-                                mat_new = self.mat * mathutils.Matrix((
-                                    (1, 0, 0, 0),
-                                    (0, 1, 0, 0),
-                                    (0, 0, 1, 0),
-                                    (0, 0, 0, 1)
-                                ))
-                                orientation = self.mat * mathutils.Matrix((
-                                    (a, b, c, x),
-                                    (d, e, f, y),
-                                    (g, h, i, z),
-                                    (0, 0, 0, 1)
-                                )) * mathutils.Matrix.Rotation(
-                                    math.radians(90), 4, 'X')
-                            else:
-                                mat_new = self.mat * mathutils.Matrix((
-                                    (a, b, c, x),
-                                    (d, e, f, y),
-                                    (g, h, i, z),
-                                    (0, 0, 0, 1)
-                                ))
-                                orientation = None
-                            color = tmpdate[1]
-                            if color == '16':
-                                color = self.colour
-                            subfiles.append([new_file, mat_new, color])
-
-                            # When top-level part, save orientation separately
-                            # TODO Use corrected is_top_part logic
-                            if self.part_count == 1 and is_top_part:
-                                subfiles.append(['orientation',
-                                                 orientation, ''])
-
-                        # Triangle (tri)
-                        if tmpdate[0] == "3":
-                            self.parse_line(tmpdate)
-
-                        # Quadrilateral (quad)
-                        if tmpdate[0] == "4":
-                            self.parse_quad(tmpdate)
-
-            if len(subfiles) > 0:
-                subfile = subfiles.pop()
-                filename = subfile[0]
-                # When top-level brick orientation information found,
-                # save it in self.orientation
-                if filename == 'orientation':
-                    self.orientation = subfile[1]
-                    subfile = subfiles.pop()
-                    filename = subfile[0]
-                self.mat = subfile[1]
-                self.colour = subfile[2]
+
+def read_file(filename):
+    """Read a located file.
+
+    @param {String} filename The absolute path to the file.
+    @return {List} The tokens of each line.
+    """
+    tokenized, cached = library.read(filename, stats.phase)
+    stats.count("part cache hits" if cached else "files read")
+    return tokenized
+
+
+def flatten_file(filename):
+    """Get the geometry of a file and everything it places.
+
+    Files are walked with an explicit stack and each file is flattened
+    once per import, in its own space, then placed wherever it is used
+    with a single transform of its points.
+
+    @param {String} filename The absolute path to the file.
+    @return {FlatGeometry} The geometry of the file.
+    """
+    # The tokens of the files being read and the file each line places
+    pending = {}
+    stack = [filename]
+    while stack:
+        current = stack[-1]
+        if current in flatCache:
+            stack.pop()
+            continue
+
+        # Read the file, then flatten the files it places first
+        if current not in pending:
+            tokenized = read_file(current)
+            placed = [find_file(line[14]) if line and line[0] == "1"
+                      else None for line in tokenized]
+            pending[current] = (tokenized, placed)
+            stack.extend(child for child in reversed(placed)
+                         if child is not None and child not in flatCache and
+                         child not in pending)
+            continue
+
+        # Every placed file was flattened, or places itself and is skipped
+        stack.pop()
+        tokenized, placed = pending.pop(current)
+        with stats.phase("transforming"):
+            flatCache[current] = build_geometry(tokenized, placed)
+    return flatCache[filename]
+
+
+def build_geometry(tokenized, placed):
+    """Combine the lines of a file with the geometry of the files it places.
+
+    @param {List} tokenized The tokens of each line.
+    @param {List} placed The file placed by each line, None for
+                         other lines and parts that were not found.
+    @return {FlatGeometry} The geometry of the file.
+    """
+    geometry = FlatGeometry()
+    bfc = BfcState()
+    lines = []
+    for line, child in zip(tokenized, placed):
+        if not line:
+            continue
+
+        if line[0] == "0":
+            bfc.read(line)
+        elif line[0] != "1":
+            lines.append((line, bfc.clockwise))
+        else:
+            if child is None:
+                missing = geometry.missing
+                missing[line[14]] = missing.get(line[14], 0) + 1
+            elif child in flatCache:
+                geometry.add_geometry(flatCache[child],
+                                      ldmatrix.fromLine(line),
+                                      line[1], bfc.invertNext)
+            # Even a missing part uses up an INVERTNEXT
+            bfc.invertNext = False
+    geometry.add_bfc_lines(lines, bfc)
+    return geometry
+
+
+def read_model(filename, trix):
+    """Read the model file, without the parts it places.
+
+    @param {String} filename The model file.
+    @param {Matrix} trix The import rotation and scale.
+    @return {Tuple} The model's own geometry, and the file,
+                    placement, color, linked part orientation and
+                    inversion of each part it places, in file order.
+    """
+    toWorld = ldmatrix.fromRows(trix)
+    geometry = FlatGeometry()
+    bfc = BfcState()
+    placements = []
+    with stats.phase("transforming"):
+        lines = []
+        for line in read_file(filename):
+            if not line:
+                continue
+
+            if line[0] == "0":
+                bfc.read(line)
+                continue
+            if line[0] != "1":
+                lines.append((line, bfc.clockwise))
+                continue
+
+            # Linked parts are placed by their object, not their points
+            if LinkParts:  # noqa
+                placement = toWorld
+                orientation = trix * mathutils.Matrix(
+                    ldmatrix.toRows(ldmatrix.fromLine(line))) * \
+                    mathutils.Matrix.Rotation(math.radians(90), 4, 'X')
             else:
-                break
+                placement = ldmatrix.multiply(toWorld,
+                                              ldmatrix.fromLine(line))
+                orientation = None
+            placements.append((line[14], placement,
+                               None if line[1] == "16" else line[1],
+                               orientation, bfc.invertNext))
+            bfc.invertNext = False
+        geometry.add_bfc_lines(lines, bfc)
+
+    stats.count("triangles", geometry.triangles)
+    return (FlatMesh(filename, 0, toWorld, geometry=geometry), placements)
 
 
-def is_top_level_part(header_line):
-    """Check if the given part is a top level part.
+def flatten_parts(placements):
+    """Flatten each part the model places, one at a time.
 
-    @param {String} headerLine The header line stating the part level.
-    @return {Boolean} True if a top level part, False otherwise
-                      or the header does not specify.
+    @param {List} placements The parts from `read_model`.
+    @return {Generator} The FlatMesh of each part found.
     """
-    # Make sure the file has the spec'd META command
-    # If it does not, we cannot do easily determine the part type,
-    # so we will simply say it is not top level
-    header_line = header_line.lower().strip()
-    if header_line == "":
-        return False
+    for partName, placement, colour, orientation, inverted in placements:
+        filename = find_file(partName)
+        if filename is None:
+            tally_missing({partName: 1})
+            continue
 
-    header_line = header_line.split()
-    if header_line[0] != "0 !ldraw_org":
-        return False
+        mesh = FlatMesh(filename, 1, placement, colour, orientation,
+                        inverted=inverted)
+        tally_missing(mesh.geometry.missing)
+        stats.count("triangles", mesh.geometry.triangles)
+        yield mesh
 
-    # We can determine if this is top level or not
-    return header_line[2] in ("part", "unofficial_part")
+
+def tally_missing(missing):
+    """Count the references to parts that could not be found.
+
+    @param {Dictionary} missing The number of references of each part.
+    """
+    for partName, count in missing.items():
+        # Missing parts are often used many times, report each only once
+        Console.tally("Could not find part {0}", partName, count)
 
 
 def locatePart(partName):
@@ -294,68 +454,726 @@ def locatePart(partName):
     @param {String} partName The part to find.
     @return {!String} The absolute path to the part if found.
     """
-    # Use the OS's path separator to ensure the parts are found
-    partName = partName.replace("\\", os.path.sep)
+    with stats.phase("library lookup"):
+        return library.locate(partName, modelDir)
+
+
+def assign_materials(mesh, codes, materials):
+    """Add the materials to a mesh and set each face's material.
+
+    @param {Mesh} mesh The mesh.
+    @param {List} codes The color code of each face.
+    @param {Dictionary} materials The materials for each color code.
+    """
+    slots = {}
+    indices = []
+    for code in codes:
+        slot = slots.get(code)
+        if slot is None:
+            material = materials.get(code)
+            if material is None:
+                slot = 0
+            else:
+                mesh.materials.append(material)
+                slot = len(mesh.materials) - 1
+            slots[code] = slot
+        indices.append(slot)
+    mesh.polygons.foreach_set("material_index", indices)
+
+
+def link_object(name, points, faces, codes, materials, orientation=None):
+    """Create a mesh object and link it to the scene.
+
+    @param {String} name The object name.
+    @param {List} points The points in world space.
+    @param {List} faces The point indices of each face.
+    @param {List} codes The color code of each face.
+    @param {Dictionary} materials The materials for each color code.
+    @param {!Matrix} orientation The orientation of a linked part.
+    @return {Object} The created object.
+    """
+    with stats.phase("mesh building"):
+        mesh = bpy.data.meshes.new("LDrawMesh")
+        mesh.from_pydata(points, [], faces)
+        assign_materials(mesh, codes, materials)
+        mesh.validate()
+        mesh.update()
+    return add_object(name, mesh, boundsOf(points) if points else None,
+                      orientation)
+
+
+def add_object(name, mesh, bounds, orientation=None):
+    """Create the object of a mesh and link it to the scene.
+
+    @param {String} name The object name.
+    @param {Mesh} mesh The mesh.
+    @param {!Tuple} bounds The box around the points of the mesh.
+    @param {!Matrix} orientation The orientation of a linked part.
+    @return {Object} The created object.
+    """
+    ob = bpy.data.objects.new("LDrawObj", mesh)
+    ob.name = name
+
+    if LinkParts:  # noqa
+        # Set top-level part orientation using Blender's 'matrix_world'
+        ob.matrix_world = orientation.normalized()
+    else:
+        ob.location = (0, 0, 0)
+
+    objects.append(ob)
+    if bounds is not None:
+        spatial.add(ob, bounds, ldmatrix.fromRows(ob.matrix_world))
+    stats.count("objects")
+
+    # Link object to scene
+    bpy.context.scene.objects.link(ob)
+    return ob
+
+
+def load_scene(filepath, trix):
+    """Create the objects of a flattened scene without parsing LDraw files.
+
+    @param {String} filepath The scene file.
+    @param {Matrix} trix The import rotation and scale.
+    @return {Generator} The progress, from 0 to 1.
+    """
+    with stats.phase("scene loading"):
+        scene = SceneData.load(filepath)
+        toWorld = [list(row) for row in trix]
+
+    with stats.phase("material creation"):
+        codes = {code for geometry in scene.geometries
+                 for code in geometry[3]}
+        codes.update(instance[1] for instance in scene.instances)
+        codes.discard("16")
+        materials = ldMaterials.make_all(codes)
+    stats.checkpoint("materials")
+
+    bpy.ops.object.select_all(action='DESELECT')
+    for i, (name, points, faces, codes) in enumerate(
+            scene.iterInstances(toWorld), 1):
+        link_object(name, points, faces,
+                    [None if code == "16" else code for code in codes],
+                    materials, mathutils.Matrix.Identity(4))
+        yield i / len(scene.instances)
+    stats.checkpoint("meshes")
+
+
+def export_mesh(scene, mesh, toLDraw):
+    """Add a flattened mesh to a flattened scene.
+
+    The geometry is stored in part space, and placed
+    in LDraw space so any import scale can be used.
+
+    @param {SceneData} scene The scene to add to.
+    @param {FlatMesh} mesh The mesh.
+    @param {Matrix} toLDraw The inverse of the import rotation and scale.
+    """
+    geometry = mesh.geometry
+    if not geometry.faces:
+        return
+
+    # Every part of the same file shares its flattened geometry
+    with stats.phase("scene saving"):
+        if not scene.hasGeometry(geometry):
+            scene.addGeometry(geometry, mesh.name, geometry.points,
+                              geometry.faces, ["16" if code is None else code
+                                               for code in geometry.codes])
+        scene.add(geometry, mesh.colour, toLDraw * mesh.world_matrix)
+
+
+def save_scene(scene):
+    """Save the flattened result of an import next to the model.
+
+    @param {SceneData} scene The meshes added by `export_mesh`.
+    """
+    with stats.phase("scene saving"):
+        filepath = "{0}{1}".format(os.path.splitext(fileName)[0], SCENE_EXT)
+        scene.save(filepath)
+    Console.log("Flattened scene saved to\n{0}".format(filepath))
+
+
+def run_steps(steps):
+    """Run an import generator to the end.
+
+    @param {Generator} steps The import steps.
+    @return {*} The value the generator returned.
+    """
+    while True:
+        try:
+            next(steps)
+        except StopIteration as result:
+            return result.value
+
+
+def progress_steps(steps, start, end):
+    """Map the progress of part of the import to the whole import.
+
+    @param {Generator} steps The steps, yielding their progress from 0 to 1.
+    @param {Number} start The overall progress when the steps begin.
+    @param {Number} end The overall progress when the steps end.
+    @return {Generator} The overall progress.
+    """
+    for progress in steps:
+        yield start + (end - start) * progress
+
+
+def report_error(self, e):
+    """Log an error that stopped the import and report it to the user.
+
+    @param {Object} self The import operator.
+    @param {Exception} e The error.
+    """
+    Console.error("{0}\n{1}\n".format(
+        type(e).__name__, traceback.format_exc()))
+
+    Console.error("Reason: {0}.".format(
+        type(e).__name__))
+
+    self.report({'ERROR'}, '''File not imported ("{0}").
+Check the console logs for more information.'''.format(type(e).__name__))
+
+
+def remove_objects(context):
+    """Remove the objects created so far, such as when cancelled.
+
+    Their meshes and the materials created by the import
+    are removed too, once nothing else uses them.
+
+    @param {Context} context The context the objects were linked to.
+    """
+    meshes = {ob.data.name: ob.data for ob in objects if ob.data}
+    for ob in objects:
+        context.scene.objects.unlink(ob)
+        bpy.data.objects.remove(ob)
+    del objects[:]
+    spatial.clear()
+
+    for mesh in meshes.values():
+        if mesh.users == 0:
+            bpy.data.meshes.remove(mesh)
+    # Copy the materials first, removing them changes the collection
+    for mat in list(bpy.data.materials):
+        if mat.name not in oldMaterials and mat.users == 0:
+            bpy.data.materials.remove(mat)
+
+
+def apply_extras(scale):
+    """Run the selected additional import options on the objects.
+
+    @param {Number} scale The scale the model was imported at.
+    @return {Generator} The progress, from 0 to 1.
+    """
+    from .src.extras import cleanup as Extra_Cleanup
+    from .src.extras import gaps as Extra_Part_Gaps
+    from .src.extras import linked_parts as Extra_Part_Linked
+
+    for i, cur_obj in enumerate(objects, 1):
+        # The CleanUp import option was selected
+        if CleanUpOpt:  # noqa
+            with stats.phase("cleanup"):
+                Extra_Cleanup.main(cur_obj, LinkParts)  # noqa
+
+        if GapsOpt:  # noqa
+            with stats.phase("part gaps"):
+                Extra_Part_Gaps.main(cur_obj, scale,
+                                     spatial.dimensions(cur_obj))
+        yield i / len(objects)
+
+    # The link identical parts import option was selected
+    if LinkParts:  # noqa
+        with stats.phase("linked parts"):
+            Extra_Part_Linked.main(objects)
+
+
+def matrix_values(mat):
+    """Flatten a 4x4 matrix.
+
+    @param {Matrix} mat The matrix.
+    @return {List} The 16 values, by rows.
+    """
+    return [value for row in mat for value in row]
+
+
+def geometry_hash(tokenized):
+    """Identify the geometry a model file adds to its own object.
+
+    @param {List} tokenized The tokens of each line of the file.
+    @return {!String} The hash of the triangles and quads,
+                      None if the file has none.
+    """
+    lines = [" ".join(line) for line in tokenized
+             if line and line[0] in ("3", "4")]
+    if not lines:
+        return None
+    return hashlib.md5("\n".join(lines).encode("utf_8")).hexdigest()
+
+
+def model_reference(mesh, toLDraw):
+    """Describe where an imported file was placed.
+
+    The model's own geometry uses an empty part name
+    and the hash of its geometry as the color.
+
+    @param {FlatMesh} mesh The imported file.
+    @param {Matrix} toLDraw The inverse of the import rotation and scale.
+    @return {Reference} The placement of the file.
+    """
+    if mesh.level == 0:
+        return Reference("", geometry_hash(library.read(mesh.filename)[0]),
+                         matrix_values(mathutils.Matrix.Identity(4)))
+    return Reference(os.path.basename(mesh.filename).lower(),
+                     mesh.colour or "16",
+                     matrix_values(toLDraw * mesh.world_matrix))
+
+
+def tag_object(ob, ref):
+    """Record the placement of an object for later updates.
+
+    @param {Object} ob The imported object.
+    @param {Reference} ref The placement of the object.
+    """
+    ob["ldr_source"] = fileName
+    ob["ldr_scale"] = modelScale
+    ob["ldr_part"] = ref.part
+    ob["ldr_color"] = ref.color
+    ob["ldr_matrix"] = list(ref.matrix)
+
+
+def read_references(filename):
+    """Read the parts placed by a model file, without parsing them.
+
+    @param {String} filename The model file.
+    @return {List} The references of the model.
+    """
+    tokenized = library.read(filename)[0]
+    refs = []
+
+    rootHash = geometry_hash(tokenized)
+    if rootHash is not None:
+        refs.append(Reference("", rootHash,
+                              matrix_values(mathutils.Matrix.Identity(4)),
+                              filename))
+
+    for line in tokenized:
+        if len(line) < 15 or line[0] != "1":
+            continue
+
+        partFile = find_file(line[14])
+        if partFile is None:
+            tally_missing({line[14]: 1})
+            continue
+
+        x, y, z, a, b, c, d, e, f, g, h, i = map(float, line[2:14])
+        refs.append(Reference(os.path.basename(partFile).lower(), line[1],
+                              (a, b, c, x, d, e, f, y, g, h, i, z,
+                               0.0, 0.0, 0.0, 1.0), partFile))
+    return refs
+
+
+def placement_matrix(ref, trix):
+    """Get the world matrix of a reference.
+
+    @param {Reference} ref The reference.
+    @param {Matrix} trix The import rotation and scale.
+    @return {Matrix} The placement in world space.
+    """
+    values = list(ref.matrix)
+    return trix * mathutils.Matrix([values[i:i + 4] for i in range(0, 16, 4)])
+
+
+def add_reference(context, ref, donor, trix, materials):
+    """Create the object of a part added to the model.
+
+    @param {Context} context The context to import into.
+    @param {Reference} ref The added part.
+    @param {!Tuple} donor An object of the same part and color and
+                          its reference, whose mesh is reused.
+    @param {Matrix} trix The import rotation and scale.
+    @param {Dictionary} materials The materials for each color code,
+                                  those of new colors are added.
+    @return {!Object} The created object, None if the part has no faces.
+    """
+    # Copying the object shares its mesh and keeps its modifiers
+    if donor is not None:
+        donorOb, donorRef = donor
+        ob = donorOb.copy()
+        ob.matrix_world = (placement_matrix(ref, trix) *
+                           placement_matrix(donorRef, trix).inverted() *
+                           donorOb.matrix_world)
+        context.scene.objects.link(ob)
+        stats.count("meshes reused")
+        tag_object(ob, ref)
+        return ob
+
+    # The model's own geometry
+    if not ref.part:
+        mesh = read_model(fileName, trix)[0]
+    else:
+        mesh = FlatMesh(ref.item, 1,
+                        ldmatrix.fromRows(placement_matrix(ref, trix)),
+                        None if ref.color == "16" else ref.color)
+        tally_missing(mesh.geometry.missing)
+
+    add_materials(mesh.material_codes, materials)
+    ob = build_mesh(mesh, materials)
+    if ob is not None:
+        tag_object(ob, ref)
+    return ob
+
+
+def update_model(context, trix):
+    """Update the objects of a previous import of the model.
+
+    Only the parts added, removed or moved since the previous import
+    are changed, and added parts reuse the meshes of identical parts.
+    A model imported at another scale is imported again.
+
+    @param {Context} context The context to import into.
+    @param {Matrix} trix The import rotation and scale.
+    @return {Generator} The progress, from 0 to 1.
+    """
+    old = [Reference(ob["ldr_part"], ob["ldr_color"], ob["ldr_matrix"], ob)
+           for ob in context.scene.objects
+           if ob.get("ldr_source") == fileName]
+
+    # The parts are compared in LDraw space, those kept
+    # would stay at the previous scale
+    if any(ref.item.get("ldr_scale") != modelScale for ref in old):
+        for ref in old:
+            context.scene.objects.unlink(ref.item)
+            bpy.data.objects.remove(ref.item)
+        stats.count("objects removed", len(old))
+        old = []
+
+    # Nothing to update, import the whole model
+    if not old:
+        yield from build_model(context, trix)
+        return
+
+    with stats.phase("update diff"):
+        kept, moved, added, removed = diffReferences(
+            old, read_references(fileName))
+    stats.count("missing parts", Console.summarize())
+    stats.count("objects kept", len(kept))
+
+    bpy.ops.object.select_all(action='DESELECT')
+    materials = {}
+    donors = {}
+    for oldRef, newRef in kept + moved:
+        donors[newRef.key] = (oldRef.item, newRef)
+
+    for oldRef, newRef in moved:
+        ob = oldRef.item
+        ob.matrix_world = (placement_matrix(newRef, trix) *
+                           placement_matrix(oldRef, trix).inverted() *
+                           ob.matrix_world)
+        tag_object(ob, newRef)
+        stats.count("objects moved")
+
+    for oldRef in removed:
+        context.scene.objects.unlink(oldRef.item)
+        bpy.data.objects.remove(oldRef.item)
+        stats.count("objects removed")
+
+    for i, ref in enumerate(added, 1):
+        ob = add_reference(context, ref, donors.get(ref.key), trix,
+                           materials)
+        if ob is not None:
+            donors.setdefault(ref.key, (ob, ref))
+            stats.count("objects added")
+        yield i / len(added)
+    stats.checkpoint("meshes")
+
+
+def mark_sharp_edges(mesh, geometry, mirrored=False):
+    """Mark the mesh edges drawn by edge lines as sharp.
+
+    Auto smooth then splits the normals at those edges only.
+    The edges are only matched once for each winding of a geometry,
+    meshes built from the same faces have the same edges.
+
+    @param {Mesh} mesh The mesh built from the geometry.
+    @param {FlatGeometry} geometry The geometry, whose points
+                                   are the vertices of the mesh.
+    @param {Boolean} mirrored True if the faces of the mesh are reversed.
+    """
+    flags = geometry.sharp_flags.get(mirrored)
+    if flags is None or len(flags) != len(mesh.edges):
+        edgeVerts = [0] * (len(mesh.edges) * 2)
+        mesh.edges.foreach_get("vertices", edgeVerts)
+        flags = geometry.sharp_flags[mirrored] = sharpFlags(
+            geometry.points, edgeVerts, geometry.sharp)
+    if any(flags):
+        mesh.edges.foreach_set("use_edge_sharp", flags)
+        mesh.use_auto_smooth = True
+        mesh.auto_smooth_angle = math.pi
+        stats.count("sharp edges", sum(flags))
+
+
+def add_materials(codes, materials):
+    """Create the materials of the colors that have none yet.
+
+    @param {Iterable} codes The color codes, None for no color.
+    @param {Dictionary} materials The materials for each color code,
+                                  those of the new colors are added.
+    """
+    codes = set(codes).difference(materials)
+    codes.discard(None)
+    if codes:
+        with stats.phase("material creation"):
+            made = ldMaterials.make_all(codes)
+        materials.update((code, made.get(code)) for code in codes)
+
+
+def share_mesh(mesh):
+    """Write a flattened mesh into shared memory, in a worker process.
+
+    Shared memory is only imported when used, it needs Python 3.8.
+
+    @param {FlatMesh} mesh The mesh.
+    @return {!SharedMesh} The shared mesh, None if it has no faces
+                          or meshes cannot be shared.
+    """
+    from .src.ldshared import SharedMesh, isAvailable
+
+    if not mesh.faces or not isAvailable():
+        return None
+    return SharedMesh.create(mesh.name, mesh.points, mesh.faces,
+                             mesh.material_index, mesh.geometry.certified)
+
 
-    for path in paths:
-        # Find the part filename using the exact case in the file
-        fname = os.path.join(path, partName)
-        if os.path.exists(fname):
-            return fname
+def build_shared(descriptor, materials, orientation=None):
+    """Create the object of a mesh a worker wrote into shared memory.
+
+    The arrays are passed to Blender from the block without copying,
+    the block is freed once the mesh is built.
+
+    @param {Tuple} descriptor The `descriptor` of the SharedMesh.
+    @param {Dictionary} materials The materials for each color code,
+                                  those of new colors are added.
+    @param {!Matrix} orientation The orientation of a linked part.
+    @return {Object} The created object.
+    """
+    from .src.ldshared import SharedMesh
+
+    shared = SharedMesh.attach(descriptor)
+    try:
+        add_materials(shared.codes, materials)
+        with stats.phase("mesh building"):
+            mesh = bpy.data.meshes.new("LDrawMesh")
+            mesh.vertices.add(shared.vertexCount)
+            mesh.loops.add(shared.loopCount)
+            mesh.polygons.add(shared.faceCount)
+            for elements, attr, view in (
+                    (mesh.vertices, "co", shared.coords),
+                    (mesh.loops, "vertex_index", shared.loopVerts),
+                    (mesh.polygons, "loop_start", shared.loopStarts),
+                    (mesh.polygons, "loop_total", shared.loopTotals)):
+                with view:
+                    elements.foreach_set(attr, view)
+            mesh.update(calc_edges=True)
+            assign_shared_materials(mesh, shared, materials)
+            mesh.validate()
+    finally:
+        shared.close()
+        shared.unlink()
 
-        # Because case-sensitive file systems, if the first check fails
-        # check again using a normalized part filename
-        # See #112#issuecomment-136719763
+    if shared.certified:
+        mesh["ldr_bfc"] = True
+    return add_object(shared.name, mesh, shared.bounds, orientation)
+
+
+def assign_shared_materials(mesh, shared, materials):
+    """Add the materials to a mesh built from shared memory.
+
+    @param {Mesh} mesh The mesh.
+    @param {SharedMesh} shared The mesh arrays.
+    @param {Dictionary} materials The materials for each color code.
+    """
+    slots = []
+    for code in shared.codes:
+        material = materials.get(code)
+        if material is None:
+            slots.append(0)
         else:
-            fname = os.path.join(path, partName.lower())
-            if os.path.exists(fname):
-                return fname
+            mesh.materials.append(material)
+            slots.append(len(mesh.materials) - 1)
+
+    # Every color has its own slot, in the order of the color indices
+    with shared.faceColors as view:
+        if slots == list(range(len(slots))):
+            mesh.polygons.foreach_set("material_index", view)
+        else:
+            mesh.polygons.foreach_set("material_index",
+                                      [slots[index] for index in view])
+
+
+def build_mesh(mesh, materials, toLDraw=None):
+    """Create the object of a flattened mesh.
+
+    @param {FlatMesh} mesh The mesh.
+    @param {Dictionary} materials The materials for each color code,
+                                  see `add_materials`.
+    @param {!Matrix} toLDraw The inverse of the import rotation and
+                             scale, to record the placement of the
+                             object for later updates.
+    @return {!Object} The created object, None if the mesh has no faces.
+    """
+    if not mesh.faces:
+        return None
+
+    faceCodes = mesh.material_index
+
+    # Naming of objects: filename of .dat-file, without extension
+    ob = link_object(mesh.name, mesh.points, mesh.faces,
+                     faceCodes, materials, mesh.orientation)
+
+    # Consistently wound faces need no normal recalculation in the cleanup
+    if mesh.geometry.certified:
+        ob.data["ldr_bfc"] = True
+
+    # Authored edge lines replace the edge split of the cleanup
+    if mesh.geometry.sharp:
+        with stats.phase("sharp edges"):
+            mark_sharp_edges(ob.data, mesh.geometry, mesh.mirrored)
 
-    Console.log("Could not find part {0}".format(fname))
-    return None
+    if toLDraw is not None:
+        tag_object(ob, model_reference(mesh, toLDraw))
+    return ob
+
+
+def build_model(context, trix):
+    """Parse the model and create its objects.
+
+    Every part is flattened first so the materials of all the colors
+    are created in one batch. Parts share the flattened geometry of
+    their file, their points are only placed when their object is built.
+
+    @param {Context} context The context to import into.
+    @param {Matrix} trix The import rotation and scale.
+    @return {Generator} The progress, from 0 to 1.
+    """
+    model, placements = read_model(fileName, trix)
+    stats.checkpoint("reading")
+    toLDraw = trix.inverted()
+    materials = {}
+
+    scene = None
+    if SaveSceneOpt:  # noqa
+        if SceneData.isAvailable():
+            scene = SceneData()
+        else:
+            Console.warn("NumPy is required to save flattened scenes")
+
+    # Deselect all objects before import.
+    # This prevents them from receiving any cleanup (if applicable).
+    bpy.ops.object.select_all(action='DESELECT')
+
+    total = len(placements) + 1
+    meshes = [model]
+    for mesh in flatten_parts(placements):
+        meshes.append(mesh)
+        yield len(meshes) / total / 2
+    stats.checkpoint("flattening")
+
+    add_materials(set().union(*(mesh.material_codes for mesh in meshes)),
+                  materials)
+    stats.checkpoint("materials")
+
+    for i, mesh in enumerate(meshes, 1):
+        build_mesh(mesh, materials, toLDraw)
+        if scene is not None:
+            export_mesh(scene, mesh, toLDraw)
+        yield 0.5 + i / len(meshes) / 2
+    stats.checkpoint("meshes")
+    stats.count("missing parts", Console.summarize())
+
+    if scene is not None:
+        save_scene(scene)
+
+
+def model_steps(context, trix, isScene):
+    """Choose how the objects of the model are created.
+
+    @param {Context} context The context to import into.
+    @param {Matrix} trix The import rotation and scale.
+    @param {Boolean} isScene True if importing a flattened scene.
+    @return {Generator} The progress, from 0 to 1.
+    """
+    # Flattened scenes skip parsing the LDraw files
+    if isScene:
+        return load_scene(fileName, trix)
+
+    # Linked parts are placed differently, always import them again
+    if UpdateOpt and not LinkParts:  # noqa
+        return update_model(context, trix)
+    return build_model(context, trix)
 
 
 def create_model(self, context, scale):
-    """Create the actual model."""
+    """Create the actual model, one step at a time.
+
+    @param {Object} self The import options and model `filepath`.
+    @param {Context} context The context to import into.
+    @param {Number} scale The import scale.
+    @return {Generator} The progress, from 0 to 1, and at
+                        the end the import result.
+    """
     # FIXME: rewrite - Rewrite entire function (#35)
-    global objects
     global ldColors
     global ldMaterials
     global fileName
+    global modelDir
+    global modelScale
+    global stats
+    global oldMaterials
 
     fileName = self.filepath
+    modelScale = scale
+    oldMaterials = {mat.name for mat in bpy.data.materials}
+    # Objects from an import that failed are not part of this one
+    del objects[:]
+    flatCache.clear()
+    spatial.clear()
     # Attempt to get the directory the file came from
-    # and add it to the `paths` list
-    paths[0] = os.path.dirname(fileName)
+    # and search it before the library
+    modelDir = os.path.dirname(fileName)
     Console.log("Attempting to import {0}".format(fileName))
 
     # The file format as hinted to by
     # conventional file extensions is not supported.
     # Recommended: http://ghost.kirk.by/file-extensions-are-only-hints
-    if fileName[-4:].lower() not in (".ldr", ".dat"):
+    isScene = fileName.lower().endswith(SCENE_EXT)
+    if not isScene and fileName[-4:].lower() not in (".ldr", ".dat"):
 
-        Console.log('''ERROR: Reason: Invalid File Type
-Must be a .ldr or .dat''')
+        Console.error('''Reason: Invalid File Type
+Must be a .ldr, .dat or {0}'''.format(SCENE_EXT))
         self.report({'ERROR'}, '''Error: Invalid File Type
-Must be a .ldr or .dat''')
+Must be a .ldr, .dat or {0}'''.format(SCENE_EXT))
         return {'ERROR'}
 
     # It has the proper file extension, continue with the import
+    # and follow it until the end, however it ends
+    stats = ImportStats(ProfileMemoryOpt)  # noqa
+    finished = False
     try:
         # Rotate and scale the parts
         # Scale factor is divided by 25 so we can use whole number
         # scale factors in the UI. For reference,
         # the default scale 1 = 0.04 to Blender
+        # Only the axes are scaled so the matrix can be inverted
+        # to place and compare parts
         trix = mathutils.Matrix((
             (1.0,  0.0, 0.0, 0.0),  # noqa
             (0.0,  0.0, 1.0, 0.0),  # noqa
             (0.0, -1.0, 0.0, 0.0),
             (0.0,  0.0, 0.0, 1.0)  # noqa
-        )) * (scale / 25)
+        )) * mathutils.Matrix.Scale(scale / 25, 4)
 
         # If LDrawDir does not exist, stop the import
-        if not os.path.isdir(LDrawDir):  # noqa
-            Console.log(''''ERROR: Cannot find LDraw installation at
+        if not (os.path.isdir(LDrawDir) or isArchive(LDrawDir)):  # noqa
+            Console.error('''Cannot find LDraw installation at
 {0}'''.format(LDrawDir))  # noqa
             self.report({'ERROR'}, '''Cannot find LDraw installation at
 {0}'''.format(LDrawDir))  # noqa
@@ -363,23 +1181,21 @@ Must be a .ldr or .dat''')
 
         # Instance the colors module and
         # load the LDraw-defined color definitions
-        ldColors = Colors(LDrawDir, AltColorsOpt)  # noqa
-        ldColors.load()
+        with stats.phase("color loading"):
+            ldColors = Colors(LDrawDir, AltColorsOpt, ColorCacheDir)  # noqa
+            ldColors.load()
+        if ldColors.cacheHit:
+            stats.count("cache hits")
         ldMaterials = Materials(ldColors, context.scene.render.engine)
+        stats.checkpoint("colors")
 
-        LDrawFile(context, fileName, 0, trix)
+        yield 0.02
 
-        for cur_obj in objects:
-            # The CleanUp import option was selected
-            if CleanUpOpt:  # noqa
-                Extra_Cleanup.main(cur_obj, LinkParts)  # noqa
-
-            if GapsOpt:  # noqa
-                Extra_Part_Gaps.main(cur_obj, scale)
+        yield from progress_steps(model_steps(context, trix, isScene),
+                                  0.02, 0.9)
 
-        # The link identical parts import option was selected
-        if LinkParts:  # noqa
-            Extra_Part_Linked.main(objects)
+        yield from progress_steps(apply_extras(scale), 0.9, 1.0)
+        stats.checkpoint("extras")
 
         # Select all the mesh now that import is complete
         for cur_obj in objects:
@@ -387,25 +1203,241 @@ Must be a .ldr or .dat''')
 
         # Update the scene with the changes
         context.scene.update()
-        objects = []
+        del objects[:]
 
         # Always reset 3D cursor to <0,0,0> after import
         bpy.context.scene.cursor_location = (0.0, 0.0, 0.0)
 
         # Display success message
         Console.log("{0} successfully imported!".format(fileName))
+        finished = True
         return {'FINISHED'}
 
+    # The import was cancelled, do not leave a partial model
+    except GeneratorExit:
+        Console.log("Import cancelled, removing {0} objects".format(
+                    len(objects)))
+        remove_objects(context)
+        raise
+
+    # The objects already created stay in the scene
     except Exception as e:
-        Console.log("ERROR: {0}\n{1}\n".format(
-            type(e).__name__, traceback.format_exc()))
+        del objects[:]
+        report_error(self, e)
+        return {'CANCELLED'}
 
-        Console.log("ERROR: Reason: {0}.".format(
-            type(e).__name__))
+    # Stop following memory usage however the import ended,
+    # once the caches of the import were cleared
+    finally:
+        Console.summarize()
+        flatCache.clear()
+        stats.finish((FlatMesh, FlatGeometry), {
+            "objects": objects,
+            "ldMaterials": ldMaterials,
+            "library": library
+        })
+        if finished:
+            stats.log()
+            if ImportReportOpt:  # noqa
+                stats.save("{0}.import.json".format(
+                           os.path.splitext(fileName)[0]))
+
+
+def analyze_model(self):
+    """Estimate the cost of importing a model without importing it.
+
+    @param {Object} self The import options and model `filepath`.
+    @return {Set} {'FINISHED'}, or {'CANCELLED'} if the model
+                  could not be analyzed.
+    """
+    from .src.ldanalyze import analyze, logReport
 
-        self.report({'ERROR'}, '''File not imported ("{0}").
-Check the console logs for more information.'''.format(type(e).__name__))
+    try:
+        report = analyze(self.filepath, LDrawDir,
+                         useLSynth=self.lsynthParts)
+    except Exception as e:
+        report_error(self, e)
         return {'CANCELLED'}
+    logReport(report)
+
+    estimate = report["resolutions"][self.resPrims]
+    self.report({'INFO'}, "{0} parts, {1} triangles, {2} missing".format(
+                report["parts"], estimate["triangles"],
+                len(report["missing"])))
+
+    if ImportReportOpt:  # noqa
+        filepath = "{0}.analysis.json".format(
+            os.path.splitext(self.filepath)[0])
+        try:
+            with open(filepath, "wt", encoding="utf_8") as f:
+                json.dump(report, f, indent=2)
+
+        # Silently fail
+        except OSError:
+            pass
+    return {'FINISHED'}
+
+
+def import_model(self, context, cacheParts=False):
+    """Set the import options and import a model.
+
+    `self` is the import operator, or any object
+    with the same options and a `report` method.
+
+    @param {Object} self The import options and model `filepath`.
+    @param {Context} context The context to import into.
+    @param {Boolean} cacheParts True to keep the parsed library files
+                                for the following imports.
+    @return {Set} The import result, such as {'FINISHED'}.
+    """
+    return run_steps(import_steps(self, context, cacheParts))
+
+
+def import_steps(self, context, cacheParts=False):
+    """Set the import options and import a model one step at a time.
+
+    Closing the generator cancels the import.
+
+    @param {Object} self The import options and model `filepath`.
+    @param {Context} context The context to import into.
+    @param {Boolean} cacheParts True to keep the parsed library files
+                                for the following imports.
+    @return {Generator} The progress, from 0 to 1, and at
+                        the end the import result.
+    """
+    global LDrawDir, CleanUpOpt, AltColorsOpt, GapsOpt, LinkParts
+    global ColorCacheDir, ImportReportOpt, ProfileMemoryOpt, SaveSceneOpt
+    global UpdateOpt
+    global library
+    LDrawDir = str(self.ldrawPath)
+    CleanUpOpt = bool(self.cleanUpParts)
+    AltColorsOpt = bool(self.altColors)
+    GapsOpt = bool(self.addGaps)
+    LinkParts = bool(self.linkParts)
+    ColorCacheDir = (self.prefs.getCacheDir() if self.cacheColors
+                     else None)
+    ImportReportOpt = bool(self.importReport)
+    ProfileMemoryOpt = bool(self.profileMemory)
+    SaveSceneOpt = bool(self.saveScene)
+    UpdateOpt = bool(self.updateExisting)
+    Console.setLevel(self.logLevel)
+
+    # Reuse the library index from earlier imports with the same settings
+    prewarmed = finish_prewarm()
+    library = getLibrary(LDrawDir, self.resPrims, self.lsynthParts)
+    library.cacheParts = cacheParts
+
+    # Parts may have been added since the last interactive import,
+    # a batch only searches again for the parts that were missing.
+    # A library prepared when the file browser opened is up to date
+    if cacheParts:
+        library.clearMissing()
+    elif library is not prewarmed:
+        library.refresh()
+
+    # Only estimate the cost of the import
+    if self.analyzeOnly:
+        return analyze_model(self)
+
+    # Display the import messages together once the import is done
+    with Console.buffered():
+        result = yield from create_model(self, context, self.importScale)
+    return result
+
+
+def get_preferences():
+    """Read the preferences the first time they are needed.
+
+    @return {Preferences} The preferences.
+    """
+    global prefs
+    if prefs is None:
+        prefs = Preferences()
+    return prefs
+
+
+def apply_preferences(self):
+    """Set the import options the caller did not give to the saved ones.
+
+    The LDraw Parts Library is searched for if none was saved.
+
+    @param {Operator} self The import operator.
+    """
+    for name in SAVED_OPTIONS:
+        if not self.properties.is_property_set(name):
+            setattr(self, name, self.prefs.get(name, getattr(self, name)))
+    if not self.ldrawPath:
+        self.ldrawPath = self.prefs.getLDraw()
+
+
+def prewarm(ldPath, resPrims, useLSynth, useAltColors, cacheDir, uses):
+    """Prepare a library and the colors for the next import.
+
+    A new library is indexed, the files used by the most imports are
+    read ahead and the color definitions are parsed. The import swaps
+    the library in on the main thread, so the library a running import
+    uses is never changed.
+
+    @param {String} ldPath The LDraw Parts Library.
+    @param {String} resPrims The resolution of the primitives.
+    @param {Boolean} useLSynth True to search the LSynth parts.
+    @param {Boolean} useAltColors True to use LDCfgalt.ldr.
+    @param {!String} cacheDir The color cache folder.
+    @param {!Counter} uses The number of imports each file was read by.
+    """
+    try:
+        warmed = Library(ldPath, resPrims, useLSynth, uses)
+        warmed.index()
+        loaded = warmed.preload()
+        Colors(ldPath, useAltColors, cacheDir).load()
+        prewarmedLibraries[threading.current_thread()] = warmed
+        Console.debug("Prepared {0} with {1} files read ahead".format(
+                      ldPath, loaded))
+
+    # The import reports a missing or broken library itself
+    except Exception as e:
+        Console.debug("Could not prepare {0}: {1}".format(ldPath, e))
+
+
+def start_prewarm(self):
+    """Prepare the library in the background while a file is picked.
+
+    Nothing is started while an earlier preparation is still running.
+
+    @param {Object} self The import options.
+    """
+    global prewarmThread
+    if prewarmThread is not None and prewarmThread.is_alive():
+        return
+
+    ldPath = str(self.ldrawPath)
+    current = findLibrary(ldPath, self.resPrims, self.lsynthParts)
+    prewarmThread = threading.Thread(
+        target=prewarm, name="LDR Importer prewarm",
+        args=(ldPath, self.resPrims, bool(self.lsynthParts),
+              bool(self.altColors),
+              self.prefs.getCacheDir() if self.cacheColors else None,
+              current.usage() if current is not None else None))
+    prewarmThread.daemon = True
+    prewarmThread.start()
+
+
+def finish_prewarm():
+    """Use the library prepared in the background, if it is ready.
+
+    A preparation still running is not waited for and its library
+    is never used, the import prepares its library itself.
+
+    @return {!Library} The library that was prepared, if any.
+    """
+    global prewarmThread
+    thread, prewarmThread = prewarmThread, None
+    warmed = (prewarmedLibraries.pop(thread, None)
+              if thread is not None and not thread.is_alive() else None)
+    prewarmedLibraries.clear()
+    if warmed is not None:
+        useLibrary(warmed)
+    return warmed
 
 
 # ------------ Operator ------------ #
@@ -421,32 +1453,29 @@ class LDRImporterOps(bpy.types.Operator, ImportHelper):
     bl_region_type = "WINDOW"
     bl_options = {'REGISTER', 'UNDO', 'PRESET'}
 
-    # Instance the preferences system
-    prefs = Preferences()
-
     # File type filter in file browser
     filename_ext = ".ldr"
     filter_glob = bpy.props.StringProperty(
-        default="*.ldr;*.dat",
+        default="*.ldr;*.dat;*{0}".format(SCENE_EXT),
         options={'HIDDEN'}
     )
 
     ldrawPath = bpy.props.StringProperty(
         name="",
-        description="Path to the LDraw Parts Library",
-        default=prefs.getLDraw()
+        description="Path to the LDraw Parts Library or its complete.zip",
+        default=""
     )
 
     importScale = bpy.props.FloatProperty(
         name="Scale",
         description="Use a specific scale for each part",
-        default=prefs.get("importScale", 1.00)
+        default=1.00
     )
 
     resPrims = bpy.props.EnumProperty(
         name="Resolution of part primitives",
         description="Resolution of part primitives",
-        default=prefs.get("resPrims", "StandardRes"),
+        default="StandardRes",
         items=(
             ("HighRes", "High-Res Primitives",
              "Import using high resolution primitives. "
@@ -462,33 +1491,104 @@ class LDRImporterOps(bpy.types.Operator, ImportHelper):
     cleanUpParts = bpy.props.BoolProperty(
         name="Model Cleanup",
         description="Perform some basic model cleanup",
-        default=prefs.get("cleanUpParts", True)
+        default=True
     )
 
     altColors = bpy.props.BoolProperty(
         name="Use Alternate Colors",
         description="Use LDCfgalt.ldr for color definitions",
-        default=prefs.get("altColors", False)
+        default=False
     )
 
     addGaps = bpy.props.BoolProperty(
         name="Spaces Between Parts",
         description="Add small spaces between each part",
-        default=prefs.get("addGaps", False)
+        default=False
     )
 
     lsynthParts = bpy.props.BoolProperty(
         name="Use LSynth Parts",
         description="Use LSynth parts during import",
-        default=prefs.get("lsynthParts", False)
+        default=False
     )
 
     linkParts = bpy.props.BoolProperty(
         name="Link Identical Parts",
         description="Link identical parts by type and color (experimental)",
-        default=prefs.get("linkParts", False)
+        default=False
+    )
+
+    cacheColors = bpy.props.BoolProperty(
+        name="Cache Color Definitions",
+        description="Keep parsed color definitions on disk between sessions",
+        default=False,
+        options={'HIDDEN'}
     )
 
+    importReport = bpy.props.BoolProperty(
+        name="Write Import Report",
+        description="Save the import timings as JSON next to the model",
+        default=False,
+        options={'HIDDEN'}
+    )
+
+    updateExisting = bpy.props.BoolProperty(
+        name="Update Previous Import",
+        description="Only add, remove or move the parts that changed "
+                    "since this model was last imported. "
+                    "NOTE: Updates cannot be cancelled",
+        default=False,
+        options={'SKIP_SAVE'}
+    )
+
+    saveScene = bpy.props.BoolProperty(
+        name="Save Flattened Scene",
+        description="Save the parsed model next to it for faster re-imports",
+        default=False,
+        options={'HIDDEN'}
+    )
+
+    logLevel = bpy.props.EnumProperty(
+        name="Console Messages",
+        description="The least important messages shown in the console",
+        default="INFO",
+        items=(
+            ("DEBUG", "Debug", "Show every message, including each "
+             "missing part reference. NOTE: This slows down the import"),
+            ("INFO", "Info", "Show the import progress and summaries"),
+            ("WARNING", "Warning", "Show only warnings and errors"),
+            ("ERROR", "Error", "Show only errors")
+        ),
+        options={'HIDDEN'}
+    )
+
+    modalImport = bpy.props.BoolProperty(
+        name="Responsive Import",
+        description="Keep Blender responsive and show the progress "
+                    "while importing, press Esc to cancel",
+        default=True,
+        options={'HIDDEN'}
+    )
+
+    analyzeOnly = bpy.props.BoolProperty(
+        name="Analyze Only",
+        description="Estimate the size of the import without importing",
+        default=False,
+        options={'HIDDEN', 'SKIP_SAVE'}
+    )
+
+    profileMemory = bpy.props.BoolProperty(
+        name="Profile Memory Usage",
+        description="Report the memory used by each import phase",
+        default=False,
+        options={'HIDDEN', 'SKIP_SAVE'}
+    )
+
+    @property
+    def prefs(self):
+        """The preferences, read the first time the importer is used."""
+        return get_preferences()
+
     def draw(self, context):
         """Display import options."""
         layout = self.layout
@@ -505,85 +1605,104 @@ class LDRImporterOps(bpy.types.Operator, ImportHelper):
         box.prop(self, "addGaps")
         box.prop(self, "altColors")
         box.prop(self, "lsynthParts")
+        box.prop(self, "updateExisting")
+
+    def invoke(self, context, event):
+        """Fill in the saved import options and open the file browser."""
+        apply_preferences(self)
+        start_prewarm(self)
+        return ImportHelper.invoke(self, context, event)
 
     def execute(self, context):
         """Set import options and start the import process."""
-        global LDrawDir, CleanUpOpt, AltColorsOpt, GapsOpt, LinkParts
-        LDrawDir = str(self.ldrawPath)
-        CleanUpOpt = bool(self.cleanUpParts)
-        AltColorsOpt = bool(self.altColors)
-        GapsOpt = bool(self.addGaps)
-        LinkParts = bool(self.linkParts)
-
-        # Clear array before adding data if it contains data already
-        # Not doing so duplicates the indexes
-        if paths:
-            del paths[:]
-
-        # Create placeholder for index 0.
-        # It will be filled with the location of the model later.
-        paths.append("")
-
-        # Always search for parts in the `models` folder
-        paths.append(os.path.join(self.ldrawPath, "models"))
-
-        # The unofficial folder exists, search the standard folders
-        if os.path.exists(os.path.join(self.ldrawPath, "unofficial")):
-            paths.append(os.path.join(self.ldrawPath, "unofficial", "parts"))
-
-            # The user wants to use high-res unofficial primitives
-            if self.resPrims == "HighRes":
-                paths.append(os.path.join(self.ldrawPath,
-                                          "unofficial", "p", "48"))
-            # The user wants to use low-res unofficial primitives
-            elif self.resPrims == "LowRes":
-                paths.append(os.path.join(self.ldrawPath,
-                                          "unofficial", "p", "8"))
-
-            # Search in the `unofficial/p` folder
-            paths.append(os.path.join(self.ldrawPath, "unofficial", "p"))
-
-            # The user wants to use LSynth parts
-            if self.lsynthParts:
-                if os.path.exists(os.path.join(self.ldrawPath, "unofficial",
-                                               "lsynth")):
-                    paths.append(os.path.join(self.ldrawPath, "unofficial",
-                                              "lsynth"))
-                    Console.log("Use LSynth Parts selected")
-
-        # Always search for parts in the `parts` folder
-        paths.append(os.path.join(self.ldrawPath, "parts"))
-
-        # The user wants to use high-res primitives
-        if self.resPrims == "HighRes":
-            paths.append(os.path.join(self.ldrawPath, "p", "48"))
-            Console.log("High-res primitives substitution selected")
-
-        # The user wants to use low-res primitives
-        elif self.resPrims == "LowRes":
-            paths.append(os.path.join(self.ldrawPath, "p", "8"))
-            Console.log("Low-res primitives substitution selected")
-
-        # The user wants to use normal-res primitives
-        else:
-            Console.log("Standard-res primitives substitution selected")
-
-        # Finally, search in the `p` folder
-        paths.append(os.path.join(self.ldrawPath, "p"))
-
-        # Create the preferences dictionary
-        importOpts = {
-            "addGaps": self.addGaps,
-            "altColors": self.altColors,
-            "cleanUpParts": self.cleanUpParts,
-            "importScale": self.importScale,
-            "linkParts": self.linkParts,
-            "lsynthParts": self.lsynthParts,
-            "resPrims": self.resPrims
-        }
+        global runningImport
+        if runningImport is not None:
+            self.report({'ERROR'}, "Another LDraw model is being imported, "
+                                   "wait for it or press Esc to cancel it")
+            return {'CANCELLED'}
+
+        # Scripts calling the operator without a library
+        # use the saved options, as the file browser does
+        if not self.ldrawPath:
+            apply_preferences(self)
 
         # Save the preferences and import the model
         self.prefs.setLDraw(self.ldrawPath)
-        self.prefs.save(importOpts)
-        create_model(self, context, self.importScale)
-        return {'FINISHED'}
+        self.prefs.save({name: getattr(self, name)
+                         for name in SAVED_OPTIONS})
+
+        # Scripts and background runs import everything at once, and so
+        # do updates, which cannot put back the parts they moved or
+        # removed if cancelled
+        if (not self.modalImport or self.updateExisting or
+                bpy.app.background):
+            result = import_model(self, context)
+            return ({'FINISHED'} if result == {'FINISHED'}
+                    else {'CANCELLED'})
+
+        runningImport = self
+        self.__steps = import_steps(self, context)
+        self.__start = time.perf_counter()
+        self.__progress = 0.0
+        wm = context.window_manager
+        self.__timer = wm.event_timer_add(0.01, context.window)
+        wm.progress_begin(0, 100)
+        wm.modal_handler_add(self)
+        return {'RUNNING_MODAL'}
+
+    def modal(self, context, event):
+        """Import the model a short time slice at a time."""
+        if event.type == 'ESC':
+            self.cancel(context)
+            return {'CANCELLED'}
+        if event.type != 'TIMER':
+            return {'PASS_THROUGH'}
+
+        # Give control back to Blender often enough to stay responsive
+        deadline = time.perf_counter() + 0.1
+        try:
+            while time.perf_counter() < deadline:
+                self.__progress = next(self.__steps)
+        except StopIteration as result:
+            self.__finish(context)
+            return ({'FINISHED'} if result.value == {'FINISHED'}
+                    else {'CANCELLED'})
+
+        # Errors the import does not handle itself end it too
+        except Exception as e:
+            self.__finish(context)
+            report_error(self, e)
+            return {'CANCELLED'}
+
+        self.__showProgress(context)
+        return {'RUNNING_MODAL'}
+
+    def cancel(self, context):
+        """Stop the import and remove what was already created."""
+        if self.__steps is not None:
+            self.__steps.close()
+            self.__finish(context)
+
+    def __showProgress(self, context):
+        """Display the import progress and the time left."""
+        elapsed = time.perf_counter() - self.__start
+        progress = max(self.__progress, 0.001)
+        context.window_manager.progress_update(int(progress * 100))
+
+        if context.area is not None:
+            context.area.header_text_set(
+                "Importing {0}: {1:.0%}, about {2:.0f} s left "
+                "(Esc to cancel)".format(os.path.basename(self.filepath),
+                                         progress,
+                                         elapsed * (1 - progress) / progress))
+
+    def __finish(self, context):
+        """Remove the timer and the progress display."""
+        global runningImport
+        runningImport = None
+        self.__steps = None
+        wm = context.window_manager
+        wm.event_timer_remove(self.__timer)
+        wm.progress_end()
+        if context.area is not None:
+            context.area.header_text_set()
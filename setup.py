@@ -43,12 +43,23 @@ blenderFolder = os.path.join(tmpFolder, "io_scene_ldrimporter")
 scriptFiles = [
     "__init__.py",
     "__version__.py",
+    "batch_ldraw.py",
     "import_ldraw.py",
     "src/__init__.py",
     "src/ldcolors.py",
+    "src/ldgeometry.py",
     "src/ldconsole.py",
+    "src/ldlibrary.py",
     "src/ldmaterials.py",
+    "src/ldmatrix.py",
     "src/ldprefs.py",
+    "src/ldscene.py",
+    "src/ldshared.py",
+    "src/ldspatial.py",
+    "src/ldupdate.py",
+    "src/ldanalyze.py",
+    "src/ldarchive.py",
+    "src/ldstats.py",
     "src/extras/__init__.py",
     "src/extras/cleanup.py",
     "src/extras/gaps.py",
@@ -25,10 +25,12 @@ def main(cur_obj, link_parts):
 
     Actions performed include:
     * Remove doubles
-    * Recalculate normals
+    * Recalculate normals, unless every face came from
+      BFC certified files and is already wound consistently
     * Set part origin
     * Set smooth shading
-    * Add 30deg edge split modifier
+    * Add 30deg edge split modifier, unless the LDraw
+      edge lines already marked the sharp edges
 
     @param {Mesh} cur_obj - The individual model to process.
     @param {Boolean} link_parts - True if Linked Parts option is enabled.
@@ -42,7 +44,8 @@ def main(cur_obj, link_parts):
 
         # Remove doubles and recalculate the normals
         bpy.ops.mesh.remove_doubles(threshold=0.01)
-        bpy.ops.mesh.normals_make_consistent()
+        if not cur_obj.data.get("ldr_bfc"):
+            bpy.ops.mesh.normals_make_consistent()
 
         # When not linking parts, keep the original origin point
         bpy.ops.object.mode_set(mode='OBJECT')
@@ -52,7 +55,11 @@ def main(cur_obj, link_parts):
         # Set smooth shading
         bpy.ops.object.shade_smooth()
 
-    # Add 30 degree edge split modifier to all bricks
+    # Meshes with sharp edges from the edge lines use auto smooth
+    if cur_obj.data.use_auto_smooth:
+        return
+
+    # Add 30 degree edge split modifier to all other bricks
     edges = cur_obj.modifiers.new(
         "Edge Split", type='EDGE_SPLIT')
     edges.split_angle = 0.523599
@@ -18,13 +18,16 @@ Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
 """
 
 import bpy
+from mathutils import Vector
 
 
-def main(cur_obj, scale_val):
+def main(cur_obj, scale_val, dimensions=None):
     """Add small, uniform gaps between parts.
 
     @param {Mesh} cur_obj - The individual model to process.
     @param {Number} scale_val - The amount a model should be scaled up or down.
+    @param {Tuple} dimensions - The size of the mesh from the importer's
+                                spatial index, read from the object if None.
     """
     bpy.ops.object.select_all(action="DESELECT")
     cur_obj.select = True
@@ -33,7 +36,11 @@ def main(cur_obj, scale_val):
     # Compute the scale factor
     gap_width = 0.007
     obj_scale = cur_obj.scale * scale_val
-    dim = cur_obj.dimensions
+    if dimensions is None:
+        dim = cur_obj.dimensions
+    else:
+        dim = Vector([size * abs(factor) for size, factor in
+                      zip(dimensions, cur_obj.scale)])
 
     # Checks whether the object isn't flat in a certain direction
     # to avoid division by zero.
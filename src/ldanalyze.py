@@ -0,0 +1,271 @@
+# -*- coding: utf-8 -*-
+"""LDR Importer GPLv2 license.
+
+Estimate the cost of importing a model without creating any Blender data.
+
+    python -m src.ldanalyze --ldraw C:/LDraw model.ldr [model.ldr ...]
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program; if not, write to the Free Software Foundation,
+Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+
+"""
+
+
+import os
+import sys
+import json
+import argparse
+from collections import Counter, OrderedDict
+
+from . import ldarchive
+from .ldconsole import Console
+from .ldlibrary import getLibrary
+
+
+__all__ = ("RESOLUTIONS", "analyze", "logReport")
+
+
+RESOLUTIONS = ("HighRes", "StandardRes", "LowRes")
+
+# Approximate bytes used by Blender for each mesh element:
+# a vertex, a loop and an edge per face corner, and a face
+_bytesPerCorner = 20 + 8 + 12
+_bytesPerFace = 12 + 4
+
+# Approximate bytes the parser keeps for each point and face
+_parseBytesPerCorner = 120
+_parseBytesPerFace = 90
+
+
+class _FileCounts:
+    """The lines of a single file that matter for the estimate."""
+
+    __slots__ = ("tris", "quads", "refs")
+
+    def __init__(self):
+        self.tris = 0
+        self.quads = 0
+        self.refs = Counter()
+
+
+def _scanFile(filename):
+    """Count the faces of a file and the files it references.
+
+    Only type 1 lines are split, the others are
+    recognized by their first character.
+
+    @param {String} filename The file to scan.
+    @return {_FileCounts} The counts of the file.
+    """
+    counts = _FileCounts()
+    with ldarchive.openText(filename) as f:
+        for line in f:
+            line = line.lstrip()
+            lineType = line[:1]
+            if lineType == "3":
+                counts.tris += 1
+            elif lineType == "4":
+                counts.quads += 1
+            elif lineType == "1":
+                tokens = line.split()
+                if len(tokens) >= 15:
+                    counts.refs[tokens[14]] += 1
+    return counts
+
+
+class _Analyzer:
+    """Walk the reference graph of a model for one library setting."""
+
+    def __init__(self, library, modelDir, scanned):
+        """Instance the class.
+
+        @param {Library} library The library to find parts in.
+        @param {String} modelDir The folder of the model.
+        @param {Dictionary} scanned File counts shared between settings.
+        """
+        self.__library = library
+        self.__modelDir = modelDir
+        self.__scanned = scanned
+        self.__totals = {}
+        self.missing = Counter()
+
+    def __locate(self, name):
+        """Find a referenced file.
+
+        @param {String} name The name in the type 1 line.
+        @return {!String} The file if found.
+        """
+        if self.__library.exists(name):
+            return name
+        return self.__library.locate(name, self.__modelDir)
+
+    def __scan(self, filename):
+        """Scan a file once for every setting.
+
+        @param {String} filename The file to scan.
+        @return {_FileCounts} The counts of the file.
+        """
+        counts = self.__scanned.get(filename)
+        if counts is None:
+            counts = self.__scanned[filename] = _scanFile(filename)
+        return counts
+
+    def totals(self, filename):
+        """Count the faces of a file and everything it places.
+
+        Shared subfiles are only walked once.
+
+        @param {String} filename The file to count.
+        @return {Tuple} The number of triangles and quads.
+        """
+        stack = [(filename, False)]
+        visiting = set()
+        while stack:
+            current, expanded = stack.pop()
+            if current in self.__totals:
+                continue
+            counts = self.__scan(current)
+
+            if not expanded:
+                visiting.add(current)
+                stack.append((current, True))
+                for name in counts.refs:
+                    child = self.__locate(name)
+                    if child is None:
+                        self.missing[name] += counts.refs[name]
+                    elif child not in self.__totals and child not in visiting:
+                        stack.append((child, False))
+                continue
+
+            # Every placed file has been counted, add them up
+            tris, quads = counts.tris, counts.quads
+            for name, number in counts.refs.items():
+                child = self.__locate(name)
+                childTris, childQuads = self.__totals.get(child, (0, 0))
+                tris += number * childTris
+                quads += number * childQuads
+            self.__totals[current] = (tris, quads)
+        return self.__totals[filename]
+
+
+def _estimate(tris, quads):
+    """Estimate what an import creates for a number of faces.
+
+    @param {Number} tris The number of triangles.
+    @param {Number} quads The number of quads.
+    @return {OrderedDict} The triangles, faces, vertices and memory.
+    """
+    faces = tris + quads
+    corners = 3 * tris + 4 * quads
+    return OrderedDict((
+        ("triangles", tris + 2 * quads),
+        ("faces", faces),
+        ("vertices", corners),
+        ("blender_bytes", corners * _bytesPerCorner + faces * _bytesPerFace),
+        ("parser_bytes", corners * _parseBytesPerCorner +
+         faces * _parseBytesPerFace)
+    ))
+
+
+def analyze(modelPath, ldPath, resolutions=RESOLUTIONS, useLSynth=False):
+    """Estimate the cost of importing a model.
+
+    @param {String} modelPath The model to analyze.
+    @param {String} ldPath The LDraw Parts Library.
+    @param {Iterable} resolutions The primitive resolutions to estimate.
+    @param {Boolean} useLSynth True to search the LSynth parts.
+    @return {OrderedDict} The part counts, missing parts and the
+                          estimated size of the import at each resolution.
+    """
+    modelDir = os.path.dirname(modelPath)
+    rootCounts = _scanFile(modelPath)
+    scanned = {modelPath: rootCounts}
+
+    report = OrderedDict((
+        ("model", modelPath),
+        ("parts", sum(rootCounts.refs.values())),
+        ("unique_parts", len(rootCounts.refs)),
+        ("missing", {}),
+        ("resolutions", OrderedDict())
+    ))
+
+    missing = Counter()
+    for resPrims in resolutions:
+        analyzer = _Analyzer(getLibrary(ldPath, resPrims, useLSynth),
+                             modelDir, scanned)
+        report["resolutions"][resPrims] = _estimate(
+            *analyzer.totals(modelPath))
+        missing |= analyzer.missing
+
+    report["missing"] = OrderedDict(missing.most_common())
+    report["files"] = len(scanned)
+    return report
+
+
+def logReport(report):
+    """Display an analysis in the console.
+
+    @param {Dictionary} report The analysis from `analyze`.
+    """
+    lines = ["Analysis of {0}".format(report["model"]),
+             "  {0} parts, {1} unique, {2} files".format(
+                 report["parts"], report["unique_parts"], report["files"])]
+    for resPrims, estimate in report["resolutions"].items():
+        lines.append("  {0:<12} {1:>10} triangles {2:>10} vertices "
+                     "{3:>8.1f} MiB".format(
+                         resPrims, estimate["triangles"],
+                         estimate["vertices"],
+                         (estimate["blender_bytes"] +
+                          estimate["parser_bytes"]) / 1048576))
+    for name, count in report["missing"].items():
+        lines.append("  Missing {0}, {1} reference{2}".format(
+                     name, count, "" if count == 1 else "s"))
+    Console.log("\n".join(lines))
+
+
+def main(argv=None):
+    """Analyze models from the command line.
+
+    @param {!List} argv The arguments, sys.argv if not given.
+    @return {Number} The exit code, 1 if any part is missing.
+    """
+    parser = argparse.ArgumentParser(
+        prog="python -m src.ldanalyze",
+        description="Estimate the cost of importing LDraw models.")
+    parser.add_argument("models", nargs="+", help="the models to analyze")
+    parser.add_argument("--ldraw", required=True,
+                        help="the LDraw Parts Library")
+    parser.add_argument("--prims", choices=RESOLUTIONS, action="append",
+                        help="only estimate these primitive resolutions")
+    parser.add_argument("--lsynth", action="store_true",
+                        help="use LSynth parts")
+    parser.add_argument("--json", action="store_true",
+                        help="print the analysis as JSON")
+    args = parser.parse_args(argv)
+
+    Console.setLevel(Console.WARNING)
+    reports = [analyze(model, args.ldraw, args.prims or RESOLUTIONS,
+                       args.lsynth) for model in args.models]
+
+    if args.json:
+        print(json.dumps(reports, indent=2))
+    else:
+        Console.setLevel(Console.INFO)
+        for report in reports:
+            logReport(report)
+    return 1 if any(report["missing"] for report in reports) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,238 @@
+# -*- coding: utf-8 -*-
+"""LDR Importer GPLv2 license.
+
+Use the LDraw Parts Library straight from its complete.zip distribution.
+
+Files in an archive are addressed as if the archive were the library
+folder, for example `C:/LDraw/complete.zip/parts/3001.dat`, so the
+search paths are built the same way for both.
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program; if not, write to the Free Software Foundation,
+Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+
+"""
+
+
+import io
+import os
+import zipfile
+import threading
+
+
+__all__ = ("Archive", "isArchive", "getArchive", "clearCache",
+           "exists", "getmtime", "listDir", "openText")
+
+
+# Archives opened this session, by their absolute path
+_archives = {}
+
+
+def isArchive(path):
+    """Check if a path is a zipped library rather than a folder.
+
+    @param {String} path The LDraw Parts Library.
+    @return {Boolean} True if the path is a zip file.
+    """
+    return os.path.isfile(path) and zipfile.is_zipfile(path)
+
+
+def getArchive(path):
+    """Open an archive, reusing it if it did not change.
+
+    @param {String} path The zip file.
+    @return {Archive} The archive.
+    """
+    path = os.path.abspath(path)
+    archive = _archives.get(path)
+    if archive is None or archive.mtime != os.path.getmtime(path):
+        if archive is not None:
+            archive.close()
+        archive = _archives[path] = Archive(path)
+    return archive
+
+
+def clearCache():
+    """Close every archive opened this session."""
+    for archive in _archives.values():
+        archive.close()
+    _archives.clear()
+
+
+def _findArchive(path):
+    """Find the opened archive a path points into.
+
+    @param {String} path The path to a file or folder.
+    @return {!Archive} The archive if the path is inside one.
+    """
+    for archive in _archives.values():
+        if archive.contains(path):
+            return archive
+    return None
+
+
+def exists(path):
+    """Check if a file or folder exists, on disk or in an archive.
+
+    @param {String} path The path to check.
+    @return {Boolean} True if it exists.
+    """
+    if os.path.exists(path):
+        return True
+    archive = _findArchive(path)
+    return archive is not None and archive.exists(path)
+
+
+def getmtime(path):
+    """Get the modification time of a file, that of its archive if zipped.
+
+    @param {String} path The file.
+    @return {Number} The modification time.
+    @throws {OSError} The file does not exist.
+    """
+    archive = _findArchive(path)
+    return os.path.getmtime(path if archive is None else archive.path)
+
+
+def listDir(folder):
+    """List a folder, on disk or in an archive, by lowercase file name.
+
+    @param {String} folder The folder to list.
+    @return {Dictionary} The actual file names by lowercase name.
+    """
+    archive = _findArchive(folder)
+    if archive is not None:
+        return archive.listDir(folder)
+    try:
+        return {name.lower(): name for name in os.listdir(folder)}
+    except OSError:
+        return {}
+
+
+def openText(path):
+    """Open a text file, on disk or in an archive.
+
+    @param {String} path The file.
+    @return {File} The file, to be closed by the caller.
+    @throws {OSError} The file does not exist.
+    """
+    archive = _findArchive(path)
+    if archive is None:
+        return open(path, "rt", encoding="utf_8")
+    return io.StringIO(archive.read(path).decode("utf_8"))
+
+
+class Archive:
+    """A zipped LDraw Parts Library, indexed once from its central directory.
+
+    Every name is matched without regard to case.
+    """
+
+    def __init__(self, path):
+        """Instance the class.
+
+        @param {String} path The absolute path to the zip file.
+        """
+        self.path = path
+        self.mtime = os.path.getmtime(path)
+        self.__prefix = os.path.normcase(path) + os.path.sep
+        self.__zip = zipfile.ZipFile(path)
+        self.__lock = threading.Lock()
+
+        # Members by lowercase path, and folder contents by lowercase folder
+        self.__members = {}
+        self.__folders = {"": {}}
+        self.__index(self.__zip.namelist())
+
+    def __index(self, names):
+        """Index the members below the library root.
+
+        The root is the folder holding LDConfig.ldr,
+        `ldraw/` in the official distribution.
+
+        @param {List} names The member names.
+        """
+        configs = [name for name in names
+                   if name.lower().rpartition("/")[2] == "ldconfig.ldr"]
+        root = (min(configs, key=lambda name: name.count("/"))
+                .rpartition("/")[0] if configs else "")
+        root = "{0}/".format(root) if root else ""
+
+        for name in names:
+            if not name.startswith(root) or name.endswith("/"):
+                continue
+            relPath = name[len(root):]
+            self.__members[relPath.lower()] = name
+
+            # Register the file in its folder and every parent folder
+            folder, _, baseName = relPath.rpartition("/")
+            listing = self.__folders.get(folder.lower())
+            if listing is None:
+                listing = self.__folders[folder.lower()] = {}
+                while folder:
+                    folder, _, child = folder.rpartition("/")
+                    parent = self.__folders.setdefault(folder.lower(), {})
+                    parent.setdefault(child.lower(), child)
+            listing[baseName.lower()] = baseName
+
+    def __relative(self, path):
+        """Get the member of a path, relative to the library root.
+
+        @param {String} path The path into the archive.
+        @return {String} The lowercase member path.
+        """
+        relPath = os.path.normcase(os.path.normpath(path))[len(self.__prefix):]
+        return relPath.replace("\\", "/").lower()
+
+    def contains(self, path):
+        """Check if a path points into the archive.
+
+        @param {String} path The path to check.
+        @return {Boolean} True if it starts with the archive path.
+        """
+        return os.path.normcase(path).startswith(self.__prefix)
+
+    def exists(self, path):
+        """Check if a file or folder is in the archive.
+
+        @param {String} path The path into the archive.
+        @return {Boolean} True if it exists.
+        """
+        relPath = self.__relative(path)
+        return relPath in self.__members or relPath in self.__folders
+
+    def listDir(self, folder):
+        """List a folder by lowercase file name.
+
+        @param {String} folder The path to the folder in the archive.
+        @return {Dictionary} The actual file names by lowercase name.
+        """
+        return self.__folders.get(self.__relative(folder), {})
+
+    def read(self, path):
+        """Read a file.
+
+        @param {String} path The path to the file in the archive.
+        @return {Bytes} The contents of the file.
+        @throws {OSError} The file is not in the archive.
+        """
+        member = self.__members.get(self.__relative(path))
+        if member is None:
+            raise FileNotFoundError("No such file in {0}: {1}".format(
+                                    self.path, path))
+        with self.__lock:
+            return self.__zip.read(member)
+
+    def close(self):
+        """Close the zip file."""
+        self.__zip.close()
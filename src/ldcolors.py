@@ -19,70 +19,168 @@ Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
 
 
 import os
-import re
+import pickle
 import struct
+import hashlib
 
+from . import ldarchive
 from .ldconsole import Console
 
 
+# Parsed color tables for the current Blender session,
+# keyed by the color file path and its modification time
+_sessionCache = {}
+
+# Bump whenever the layout of `Color` changes so stale
+# pickled color tables are not loaded
+_cacheVersion = 2
+
+# Decoded direct colors, shared by all color tables
+_directColors = {}
+
+# Attributes without a value that set the color material
+_materialFlags = frozenset(("CHROME", "PEARLESCENT", "RUBBER",
+                            "MATTE_METALLIC", "METAL"))
+
+
+def clearCache():
+    """Forget all color tables parsed during this session."""
+    _sessionCache.clear()
+
+
+def hexToRgb(color):
+    """Convert a Hex color value to the RGB format Blender requires.
+
+    @param {String} color - The hex color value to convert.
+                            Can be prefixed with "#".
+    @return {Tuple.<number>} A three-index tuple containing
+                             the converted RGB value.
+    """
+    color = color.lstrip("#")
+    rgbColor = struct.unpack("BBB", bytes.fromhex(color))
+    return tuple([val / 255 for val in rgbColor])
+
+
+def makeDirectColor(color):
+    """Convert a direct color to RGB values.
+
+    Results are memoized as the same direct colors
+    are used over and over again in a model.
+
+    @link {http://www.ldraw.org/article/218.html#colours}
+    @param {String} color - An LDraw direct color in the format 0x2RRGGBB.
+    @return {Dictionary} "valid" key is a boolean value indicating
+                         if a direct color was found or not.
+                         "value" key is the color converted into
+                         a three-index RGB color tuple or None if
+                         "valid" if False.
+    """
+    results = _directColors.get(color)
+    if results is not None:
+        return results
+
+    results = {
+        "valid": False,
+        "value": None
+    }
+
+    # This is a valid direct color
+    if (color is not None and len(color) == 9 and
+            color.startswith("0x2")):
+        try:
+            results["value"] = hexToRgb(color[3:])
+            results["valid"] = True
+        except ValueError:
+            pass
+
+    _directColors[color] = results
+    return results
+
+
+class Color:
+    """A single LDraw color definition."""
+
+    __slots__ = ("code", "name", "value", "edge", "alpha", "luminance",
+                 "material", "secondary_color", "fraction", "vfraction",
+                 "size", "minsize", "maxsize")
+
+    def __init__(self, code, name):
+        """Instance the class.
+
+        @param {Number} code The code identifying the color.
+        @param {String} name The name of the color.
+        """
+        self.code = code
+        self.name = name
+        self.value = None
+        self.edge = None
+        self.alpha = 1.0
+        self.luminance = 0.0
+        self.material = "BASIC"
+        self.secondary_color = None
+        self.fraction = None
+        self.vfraction = None
+        self.size = None
+        self.minsize = None
+        self.maxsize = None
+
+    def __getstate__(self):
+        """Get the pickled state of the color.
+
+        @return {Tuple} The value of each attribute.
+        """
+        return tuple(getattr(self, attr) for attr in self.__slots__)
+
+    def __setstate__(self, state):
+        """Restore a pickled color.
+
+        @param {Tuple} state The value of each attribute.
+        """
+        for attr, value in zip(self.__slots__, state):
+            setattr(self, attr, value)
+
+
 class Colors:
     """Parse and manage LDraw color definitions."""
 
-    def __init__(self, ldPath, useAltColors):
+    def __init__(self, ldPath, useAltColors, cacheDir=None):
         """Instance the class.
 
-        @param {String} ldPath An absolute path to the LDraw library.
+        @param {String} ldPath An absolute path to the LDraw library,
+                               a folder or the complete.zip distribution.
         @param {Boolean} useAltColors True if alternative color definitions
                                       should be used, False for
                                       standard color definitions.
+        @param {!String} cacheDir An optional folder where parsed color
+                                  tables are pickled for later sessions.
         """
         self.__ldPath = ldPath
+        if ldarchive.isArchive(ldPath):
+            ldarchive.getArchive(ldPath)
         self.__colorFile = ("LDCfgalt.ldr" if useAltColors else "LDConfig.ldr")
-        self.__colors = {
-            "filename": self.__colorFile
-        }
+        self.__cacheDir = cacheDir
+        self.__cacheHit = False
+        self.__colors = {}
+
+    @property
+    def filename(self):
+        """The color definition file in use."""
+        return self.__colorFile
+
+    @property
+    def cacheHit(self):
+        """True if the colors were loaded from a cache, False otherwise."""
+        return self.__cacheHit
 
     def hexToRgb(self, color):
         """Convert a Hex color value to the RGB format Blender requires.
 
         @param {String} color - The hex color value to convert.
                                 Can be prefixed with "#".
-        @return {!Tuple.<number>} A three-index tuple containing
-                                  the converted RGB value.
-                                  Otherwise None if the color
-                                  could not be converted.
-        """
-        color = color.lstrip("#")
-        rgbColor = struct.unpack("BBB", bytes.fromhex(color))
-        return tuple([val / 255 for val in rgbColor])
-
-    def __hasColorValue(self, line, value):
-        """Check if the color tag has a specific attribute.
-
-        @param {List} line - The color line to search.
-        @param {String} value - The attribute to find.
-        @return {Boolean} True if attribute is present, False otherwise.
+        @return {Tuple.<number>} A three-index tuple containing
+                                 the converted RGB value.
         """
-        return value in line
-
-    def __getColorValue(self, line, value):
-        """Get a specific attribute for a given color tag.
-
-        @param {List} line - The color line to search.
-        @param {String} value - The value to find.
-        @return {!String} The color value is present, None otherwise.
-        """
-        if value in line:
-            return line[line.index(value) + 1]
-        return None
-
-    def __set(self, code, color):
-        """Store an LDraw color.
-
-        @param {String} code - The code identifying the color.
-        @param {*} color - The structure describing the color.
-        """
-        self.__colors[code] = color
+        return hexToRgb(color)
 
     def makeDirectColor(self, color):
         """Convert a direct color to RGB values.
@@ -95,106 +193,228 @@ class Colors:
                              a three-index RGB color tuple or None if
                              "valid" if False.
         """
-        results = {
-            "valid": False,
-            "value": None
-        }
+        return makeDirectColor(color)
 
-        # There is no color data
-        if color is None:
-            return results
+    def __toCode(self, code):
+        """Convert a color code as written in a file to a table index.
 
-        # This is not a direct color
-        if re.fullmatch(r"^0x2(?:[A-F0-9]{2}){3}$", color) is None:
-            return results
-
-        # This is a valid direct color
-        results["valid"] = True
-        results["value"] = self.hexToRgb(color[3:])
-        return results
+        @param {Number|String} code - The code identifying the color.
+        @return {!Number} The integer color code, None if it is not one.
+        """
+        if type(code) is int:
+            return code
+        try:
+            return int(code)
+        except (TypeError, ValueError):
+            return None
 
     def get(self, code):
         """Get an individual LDraw color object.
 
-        @param {String} code - The code identifying the color.
-        @return {!Dictionary} The color definition if available,
-                              None otherwise.
+        @param {Number|String} code - The code identifying the color.
+        @return {!Color} The color definition if available,
+                         None otherwise.
         """
-        return self.__colors.get(code)
+        return self.__colors.get(self.__toCode(code))
 
     def contains(self, code):
         """Check if a color exists in the color dictionary.
 
-        @param {String} code - The code for the corresponding color.
+        @param {Number|String} code - The code for the corresponding color.
         @return {Boolean} True if the color was found, False otherwise.
         """
-        return code in self.__colors.keys()
+        return self.__toCode(code) in self.__colors
+
+    def __getCacheFile(self, colorPath):
+        """Get the pickle file used to store a color table on disk.
+
+        @param {String} colorPath The absolute path to the color file.
+        @return {String} The absolute path to the pickle file.
+        """
+        pathHash = hashlib.md5(colorPath.encode("utf_8")).hexdigest()
+        return os.path.join(self.__cacheDir, "colors-{0}.pickle".format(
+            pathHash))
+
+    def __readDiskCache(self, colorPath, cacheKey):
+        """Read a pickled color table if it is still up-to-date.
+
+        @param {String} colorPath The absolute path to the color file.
+        @param {Tuple} cacheKey The color file path and modification time.
+        @return {!Dictionary} The cached color table if available,
+                              None otherwise.
+        """
+        cacheFile = self.__getCacheFile(colorPath)
+        if not os.path.exists(cacheFile):
+            return None
+
+        try:
+            with open(cacheFile, "rb") as f:
+                data = pickle.load(f)
+
+        # The cache is unreadable, parse the color file again
+        except (OSError, EOFError, pickle.UnpicklingError,
+                AttributeError, ImportError):
+            return None
+
+        if (data.get("version") != _cacheVersion or
+                data.get("key") != cacheKey):
+            return None
+        return data["colors"]
+
+    def __writeDiskCache(self, colorPath, cacheKey):
+        """Pickle the parsed color table for later sessions.
+
+        @param {String} colorPath The absolute path to the color file.
+        @param {Tuple} cacheKey The color file path and modification time.
+        @return {Boolean} True if the cache was written, False otherwise.
+        """
+        cacheFile = self.__getCacheFile(colorPath)
+        tmpFile = "{0}.tmp".format(cacheFile)
+
+        try:
+            if not os.path.exists(self.__cacheDir):
+                os.makedirs(self.__cacheDir)
+
+            with open(tmpFile, "wb") as f:
+                pickle.dump({"version": _cacheVersion, "key": cacheKey,
+                             "colors": self.__colors},
+                            f, pickle.HIGHEST_PROTOCOL)
+            os.replace(tmpFile, cacheFile)
+            return True
+
+        # Silently fail, the cache is only an optimization
+        except OSError:
+            return False
 
     def load(self):
-        """Parse the LDraw color definitions file.
+        """Load the LDraw color definitions.
+
+        Parsed color tables are cached for the rest of the session
+        by the color file path and modification time, and pickled
+        to disk if a cache folder was given.
 
         @return {Dictionary} The complete LDraw color dictionary
-                             with color codes as the keys.
+                             with integer color codes as the keys.
+        """
+        colorPath = os.path.join(self.__ldPath, self.__colorFile)
+        cacheKey = (colorPath, ldarchive.getmtime(colorPath))
+
+        # We already parsed these colors during this session
+        colors = _sessionCache.get(cacheKey)
+        if colors is not None:
+            Console.log("Using cached {0} color definitions".format(
+                        self.__colorFile))
+            self.__colors = colors
+            self.__cacheHit = True
+            return self.__colors
+
+        # We parsed these colors during a previous session
+        if self.__cacheDir is not None:
+            colors = self.__readDiskCache(colorPath, cacheKey)
+            if colors is not None:
+                Console.log("Using disk cached {0} color definitions".format(
+                            self.__colorFile))
+                self.__colors = colors
+                self.__cacheHit = True
+                _sessionCache[cacheKey] = colors
+                return self.__colors
+
+        self.__parse(colorPath)
+        _sessionCache[cacheKey] = self.__colors
+        if self.__cacheDir is not None:
+            self.__writeDiskCache(colorPath, cacheKey)
+        return self.__colors
+
+    def __parse(self, colorPath):
+        """Parse the LDraw color definitions file.
+
+        @param {String} colorPath The absolute path to the color file.
         """
         # Read the color definition file
         Console.log("Parsing {0} color definitions".format(self.__colorFile))
-        with open(os.path.join(self.__ldPath, self.__colorFile),
-                  "rt", encoding="utf_8") as f:
+        with ldarchive.openText(colorPath) as f:
             lines = f.readlines()
 
+        colors = {}
         for line in lines:
-            # Normalize the lines
-            line = line.lstrip("0").strip().lower()
-
-            # Make sure this is a color
-            if line.startswith("!colour"):
-                line = line.split()
-                code = line[3]
-
-                # Create the color
-                color = {
-                    "alpha": 1.0,
-                    "code": code,
-                    "edge": self.hexToRgb(self.__getColorValue(line, "edge")),
-                    "luminance": 0.0,
-                    "material": "basic",
-                    "name": self.__getColorValue(line, "!colour"),
-                    "value": self.hexToRgb(self.__getColorValue(line, "value"))
-                }
-
-                # Extract the alpha value
-                if self.__hasColorValue(line, "alpha"):
-                    color["alpha"] = int(
-                        self.__getColorValue(line, "alpha")) / 256
-
-                # Extract the luminance value
-                if self.__hasColorValue(line, "luminance"):
-                    color["luminance"] = int(
-                        self.__getColorValue(line, "luminance"))
-
-                # Extract the valueless attributes
-                if self.__hasColorValue(line, "chrome"):
-                    color["material"] = "chrome"
-                if self.__hasColorValue(line, "pearlescent"):
-                    color["material"] = "pearlescent"
-                if self.__hasColorValue(line, "rubber"):
-                    color["material"] = "rubber"
-                if self.__hasColorValue(line, "metal"):
-                    color["material"] = "metal"
-
-                # Extract extra material values if present
-                if self.__hasColorValue(line, "material"):
-                    subLine = line[line.index("material"):]
-                    color["material"] = self.__getColorValue(subLine,
-                                                             "material")
-                    color["secondary_color"] = self.__getColorValue(
-                        subLine, "value")[1:]
-                    color["fraction"] = self.__getColorValue(subLine,
-                                                             "fraction")
-                    color["vfraction"] = self.__getColorValue(subLine,
-                                                              "vfraction")
-                    color["size"] = self.__getColorValue(subLine, "size")
-                    color["minsize"] = self.__getColorValue(subLine, "minsize")
-                    color["maxsize"] = self.__getColorValue(subLine, "maxsize")
-
-                self.__set(code, color)
+            color = self.__parseLine(line.split())
+            if color is not None:
+                colors[color.code] = color
+        self.__colors = colors
+
+    def __parseLine(self, tokens):
+        """Create a color from a single !COLOUR meta command.
+
+        The attributes are read in a single pass as key/value pairs,
+        save for the valueless material flags.
+
+        @param {List} tokens The whitespace-separated line.
+        @return {!Color} The color if the line defines one, None otherwise.
+        """
+        # Make sure this is a color
+        if (len(tokens) < 5 or tokens[0] != "0" or
+                tokens[1].upper() != "!COLOUR"):
+            return None
+
+        color = Color(None, tokens[2])
+        inMaterial = False
+        i, total = 3, len(tokens)
+
+        while i < total:
+            key = tokens[i].upper()
+            i += 1
+
+            # Extract the valueless attributes
+            if key in _materialFlags:
+                color.material = key
+                continue
+
+            if i >= total:
+                break
+            value = tokens[i]
+            i += 1
+
+            # Everything after a MATERIAL attribute describes the material
+            if key == "MATERIAL":
+                color.material = value.upper()
+                inMaterial = True
+            elif inMaterial:
+                self.__setMaterialValue(color, key, value)
+            else:
+                self.__setColorValue(color, key, value)
+
+        # The color code is required
+        if color.code is None or color.value is None:
+            return None
+        return color
+
+    def __setColorValue(self, color, key, value):
+        """Set a color attribute read from a !COLOUR meta command.
+
+        @param {Color} color The color being created.
+        @param {String} key The upper-case attribute name.
+        @param {String} value The attribute value.
+        """
+        if key == "CODE":
+            color.code = int(value)
+        elif key == "VALUE":
+            color.value = hexToRgb(value)
+        elif key == "EDGE":
+            color.edge = (hexToRgb(value) if value.startswith("#")
+                          else None)
+        elif key == "ALPHA":
+            color.alpha = int(value) / 256
+        elif key == "LUMINANCE":
+            color.luminance = int(value)
+
+    def __setMaterialValue(self, color, key, value):
+        """Set an extra material attribute read from a !COLOUR meta command.
+
+        @param {Color} color The color being created.
+        @param {String} key The upper-case attribute name.
+        @param {String} value The attribute value.
+        """
+        if key == "VALUE":
+            color.secondary_color = value.lstrip("#")
+        elif key in ("FRACTION", "VFRACTION", "SIZE", "MINSIZE", "MAXSIZE"):
+            setattr(color, key.lower(), float(value))
@@ -18,11 +18,47 @@ Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
 """
 
 
+from collections import OrderedDict
+from contextlib import contextmanager
 from datetime import datetime
 
 
 class Console:
 
+    # Message levels, only those at or above `level` are displayed
+    DEBUG = 10
+    INFO = 20
+    WARNING = 30
+    ERROR = 40
+    level = INFO
+
+    # Messages waiting to be displayed while buffering
+    __buffer = None
+
+    # Repeated messages and how many times each occurred
+    __tallies = OrderedDict()
+
+    @staticmethod
+    def setLevel(level):
+        """Set the lowest level of the messages displayed.
+
+        @param {Number|String} level The level, or its name.
+        """
+        if isinstance(level, str):
+            level = getattr(Console, level.upper(), Console.INFO)
+        Console.level = level
+
+    @staticmethod
+    def isEnabled(level):
+        """Check if messages of a level are displayed.
+
+        Use this to skip building expensive messages.
+
+        @param {Number} level The level to check.
+        @return {Boolean} True if the messages are displayed.
+        """
+        return level >= Console.level
+
     @staticmethod
     def __makeMessage(msg, prefix=None):
         """Construct the message for displaying in the console.
@@ -43,13 +79,38 @@ class Console:
         return "\n[LDR Importer] ({0}) {1}".format(
             datetime.now().strftime("%H:%M:%S.%f")[:-4], " ".join(msg))
 
+    @staticmethod
+    def __write(level, msg, prefix=None):
+        """Display or buffer a message if its level is enabled.
+
+        @param {Number} level The level of the message.
+        @param {Tuple} msg The message to be displayed.
+        @param {String} prefix Any text to prefix to the message.
+        """
+        if level < Console.level:
+            return
+
+        msg = Console.__makeMessage(msg, prefix)
+        if Console.__buffer is not None:
+            Console.__buffer.append(msg)
+        else:
+            print(msg)
+
+    @staticmethod
+    def debug(*msg):
+        """Print debugging messages to the console.
+
+        @param {Tuple} msg The message to be displayed.
+        """
+        Console.__write(Console.DEBUG, msg)
+
     @staticmethod
     def log(*msg):
         """Print logging messages to the console.
 
         @param {Tuple} msg The message to be displayed.
         """
-        print(Console.__makeMessage(msg))
+        Console.__write(Console.INFO, msg)
 
     @staticmethod
     def warn(*msg):
@@ -57,4 +118,66 @@ class Console:
 
         @param {Tuple} msg The message to be displayed.
         """
-        print(Console.__makeMessage(msg, "Warning!"))
+        Console.__write(Console.WARNING, msg, "Warning!")
+
+    @staticmethod
+    def error(*msg):
+        """Print error messages to the console.
+
+        @param {Tuple} msg The message to be displayed.
+        """
+        Console.__write(Console.ERROR, msg, "ERROR:")
+
+    @staticmethod
+    def tally(template, subject, count=1):
+        """Count a repeated warning instead of displaying it each time.
+
+        The warnings are summarized once by `summarize`.
+
+        @param {String} template The warning, with {0} for the subject.
+        @param {String} subject What the warning is about.
+        @param {Number} count The number of times it occurred.
+        """
+        key = (template, subject)
+        Console.__tallies[key] = Console.__tallies.get(key, 0) + count
+        if Console.isEnabled(Console.DEBUG):
+            Console.debug(template.format(subject))
+
+    @staticmethod
+    def summarize():
+        """Display each counted warning once with its number of occurrences.
+
+        @return {Number} The number of distinct warnings.
+        """
+        tallies = Console.__tallies
+        Console.__tallies = OrderedDict()
+        for (template, subject), count in tallies.items():
+            Console.warn("{0}, {1} reference{2}".format(
+                template.format(subject), count, "" if count == 1 else "s"))
+        return len(tallies)
+
+    @staticmethod
+    def flush():
+        """Display all buffered messages at once."""
+        if Console.__buffer:
+            print("\n".join(Console.__buffer))
+            Console.__buffer = []
+
+    @staticmethod
+    @contextmanager
+    def buffered():
+        """Collect messages and display them together when done.
+
+        Printing to Blender's console is slow,
+        a single print is much faster than many.
+        """
+        if Console.__buffer is not None:
+            yield
+            return
+
+        Console.__buffer = []
+        try:
+            yield
+        finally:
+            Console.flush()
+            Console.__buffer = None
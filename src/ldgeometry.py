@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+"""LDR Importer GPLv2 license.
+
+Convert the coordinates of triangle, quad and edge lines in bulk.
+
+The coordinate tokens of every line of a kind in a file are gathered
+and converted with a single `map`, instead of a conversion and
+a few small lists per line.
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program; if not, write to the Free Software Foundation,
+Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+
+"""
+
+
+import itertools
+
+
+__all__ = ("BfcState", "parseTriangles", "parseQuads", "parseEdges",
+           "edgeKeys", "sharpFlags")
+
+
+# Edge lines are matched to mesh edges by their points,
+# rounded to this many decimals in LDraw units
+_keyPrecision = 3
+
+
+class BfcState(object):
+    """Follow the back face culling meta commands of a file.
+
+    @link {http://www.ldraw.org/article/415.html}
+    """
+
+    __slots__ = ("certified", "clockwise", "invertNext")
+
+    def __init__(self):
+        """Instance the class."""
+        # None until the file states whether it is certified
+        self.certified = None
+        self.clockwise = False
+        self.invertNext = False
+
+    def read(self, line):
+        """Apply a meta command.
+
+        @param {List} line The tokens of a type 0 line.
+        @return {Boolean} True if it was a BFC command.
+        """
+        if len(line) < 3 or line[1].upper() != "BFC":
+            return False
+
+        for word in line[2:]:
+            word = word.upper()
+            if word == "CERTIFY":
+                self.certified = True
+            elif word == "NOCERTIFY":
+                self.certified = False
+            elif word in ("CW", "CCW"):
+                self.clockwise = word == "CW"
+            elif word == "INVERTNEXT":
+                self.invertNext = True
+        return True
+
+    def certifies(self, hasFaces):
+        """Check if the faces of the file are consistently wound.
+
+        Files without faces of their own need no certification.
+
+        @param {Boolean} hasFaces True if the file has faces of its own.
+        @return {Boolean} True if the winding of the faces can be trusted.
+        """
+        if self.certified is None:
+            return not hasFaces
+        return self.certified
+
+
+def _values(lines, count):
+    """Convert the coordinates of face or edge lines.
+
+    @param {List} lines The tokens of each line.
+    @param {Number} count The number of points used from each line.
+    @return {List} The coordinates, `count * 3` per line.
+    """
+    end = 2 + count * 3
+    return list(map(float, itertools.chain.from_iterable(
+        line[2:end] for line in lines)))
+
+
+def parseTriangles(lines):
+    """Convert the points of triangle lines.
+
+    @param {List} lines The tokens of each type 3 line.
+    @return {List} The (x, y, z) points, three per line.
+    """
+    values = _values(lines, 3)
+    return list(zip(values[0::3], values[1::3], values[2::3]))
+
+
+def parseQuads(lines):
+    """Convert the points of quad lines, in winding order.
+
+    The normals of both halves of a quad point opposite ways
+    if its last two points are swapped, swap them back.
+
+    @param {List} lines The tokens of each type 4 line.
+    @return {List} The (x, y, z) points, four per line.
+    """
+    values = _values(lines, 4)
+    points = []
+    for i in range(0, len(values), 12):
+        x0, y0, z0, x1, y1, z1, x2, y2, z2, x3, y3, z3 = values[i:i + 12]
+        ax, ay, az = x1 - x0, y1 - y0, z1 - z0
+        bx, by, bz = x2 - x0, y2 - y0, z2 - z0
+        cx, cy, cz = x2 - x1, y2 - y1, z2 - z1
+        dx, dy, dz = x3 - x1, y3 - y1, z3 - z1
+        if ((ay * bz - az * by) * (cy * dz - cz * dy) +
+                (az * bx - ax * bz) * (cz * dx - cx * dz) +
+                (ax * by - ay * bx) * (cx * dy - cy * dx)) < 0:
+            points.extend(((x0, y0, z0), (x1, y1, z1),
+                           (x3, y3, z3), (x2, y2, z2)))
+        else:
+            points.extend(((x0, y0, z0), (x1, y1, z1),
+                           (x2, y2, z2), (x3, y3, z3)))
+    return points
+
+
+def parseEdges(lines):
+    """Convert the end points of edge or conditional lines.
+
+    The two control points of conditional lines are dropped.
+
+    @param {List} lines The tokens of each type 2 or type 5 line.
+    @return {List} The (x, y, z) points, two per line.
+    """
+    values = _values(lines, 2)
+    return list(zip(values[0::3], values[1::3], values[2::3]))
+
+
+def _pointKey(point):
+    """Round a point so close points compare equal."""
+    return (round(point[0], _keyPrecision), round(point[1], _keyPrecision),
+            round(point[2], _keyPrecision))
+
+
+def edgeKeys(points):
+    """Identify edges by their end points, in any order.
+
+    @param {List} points The end points, two per edge.
+    @return {Set} The rounded end points of each edge, sorted.
+    """
+    keys = [_pointKey(point) for point in points]
+    return {(a, b) if a < b else (b, a)
+            for a, b in zip(keys[0::2], keys[1::2])}
+
+
+def sharpFlags(points, edgeVerts, sharp):
+    """Find the mesh edges drawn by edge lines.
+
+    @param {List} points The points of the mesh, in the
+                         same space as the edge lines.
+    @param {List} edgeVerts The two point indices of each mesh edge.
+    @param {Set} sharp The edges from `edgeKeys`.
+    @return {List} True for each mesh edge that is sharp.
+    """
+    keys = [_pointKey(point) for point in points]
+    flags = []
+    for a, b in zip(edgeVerts[0::2], edgeVerts[1::2]):
+        a, b = keys[a], keys[b]
+        flags.append(((a, b) if a < b else (b, a)) in sharp)
+    return flags
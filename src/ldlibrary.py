@@ -0,0 +1,349 @@
+# -*- coding: utf-8 -*-
+"""LDR Importer GPLv2 license.
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program; if not, write to the Free Software Foundation,
+Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+
+"""
+
+
+import os
+from collections import Counter
+from contextlib import contextmanager
+
+from . import ldarchive
+from .ldconsole import Console
+
+
+__all__ = ("Library", "findLibrary", "getLibrary", "useLibrary",
+           "clearCache")
+
+
+# Libraries already set up this session, by their search settings
+_sessionCache = {}
+
+# The number of most used files read ahead of an import
+_hotFiles = 256
+
+
+@contextmanager
+def _untimed(name):
+    """Run a step of reading a file without timing it.
+
+    @param {String} name The name of the step.
+    """
+    yield
+
+
+def findLibrary(ldPath, resPrims="StandardRes", useLSynth=False):
+    """Find the library already set up this session for the given settings.
+
+    @param {String} ldPath The LDraw Parts Library.
+    @param {String} resPrims The resolution of the primitives.
+    @param {Boolean} useLSynth True to search the LSynth parts.
+    @return {!Library} The library, None if there is none yet.
+    """
+    return _sessionCache.get((os.path.abspath(ldPath), resPrims,
+                              bool(useLSynth)))
+
+
+def getLibrary(ldPath, resPrims="StandardRes", useLSynth=False):
+    """Get the library for the given settings, reusing it if possible.
+
+    @param {String} ldPath The LDraw Parts Library.
+    @param {String} resPrims The resolution of the primitives.
+    @param {Boolean} useLSynth True to search the LSynth parts.
+    @return {Library} The library.
+    """
+    library = findLibrary(ldPath, resPrims, useLSynth)
+    if library is None:
+        library = Library(ldPath, resPrims, useLSynth)
+        useLibrary(library)
+    return library
+
+
+def useLibrary(library):
+    """Reuse a library for its settings, such as one prepared elsewhere.
+
+    @param {Library} library The library, replacing any with its settings.
+    """
+    _sessionCache[library.settings] = library
+
+
+def clearCache():
+    """Forget every library set up this session."""
+    _sessionCache.clear()
+    ldarchive.clearCache()
+
+
+class Library:
+    """Find and read the files of an LDraw Parts Library.
+
+    The library may be a folder or the complete.zip distribution.
+    """
+
+    def __init__(self, ldPath, resPrims="StandardRes", useLSynth=False,
+                 uses=None):
+        """Instance the class.
+
+        @param {String} ldPath The LDraw Parts Library.
+        @param {String} resPrims The resolution of the primitives,
+                                 HighRes, StandardRes or LowRes.
+        @param {Boolean} useLSynth True to search the LSynth parts.
+        @param {!Counter} uses The number of imports each file was read
+                               by, from the `usage` of another library.
+        """
+        self.__settings = (os.path.abspath(ldPath), resPrims,
+                           bool(useLSynth))
+        self.__ldPath = ldPath
+        if ldarchive.isArchive(ldPath):
+            ldarchive.getArchive(ldPath)
+        self.__paths = self.__makePaths(ldPath, resPrims, useLSynth)
+
+        # Directory contents by lowercase name, located parts
+        # and the parts that could not be found
+        self.__listings = {}
+        self.__located = {}
+        self.__missing = set()
+
+        # Tokenized files by path, only kept when caching parts
+        # or read ahead, and the number of imports each file was read by
+        self.__parts = {}
+        self.__uses = Counter(uses or ())
+        self.cacheParts = False
+
+    @property
+    def paths(self):
+        """The folders searched for parts, in order."""
+        return self.__paths
+
+    @property
+    def settings(self):
+        """The library folder, primitive resolution and LSynth option."""
+        return self.__settings
+
+    def __makePaths(self, ldPath, resPrims, useLSynth):
+        """Build the folders searched for parts.
+
+        @param {String} ldPath The LDraw Parts Library.
+        @param {String} resPrims The resolution of the primitives.
+        @param {Boolean} useLSynth True to search the LSynth parts.
+        @return {List} The folders, in search order.
+        """
+        # Always search for parts in the `models` folder
+        paths = [os.path.join(ldPath, "models")]
+
+        # The unofficial folder exists, search the standard folders
+        if ldarchive.exists(os.path.join(ldPath, "unofficial")):
+            paths.append(os.path.join(ldPath, "unofficial", "parts"))
+
+            # The user wants to use high-res unofficial primitives
+            if resPrims == "HighRes":
+                paths.append(os.path.join(ldPath, "unofficial", "p", "48"))
+            # The user wants to use low-res unofficial primitives
+            elif resPrims == "LowRes":
+                paths.append(os.path.join(ldPath, "unofficial", "p", "8"))
+
+            # Search in the `unofficial/p` folder
+            paths.append(os.path.join(ldPath, "unofficial", "p"))
+
+            # The user wants to use LSynth parts
+            if useLSynth:
+                if ldarchive.exists(os.path.join(ldPath, "unofficial",
+                                                 "lsynth")):
+                    paths.append(os.path.join(ldPath, "unofficial",
+                                              "lsynth"))
+                    Console.log("Use LSynth Parts selected")
+
+        # Always search for parts in the `parts` folder
+        paths.append(os.path.join(ldPath, "parts"))
+
+        # The user wants to use high-res primitives
+        if resPrims == "HighRes":
+            paths.append(os.path.join(ldPath, "p", "48"))
+            Console.log("High-res primitives substitution selected")
+
+        # The user wants to use low-res primitives
+        elif resPrims == "LowRes":
+            paths.append(os.path.join(ldPath, "p", "8"))
+            Console.log("Low-res primitives substitution selected")
+
+        # The user wants to use normal-res primitives
+        else:
+            Console.log("Standard-res primitives substitution selected")
+
+        # Finally, search in the `p` folder
+        paths.append(os.path.join(ldPath, "p"))
+        return paths
+
+    def __listDir(self, folder):
+        """List a folder once, by lowercase file name.
+
+        @param {String} folder The folder to list.
+        @return {Dictionary} The actual file names by lowercase name.
+        """
+        listing = self.__listings.get(folder)
+        if listing is None:
+            listing = self.__listings[folder] = ldarchive.listDir(folder)
+        return listing
+
+    def __find(self, folder, partName):
+        """Find a part in a single folder, ignoring case.
+
+        @param {String} folder The folder to search.
+        @param {String} partName The part, relative to the folder.
+        @return {!String} The absolute path to the part if found.
+        """
+        subDir, baseName = os.path.split(partName)
+
+        # Sub-folders such as `s` and `48` are nearly always lowercase
+        for curDir in (subDir, subDir.lower()):
+            partDir = os.path.join(folder, curDir)
+            name = self.__listDir(partDir).get(baseName.lower())
+            if name is not None:
+                return os.path.join(partDir, name)
+        return None
+
+    def locate(self, partName, modelDir=None):
+        """Find the given part in the search paths.
+
+        @param {String} partName The part to find.
+        @param {!String} modelDir The folder of the model being imported,
+                                  searched before the library.
+        @return {!String} The absolute path to the part if found.
+        """
+        # Parts already missing are not searched again
+        if (partName, modelDir) in self.__missing:
+            return None
+
+        # Use the OS's path separator to ensure the parts are found
+        fullName = partName
+        partName = partName.replace("\\", os.path.sep)
+
+        # Parts next to the model override the library
+        if modelDir:
+            fname = self.__find(modelDir, partName)
+            if fname is not None:
+                return fname
+
+        if partName in self.__located:
+            return self.__located[partName]
+
+        for path in self.__paths:
+            fname = self.__find(path, partName)
+            if fname is not None:
+                self.__located[partName] = fname
+                return fname
+
+        self.__missing.add((fullName, modelDir))
+        return None
+
+    def clearMissing(self):
+        """Search again for the parts that could not be found.
+
+        Called before each import, the parts may have been added since.
+        """
+        self.__missing.clear()
+
+    def exists(self, filename):
+        """Check if a file exists, on disk or in the zipped library.
+
+        @param {String} filename The path to the file.
+        @return {Boolean} True if the file exists.
+        """
+        return ldarchive.exists(filename)
+
+    def read(self, filename, phase=_untimed):
+        """Read and tokenize a file, reusing it if it was cached.
+
+        @param {String} filename The absolute path to the file.
+        @param {Function} phase Times the "file reading" and "tokenizing"
+                                steps, such as `ImportStats.phase`.
+        @return {Tuple} The tokens of each line, and True if
+                        the file was already cached.
+        """
+        self.__uses[filename] += 1
+        cached = self.__parts.get(filename)
+
+        # Models and the files next to them are only read once,
+        # caching them would keep every model of a batch in memory
+        cache = self.cacheParts and self.__isLibraryFile(filename)
+        with phase("file reading"):
+            if cached is not None or cache:
+                mtime = ldarchive.getmtime(filename)
+                if cached is not None and cached[0] == mtime:
+                    return (cached[1], True)
+
+            with ldarchive.openText(filename) as f:
+                lines = f.readlines()
+
+        with phase("tokenizing"):
+            tokenized = [line.split() for line in lines]
+
+        if cache:
+            self.__parts[filename] = (mtime, tokenized)
+        return (tokenized, False)
+
+    def __isLibraryFile(self, filename):
+        """Check if a file is in one of the folders searched for parts.
+
+        @param {String} filename The absolute path to the file.
+        @return {Boolean} True if it is in the library.
+        """
+        return any(filename.startswith(os.path.join(path, ""))
+                   for path in self.__paths)
+
+    def index(self):
+        """List every search folder and its `s` sub-folder."""
+        for folder in self.__paths:
+            self.__listDir(folder)
+            self.__listDir(os.path.join(folder, "s"))
+
+    def usage(self):
+        """Count the imports each file was read by.
+
+        @return {Counter} A copy of the counts.
+        """
+        return Counter(self.__uses)
+
+    def preload(self, count=_hotFiles):
+        """Read the files used by the most imports into the cache.
+
+        They are reused by the next import even if parts are not cached.
+
+        @param {Number} count The number of files to read.
+        @return {Number} The number of files read.
+        """
+        loaded = 0
+        for filename, uses in self.__uses.most_common(count):
+            try:
+                mtime = ldarchive.getmtime(filename)
+                cached = self.__parts.get(filename)
+                if cached is None or cached[0] != mtime:
+                    with ldarchive.openText(filename) as f:
+                        self.__parts[filename] = (
+                            mtime, [line.split() for line in f])
+                    loaded += 1
+
+            # The file was removed since, it is reported when used
+            except OSError:
+                continue
+        return loaded
+
+    def refresh(self):
+        """Forget the folder contents and files so changes are found."""
+        self.__listings.clear()
+        self.__located.clear()
+        self.__missing.clear()
+        self.__parts.clear()
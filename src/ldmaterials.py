@@ -25,6 +25,70 @@ from .ldconsole import Console
 __all__ = ("Materials")
 
 
+# Names of the materials used as node tree templates
+# for each Cycles material class, shared for the session
+_templates = {}
+
+
+def makeSignature(*params):
+    """Describe the parameters a material was created from.
+
+    @param {Tuple} params The render engine, material class and colors.
+    @return {String} A string uniquely identifying the parameters.
+    """
+    values = []
+    for param in params:
+        if type(param) is tuple:
+            param = ",".join("{0:.4f}".format(val) for val in param)
+        elif type(param) is float:
+            param = "{0:.4f}".format(param)
+        values.append(str(param))
+    return ":".join(values)
+
+
+def findMaterial(name, signature):
+    """Find a previously imported material with identical parameters.
+
+    @param {String} name The name of the material.
+    @param {String} signature The parameters of the material.
+    @return {!Material} The existing material if available, None otherwise.
+    """
+    mat = bpy.data.materials.get(name)
+    if mat is not None and mat.get("ldr_signature") == signature:
+        return mat
+
+    # The material may have been given a numbered name by a prior import
+    for mat in bpy.data.materials:
+        if (mat.get("ldr_signature") == signature and
+                mat.name.split(".")[0] == name):
+            return mat
+    return None
+
+
+def findTemplate(classKey):
+    """Find the material whose node tree is used by a material class.
+
+    @param {String} classKey The Cycles material class.
+    @return {!Material} The template material if available, None otherwise.
+    """
+    mat = bpy.data.materials.get(_templates.get(classKey, ""))
+    if mat is not None and mat.get("ldr_class") == classKey:
+        return mat
+    return None
+
+
+def setCyclesColor(mat, diffColor):
+    """Change the color of a material created from a template.
+
+    @param {Material} mat The material to update.
+    @param {Tuple} diffColor The RGB color to use.
+    """
+    mat.diffuse_color = diffColor
+    for node in mat.node_tree.nodes:
+        if node.name.startswith("LDR Color"):
+            node.inputs['Color'].default_value = diffColor + (1.0,)
+
+
 class Materials:
 
     def __init__(self, ld_colors, render_engine):
@@ -48,18 +112,132 @@ class Materials:
         else:
             return self.__get_bi_materials(code)
 
+    def make_all(self, codes):
+        """Create the materials for a set of colors in one batch.
+
+        @param {Iterable} codes - The codes identifying the colors.
+        @return {Dictionary} The materials that could be created,
+                             with the color codes as the keys.
+        """
+        materials = {}
+        for code in sorted(codes, key=str):
+            material = self.make(code)
+            if material is not None:
+                materials[code] = material
+        return materials
+
     def get(self, code):
         """Get an individual material.
 
         @param {String} code - The code identifying the color.
-        @return {!Dictionary} The color definition if available,
-                              None otherwise.
+        @return {!Material} The material if available, None otherwise.
         """
         return self.__materials.get(code)
 
     def __set(self, code, mat):
         self.__materials[code] = mat
 
+    def __make_bi(self, code, col, materialType):
+        """Reuse or create a Blender Internal material.
+
+        @param {String} code - The code identifying the color.
+        @param {Tuple} col - The RGB color, alpha and luminance.
+        @param {String} materialType - The LDraw material of the color.
+        @return {Tuple} The material and True if it must be set up,
+                        False if an existing material was reused.
+        """
+        name = "Mat_{0}".format(code)
+        signature = makeSignature("BLENDER_RENDER", materialType, *col)
+        mat = findMaterial(name, signature)
+        if mat is not None:
+            return (mat, False)
+
+        mat = bpy.data.materials.new(name)
+        mat["ldr_signature"] = signature
+        return (mat, True)
+
+    def __make_cycles(self, code, builder, diffColor, *params):
+        """Reuse or create a Cycles material.
+
+        Each material class builds its node tree only once. Further
+        materials of the same class copy that tree, changing the colors.
+
+        @param {String} code - The code identifying the color.
+        @param {Function} builder - The function creating the node tree.
+        @param {Tuple} diffColor - The RGB color to use.
+        @param {Tuple} params - Any other values the builder requires.
+        @return {Material} The material for the color.
+        """
+        name = "Mat_{0}".format(code)
+        classKey = makeSignature(builder.__name__, *params)
+        signature = makeSignature("CYCLES", classKey, diffColor)
+
+        mat = findMaterial(name, signature)
+        if mat is not None:
+            return mat
+
+        template = findTemplate(classKey)
+        if template is not None:
+            mat = template.copy()
+            mat.name = name
+            setCyclesColor(mat, diffColor)
+        else:
+            mat = builder(name, diffColor, *params)
+            mat["ldr_class"] = classKey
+            _templates[classKey] = mat.name
+
+        mat["ldr_signature"] = signature
+        return mat
+
+    def __setup_bi(self, mat, col):
+        """Set up a new Blender Internal material for an LDraw color.
+
+        @param {Material} mat - The material to set up.
+        @param {Color} col - The LDraw color definition.
+        """
+        mat.diffuse_color = col.value
+
+        alpha = col.alpha
+        if alpha < 1.0:
+            mat.use_transparency = True
+            mat.alpha = alpha
+
+        mat.emit = col.luminance / 100
+
+        if col.material == "CHROME":
+            mat.specular_intensity = 1.4
+            mat.roughness = 0.01
+            mat.raytrace_mirror.use = True
+            mat.raytrace_mirror.reflect_factor = 0.3
+
+        elif col.material == "PEARLESCENT":
+            mat.specular_intensity = 0.1
+            mat.roughness = 0.32
+            mat.raytrace_mirror.use = True
+            mat.raytrace_mirror.reflect_factor = 0.07
+
+        elif col.material == "RUBBER":
+            mat.specular_intensity = 0.19
+
+        elif col.material == "METAL":
+            mat.specular_intensity = 1.473
+            mat.specular_hardness = 292
+            mat.diffuse_fresnel = 0.93
+            mat.darkness = 0.771
+            mat.roughness = 0.01
+            mat.raytrace_mirror.use = True
+            mat.raytrace_mirror.reflect_factor = 0.9
+
+        # elif col.material == "GLITTER":
+        #    slot = mat.texture_slots.add()
+        #    tex = bpy.data.textures.new("GlitterTex", type = "STUCCI")
+        #    tex.use_color_ramp = True
+        #
+        #    slot.texture = tex
+
+        else:
+            mat.specular_intensity = 0.2
+
     def __get_bi_materials(self, code):
 
         # We have already generated this material, reuse it
@@ -75,9 +253,10 @@ class Materials:
                 return None
 
             # We have a direct color on our hands
-            Console.log("Direct color {0} found".format(code))
-            mat = bpy.data.materials.new("Mat_{0}".format(code))
-            mat.diffuse_color = col["value"]
+            Console.debug("Direct color {0} found".format(code))
+            mat, isNew = self.__make_bi(code, (col["value"],), "DIRECT")
+            if isNew:
+                mat.diffuse_color = col["value"]
 
             # Add it to the material lists to avoid duplicate processing
             self.__set(code, mat)
@@ -86,50 +265,12 @@ class Materials:
         # Valid LDraw color, generate the material
         else:
             col = self.__ld_colors.get(code)
-            mat = bpy.data.materials.new("Mat_{0}".format(code))
-
-            mat.diffuse_color = col["value"]
-
-            alpha = col["alpha"]
-            if alpha < 1.0:
-                mat.use_transparency = True
-                mat.alpha = alpha
-
-            mat.emit = col["luminance"] / 100
-
-            if col["material"] == "CHROME":
-                mat.specular_intensity = 1.4
-                mat.roughness = 0.01
-                mat.raytrace_mirror.use = True
-                mat.raytrace_mirror.reflect_factor = 0.3
-
-            elif col["material"] == "PEARLESCENT":
-                mat.specular_intensity = 0.1
-                mat.roughness = 0.32
-                mat.raytrace_mirror.use = True
-                mat.raytrace_mirror.reflect_factor = 0.07
-
-            elif col["material"] == "RUBBER":
-                mat.specular_intensity = 0.19
-
-            elif col["material"] == "METAL":
-                mat.specular_intensity = 1.473
-                mat.specular_hardness = 292
-                mat.diffuse_fresnel = 0.93
-                mat.darkness = 0.771
-                mat.roughness = 0.01
-                mat.raytrace_mirror.use = True
-                mat.raytrace_mirror.reflect_factor = 0.9
-
-            # elif col["material"] == "GLITTER":
-            #    slot = mat.texture_slots.add()
-            #    tex = bpy.data.textures.new("GlitterTex", type = "STUCCI")
-            #    tex.use_color_ramp = True
-            #
-            #    slot.texture = tex
+            mat, isNew = self.__make_bi(
+                code, (col.value, col.alpha, col.luminance), col.material)
 
-            else:
-                mat.specular_intensity = 0.2
+            # An identical material from a previous import is reused as-is
+            if isNew:
+                self.__setup_bi(mat, col)
 
             self.__set(code, mat)
             return self.get(code)
@@ -152,8 +293,8 @@ class Materials:
                 return None
 
             # We have a direct color on our hands
-            Console.log("Direct color {0} found".format(code))
-            mat = getCyclesBase("Mat_{0}".format(code), col["value"], 1.0)
+            Console.debug("Direct color {0} found".format(code))
+            mat = self.__make_cycles(code, getCyclesBase, col["value"], 1.0)
 
             # Add it to the material list to avoid duplicate processing
             self.__set(code, mat)
@@ -163,33 +304,36 @@ class Materials:
         else:
             col = self.__ld_colors.get(code)
 
-            if col["name"] == "Milky_White":
-                mat = getCyclesMilkyWhite("Mat_{0}".format(code), col["value"])
+            if col.name == "Milky_White":
+                mat = self.__make_cycles(code, getCyclesMilkyWhite,
+                                         col.value)
 
-            elif col["material"] == "BASIC" and col["luminance"] == 0:
-                mat = getCyclesBase("Mat_{0}".format(code),
-                                    col["value"], col["alpha"])
+            elif col.material == "BASIC" and col.luminance == 0:
+                mat = self.__make_cycles(code, getCyclesBase,
+                                         col.value, col.alpha)
 
-            elif col["luminance"] > 0:
-                mat = getCyclesEmit("Mat_{0}".format(code), col["value"],
-                                    col["alpha"], col["luminance"])
+            elif col.luminance > 0:
+                mat = self.__make_cycles(code, getCyclesEmit, col.value,
+                                         col.alpha, col.luminance)
 
-            elif col["material"] == "CHROME":
-                mat = getCyclesChrome("Mat_{0}".format(code), col["value"])
+            elif col.material == "CHROME":
+                mat = self.__make_cycles(code, getCyclesChrome, col.value)
 
-            elif col["material"] == "PEARLESCENT":
-                mat = getCyclesPearlMetal("Mat_{0}".format(code), col["value"])
+            elif col.material == "PEARLESCENT":
+                mat = self.__make_cycles(code, getCyclesPearlMetal,
+                                         col.value)
 
-            elif col["material"] == "METAL":
-                mat = getCyclesPearlMetal("Mat_{0}".format(code), col["value"])
+            elif col.material == "METAL":
+                mat = self.__make_cycles(code, getCyclesPearlMetal,
+                                         col.value)
 
-            elif col["material"] == "RUBBER":
-                mat = getCyclesRubber("Mat_{0}".format(code),
-                                      col["value"], col["alpha"])
+            elif col.material == "RUBBER":
+                mat = self.__make_cycles(code, getCyclesRubber,
+                                         col.value, col.alpha)
 
             else:
-                mat = getCyclesBase("Mat_{0}".format(code),
-                                    col["value"], col["alpha"])
+                mat = self.__make_cycles(code, getCyclesBase,
+                                         col.value, col.alpha)
 
             self.__set(code, mat)
             return self.get(code)
@@ -223,6 +367,7 @@ def getCyclesBase(name, diffColor, alpha):
         node = nodes.new('ShaderNodeBsdfDiffuse')
         node.location = -242, 154
         node.inputs['Color'].default_value = diffColor + (1.0,)
+        node.name = "LDR Color"
         node.inputs['Roughness'].default_value = 0.0
 
     # Transparent bricks
@@ -231,6 +376,7 @@ def getCyclesBase(name, diffColor, alpha):
         node = nodes.new('ShaderNodeBsdfGlass')
         node.location = -242, 154
         node.inputs['Color'].default_value = diffColor + (1.0,)
+        node.name = "LDR Color"
         node.inputs['Roughness'].default_value = 0.05
         node.inputs['IOR'].default_value = 1.46
 
@@ -273,6 +419,7 @@ def getCyclesEmit(name, diff_color, alpha, luminance):
     trans = nodes.new('ShaderNodeBsdfTranslucent')
     trans.location = -242, 154
     trans.inputs['Color'].default_value = diff_color + (1.0,)
+    trans.name = "LDR Color"
 
     emit = nodes.new('ShaderNodeEmission')
     emit.location = -242, -23
@@ -308,6 +455,7 @@ def getCyclesChrome(name, diffColor):
     glossOne.location = -242, 154
     glossOne.distribution = 'GGX'
     glossOne.inputs['Color'].default_value = diffColor + (1.0,)
+    glossOne.name = "LDR Color"
     glossOne.inputs['Roughness'].default_value = 0.03
 
     glossTwo = nodes.new('ShaderNodeBsdfGlossy')
@@ -346,11 +494,13 @@ def getCyclesPearlMetal(name, diffColor):
     gloss.location = -242, 154
     gloss.distribution = 'BECKMANN'
     gloss.inputs['Color'].default_value = diffColor + (1.0,)
+    gloss.name = "LDR Color"
     gloss.inputs['Roughness'].default_value = 0.05
 
     diffuse = nodes.new('ShaderNodeBsdfDiffuse')
     diffuse.location = -242, -23
     diffuse.inputs['Color'].default_value = diffColor + (1.0,)
+    diffuse.name = "LDR Color 2"
     diffuse.inputs['Roughness'].default_value = 0.0
 
     links.new(mix.outputs[0], out.inputs[0])
@@ -385,11 +535,13 @@ def getCyclesRubber(name, diffColor, alpha):
         diffuse = nodes.new('ShaderNodeBsdfDiffuse')
         diffuse.location = -242, 154
         diffuse.inputs['Color'].default_value = diffColor + (1.0,)
+        diffuse.name = "LDR Color"
         diffuse.inputs['Roughness'].default_value = 0
 
         trans = nodes.new('ShaderNodeBsdfTranslucent')
         trans.location = -242, 154
         trans.inputs['Color'].default_value = diffColor + (1.0,)
+        trans.name = "LDR Color 2"
 
         mixOne = nodes.new('ShaderNodeMixShader')
         mixOne.location = 0, 90
@@ -399,6 +551,7 @@ def getCyclesRubber(name, diffColor, alpha):
         gloss.location = -242, 154
         gloss.distribution = 'BECKMANN'
         gloss.inputs['Color'].default_value = diffColor + (1.0,)
+        gloss.name = "LDR Color 3"
         gloss.inputs['Roughness'].default_value = 0.2
 
         links.new(diffuse.outputs[0], mixOne.inputs[1])
@@ -412,6 +565,7 @@ def getCyclesRubber(name, diffColor, alpha):
         glass.location = -242, 154
         glass.distribution = 'BECKMANN'
         glass.inputs['Color'].default_value = diffColor + (1.0,)
+        glass.name = "LDR Color"
         glass.inputs['Roughness'].default_value = 0.4
         glass.inputs['IOR'].default_value = 1.160
 
@@ -450,10 +604,12 @@ def getCyclesMilkyWhite(name, diff_color):
     trans = nodes.new('ShaderNodeBsdfTranslucent')
     trans.location = -242, 154
     trans.inputs['Color'].default_value = diff_color + (1.0,)
+    trans.name = "LDR Color"
 
     diff = nodes.new('ShaderNodeBsdfDiffuse')
     diff.location = -242, -23
     diff.inputs['Color'].default_value = diff_color + (1.0,)
+    diff.name = "LDR Color 2"
     diff.inputs['Roughness'].default_value = 0.1
 
     links.new(mix.outputs[0], out.inputs[0])
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+"""LDR Importer GPLv2 license.
+
+Affine transforms as 12 floats, the first three rows of a 4x4 matrix:
+
+    (a, b, c, x,
+     d, e, f, y,
+     g, h, i, z)
+
+the same values a type 1 line holds, in a different order.
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program; if not, write to the Free Software Foundation,
+Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+
+"""
+
+
+__all__ = ("IDENTITY", "fromLine", "fromRows", "toRows",
+           "determinant", "multiply", "transformPoints")
+
+
+IDENTITY = (1.0, 0.0, 0.0, 0.0,
+            0.0, 1.0, 0.0, 0.0,
+            0.0, 0.0, 1.0, 0.0)
+
+
+def fromLine(tokens):
+    """Get the placement of a type 1 line.
+
+    @param {List} tokens The tokens of the line.
+    @return {Tuple} The transform.
+    """
+    x, y, z, a, b, c, d, e, f, g, h, i = map(float, tokens[2:14])
+    return (a, b, c, x, d, e, f, y, g, h, i, z)
+
+
+def fromRows(rows):
+    """Get the transform of a 4x4 matrix, such as a mathutils Matrix.
+
+    @param {Iterable} rows The rows of the matrix.
+    @return {Tuple} The transform, without the last row.
+    """
+    rows = list(rows)
+    return tuple(float(value) for row in rows[:3] for value in row)
+
+
+def toRows(m):
+    """Get the rows of the 4x4 matrix of a transform.
+
+    @param {Tuple} m The transform.
+    @return {Tuple} The four rows.
+    """
+    return (m[0:4], m[4:8], m[8:12], (0.0, 0.0, 0.0, 1.0))
+
+
+def determinant(m):
+    """Get the determinant of the rotation and scale of a transform.
+
+    @param {Tuple} m The transform.
+    @return {Number} The determinant, negative if the transform mirrors.
+    """
+    a, b, c, _, d, e, f, _, g, h, i, _ = m
+    return a * (e * i - f * h) - b * (d * i - f * g) + c * (d * h - e * g)
+
+
+def multiply(m, n):
+    """Compose two transforms, `n` is applied first.
+
+    @param {Tuple} m The outer transform.
+    @param {Tuple} n The inner transform.
+    @return {Tuple} The transform m * n.
+    """
+    a, b, c, x, d, e, f, y, g, h, i, z = m
+    (na, nb, nc, nx, nd, ne, nf, ny, ng, nh, ni, nz) = n
+    return (
+        a * na + b * nd + c * ng,
+        a * nb + b * ne + c * nh,
+        a * nc + b * nf + c * ni,
+        a * nx + b * ny + c * nz + x,
+        d * na + e * nd + f * ng,
+        d * nb + e * ne + f * nh,
+        d * nc + e * nf + f * ni,
+        d * nx + e * ny + f * nz + y,
+        g * na + h * nd + i * ng,
+        g * nb + h * ne + i * nh,
+        g * nc + h * nf + i * ni,
+        g * nx + h * ny + i * nz + z
+    )
+
+
+def transformPoints(m, points):
+    """Transform points.
+
+    @param {Tuple} m The transform.
+    @param {Iterable} points The (x, y, z) points.
+    @return {List} The transformed points.
+    """
+    a, b, c, x, d, e, f, y, g, h, i, z = m
+    return [(a * px + b * py + c * pz + x,
+             d * px + e * py + f * pz + y,
+             g * px + h * py + i * pz + z) for px, py, pz in points]
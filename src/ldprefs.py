@@ -22,6 +22,7 @@ import os
 import json
 import platform
 
+from . import ldarchive
 from .ldconsole import Console
 
 
@@ -82,9 +83,14 @@ class Preferences:
     def __confirmLDraw(self, ldPath):
         """Confirm an LDraw installation exists at the given location.
 
+        The installation may be a folder or the complete.zip distribution.
+
         @param {String} ldPath The path to confirm an LDraw installation.
         @return {Boolean} True if an installation exists, False otherwise.
         """
+        if ldarchive.isArchive(ldPath):
+            return ldarchive.getArchive(ldPath).exists(
+                os.path.join(ldPath, "LDConfig.ldr"))
         return os.path.isfile(os.path.join(ldPath, "LDConfig.ldr"))
 
     def __findLDraw(self):
@@ -148,6 +154,13 @@ class Preferences:
             return options[opt]
         return default
 
+    def getCacheDir(self):
+        """Retrieve the folder where import caches are stored.
+
+        @return {String} The cache folder.
+        """
+        return os.path.join(self.__prefsPath, "cache")
+
     def getLDraw(self):
         """Retrieve the LDraw installation.
 
@@ -168,16 +181,16 @@ class Preferences:
             if type(v) == float:
                 importOpts[k] = round(v, 2)
 
-        # Update the in-memory preferences
-        if self.__prefsData is not None:
-            self.__prefsData["importOpts"] = importOpts
-
         prefs = {
             "importOpts": importOpts,
             "ldPath": self.__ldPath,
             "platform": self.__curPlatform
         }
 
+        # Nothing changed since the preferences were last read or written
+        if prefs == self.__prefsData:
+            return True
+
         # Create the preferences folder if it does not exist
         if not os.path.exists(self.__prefsPath):
             os.makedirs(self.__prefsPath)
@@ -185,6 +198,7 @@ class Preferences:
         try:
             with open(self.__prefsFile, "wt", encoding="utf_8") as f:
                 f.write(json.dumps(prefs, sort_keys=True))
+            self.__prefsData = prefs
             Console.log("Preferences saved to\n{0}".format(self.__prefsFile))
             return True
 
@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+"""LDR Importer GPLv2 license.
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program; if not, write to the Free Software Foundation,
+Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+
+"""
+
+
+# NumPy ships with Blender since 2.70, but is optional for the add-on.
+# It is imported the first time a scene is saved or loaded
+numpy = None
+
+
+__all__ = ("SCENE_EXT", "SceneData")
+
+
+# The extension of flattened scene files
+SCENE_EXT = ".ldscene.npz"
+
+# Increase when the layout of the arrays changes
+_formatVersion = 1
+
+
+def _importNumpy():
+    """Import NumPy on first use.
+
+    @return {Boolean} True if NumPy is installed.
+    """
+    global numpy
+    if numpy is None:
+        try:
+            import numpy as module
+        except ImportError:  # pragma: no cover
+            return False
+        numpy = module
+    return True
+
+
+class SceneData:
+    """The flattened result of an import.
+
+    Each unique part geometry is stored once in part space,
+    the instance table places it with a color and a 4x4 matrix.
+    """
+
+    def __init__(self):
+        """Instance the class."""
+        # Each geometry is (name, points, faces, color codes)
+        self.geometries = []
+        # Each instance is (geometry index, color code, 4x4 matrix rows)
+        self.instances = []
+        # The index of each geometry by the key it was stored with
+        self.__keys = {}
+
+    @staticmethod
+    def isAvailable():
+        """Check if flattened scenes can be saved and loaded.
+
+        @return {Boolean} True if NumPy is installed.
+        """
+        return _importNumpy()
+
+    def hasGeometry(self, key):
+        """Check if a geometry was already stored.
+
+        @param {Object} key The key the geometry was stored with.
+        @return {Boolean} True if it was stored.
+        """
+        return key in self.__keys
+
+    def addGeometry(self, key, name, points, faces, codes):
+        """Store the geometry shared by instances.
+
+        @param {Object} key Identifies the geometry, such as
+                            the object holding it.
+        @param {String} name The part name.
+        @param {List} points The points in part space.
+        @param {List} faces The point indices of each face.
+        @param {List} codes The color code of each face, 16 if inherited.
+        """
+        self.__keys[key] = len(self.geometries)
+        self.geometries.append((name, points, faces, codes))
+
+    def add(self, key, color, matrix):
+        """Add an instance of a stored geometry.
+
+        @param {Object} key The key the geometry was stored with.
+        @param {String} color The color code of the instance.
+        @param {Iterable} matrix The rows of the 4x4 placement matrix.
+        @return {Number} The index of the instance.
+        """
+        self.instances.append((self.__keys[key], color or "16",
+                               [list(row) for row in matrix]))
+        return len(self.instances) - 1
+
+    def save(self, filepath):
+        """Write the scene as a compressed NumPy archive.
+
+        @param {String} filepath The file to write.
+        """
+        _importNumpy()
+        colors = sorted({code for geometry in self.geometries
+                         for code in geometry[3]} |
+                        {instance[1] for instance in self.instances})
+        colorIndex = {code: i for i, code in enumerate(colors)}
+
+        points, faceSizes, faceVerts, faceColors = [], [], [], []
+        geomRanges = []
+        for name, geomPoints, faces, codes in self.geometries:
+            geomRanges.append((len(points), len(faceSizes)))
+            points.extend(geomPoints)
+            for face in faces:
+                faceSizes.append(len(face))
+                faceVerts.extend(face)
+            faceColors.extend(colorIndex[code] for code in codes)
+        geomRanges.append((len(points), len(faceSizes)))
+
+        numpy.savez_compressed(
+            filepath,
+            version=numpy.array(_formatVersion),
+            colors=numpy.array(colors, dtype=str),
+            geomNames=numpy.array([g[0] for g in self.geometries], dtype=str),
+            geomRanges=numpy.array(geomRanges, dtype=numpy.int64),
+            points=numpy.array(points, dtype=numpy.float64).reshape(-1, 3),
+            faceSizes=numpy.array(faceSizes, dtype=numpy.uint8),
+            faceVerts=numpy.array(faceVerts, dtype=numpy.int32),
+            faceColors=numpy.array(faceColors, dtype=numpy.int32),
+            instGeoms=numpy.array([i[0] for i in self.instances],
+                                  dtype=numpy.int32),
+            instColors=numpy.array([colorIndex[i[1]]
+                                    for i in self.instances],
+                                   dtype=numpy.int32),
+            instMatrices=numpy.array([i[2] for i in self.instances],
+                                     dtype=numpy.float64).reshape(-1, 4, 4)
+        )
+
+    @staticmethod
+    def load(filepath):
+        """Read a scene written by `save`.
+
+        @param {String} filepath The file to read.
+        @return {SceneData} The scene.
+        @throws {ValueError} The file was written by an
+                             incompatible version.
+        """
+        _importNumpy()
+        with numpy.load(filepath) as data:
+            if int(data["version"]) != _formatVersion:
+                raise ValueError("Unsupported scene version {0}".format(
+                                 int(data["version"])))
+
+            colors = data["colors"].tolist()
+            names = data["geomNames"].tolist()
+            ranges = data["geomRanges"]
+            points = data["points"]
+            faceSizes = data["faceSizes"].tolist()
+            faceVerts = data["faceVerts"].tolist()
+            faceColors = data["faceColors"].tolist()
+
+            # Where the indices of each face start
+            faceStarts = [0]
+            for size in faceSizes:
+                faceStarts.append(faceStarts[-1] + size)
+
+            scene = SceneData()
+            for i, name in enumerate(names):
+                pointStart, faceStart = ranges[i]
+                pointEnd, faceEnd = ranges[i + 1]
+                faces = [[v - pointStart for v in
+                          faceVerts[faceStarts[f]:faceStarts[f + 1]]]
+                         for f in range(faceStart, faceEnd)]
+                codes = [colors[c] for c in faceColors[faceStart:faceEnd]]
+                scene.geometries.append((name, points[pointStart:pointEnd],
+                                         faces, codes))
+
+            scene.instances = [
+                (geom, colors[color], matrix) for geom, color, matrix in
+                zip(data["instGeoms"].tolist(), data["instColors"].tolist(),
+                    data["instMatrices"])
+            ]
+        return scene
+
+    def iterInstances(self, toWorld=None):
+        """Place each instance.
+
+        Inherited faces take the color of their instance.
+
+        @param {!Iterable} toWorld The rows of a 4x4 matrix
+                                   applied after each placement.
+        @return {Generator} The name, placed points, faces
+                            and color codes of each instance.
+        """
+        _importNumpy()
+        toWorld = numpy.asarray(toWorld if toWorld is not None
+                                else numpy.identity(4), dtype=numpy.float64)
+        for geom, color, matrix in self.instances:
+            name, points, faces, codes = self.geometries[geom]
+            matrix = toWorld.dot(numpy.asarray(matrix, dtype=numpy.float64))
+            placed = (numpy.asarray(points, dtype=numpy.float64).dot(
+                      matrix[:3, :3].T) + matrix[:3, 3])
+            yield (name, placed.tolist(), faces,
+                   [color if code == "16" else code for code in codes])
@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+"""LDR Importer GPLv2 license.
+
+Hand flattened meshes from worker processes to Blender in shared memory.
+
+A worker writes the arrays of a mesh into one shared memory block and
+sends only its small, picklable descriptor. Blender's process attaches
+to the block and passes the arrays straight to `foreach_set`, without
+unpickling or copying them first.
+
+The block holds, one after another, 4-byte values in native order:
+
+    vertex coordinates    float32, three per vertex
+    loop vertex indices   int32, one per face corner
+    face loop starts      int32, one per face
+    face loop totals      int32, one per face
+    face color indices    int32, one per face, into the color codes
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program; if not, write to the Free Software Foundation,
+Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+
+"""
+
+
+import os
+import itertools
+from array import array
+
+# Shared memory blocks were added in Python 3.8, newer than the
+# Python of Blender 2.7x, so they are optional for the add-on
+try:
+    from multiprocessing import shared_memory
+except ImportError:  # pragma: no cover
+    shared_memory = None
+
+
+__all__ = ("SharedMesh", "isAvailable", "prepare")
+
+
+def isAvailable():
+    """Check if meshes can be shared between processes.
+
+    @return {Boolean} True if shared memory blocks are supported.
+    """
+    return shared_memory is not None
+
+
+def prepare():
+    """Get ready to share meshes, before starting the worker processes.
+
+    The workers then use the resource tracker of this process, so blocks
+    created by a worker and unlinked here are not reported as leaked.
+    """
+    if os.name == "posix":
+        from multiprocessing import resource_tracker
+        resource_tracker.ensure_running()
+
+
+class SharedMesh:
+    """The arrays of one mesh in a shared memory block.
+
+    The process that creates a mesh closes it once the building process
+    has attached to it, which then closes and unlinks it when the mesh
+    is built. On Windows the block is gone as soon as no process has it
+    open, so it must not be closed before that.
+    """
+
+    def __init__(self, block, descriptor):
+        """Instance the class, see `create` and `attach`.
+
+        @param {SharedMemory} block The shared memory block.
+        @param {Tuple} descriptor The layout of the block.
+        """
+        self.__block = block
+        self.__descriptor = descriptor
+        (_, self.name, self.vertexCount, self.loopCount, self.faceCount,
+         self.codes, self.bounds, self.certified) = descriptor
+
+    @classmethod
+    def create(cls, name, points, faces, codes, certified=False):
+        """Write a mesh into a new block.
+
+        @param {String} name The object name.
+        @param {List} points The (x, y, z) points, at least one.
+        @param {List} faces The point indices of each face.
+        @param {List} codes The color code of each face, None if it has
+                            no color.
+        @param {Boolean} certified True if the faces are wound
+                                   consistently.
+        @return {SharedMesh} The mesh, its `descriptor` is sent to
+                             the process building it.
+        """
+        colors = []
+        colorIndex = {}
+        faceColors = array("i")
+        for code in codes:
+            index = colorIndex.get(code)
+            if index is None:
+                index = colorIndex[code] = len(colors)
+                colors.append(code)
+            faceColors.append(index)
+
+        coords = array("f", itertools.chain.from_iterable(points))
+        loopVerts = array("i", itertools.chain.from_iterable(faces))
+        loopTotals = array("i", map(len, faces))
+        loopStarts = array("i", itertools.accumulate(
+            itertools.chain((0,), loopTotals[:-1])))
+
+        xs, ys, zs = coords[0::3], coords[1::3], coords[2::3]
+        bounds = (min(xs), min(ys), min(zs), max(xs), max(ys), max(zs))
+
+        arrays = (coords, loopVerts, loopStarts, loopTotals, faceColors)
+        size = sum(len(values) for values in arrays) * 4
+        block = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        offset = 0
+        for values in arrays:
+            end = offset + len(values) * 4
+            block.buf[offset:end] = memoryview(values).cast("B")
+            offset = end
+
+        return cls(block, (block.name, name, len(points), len(loopVerts),
+                           len(faces), tuple(colors), bounds,
+                           bool(certified)))
+
+    @classmethod
+    def attach(cls, descriptor):
+        """Open a mesh written by another process.
+
+        @param {Tuple} descriptor The `descriptor` of the mesh.
+        @return {SharedMesh} The mesh.
+        """
+        return cls(shared_memory.SharedMemory(name=descriptor[0]),
+                   descriptor)
+
+    @property
+    def descriptor(self):
+        """The block name and layout, small enough to pickle cheaply."""
+        return self.__descriptor
+
+    def __view(self, start, count, fmt):
+        """Get an array of the block without copying it.
+
+        @param {Number} start The index of its first 4-byte value.
+        @param {Number} count The number of values.
+        @param {String} fmt The value type, "f" or "i".
+        @return {memoryview} The values.
+        """
+        return self.__block.buf[start * 4:(start + count) * 4].cast(fmt)
+
+    @property
+    def coords(self):
+        """The vertex coordinates, flattened."""
+        return self.__view(0, self.vertexCount * 3, "f")
+
+    @property
+    def loopVerts(self):
+        """The vertex index of each face corner."""
+        return self.__view(self.vertexCount * 3, self.loopCount, "i")
+
+    @property
+    def loopStarts(self):
+        """The first face corner of each face."""
+        return self.__view(self.vertexCount * 3 + self.loopCount,
+                           self.faceCount, "i")
+
+    @property
+    def loopTotals(self):
+        """The number of corners of each face."""
+        return self.__view(self.vertexCount * 3 + self.loopCount +
+                           self.faceCount, self.faceCount, "i")
+
+    @property
+    def faceColors(self):
+        """The index in `codes` of each face's color."""
+        return self.__view(self.vertexCount * 3 + self.loopCount +
+                           2 * self.faceCount, self.faceCount, "i")
+
+    def close(self):
+        """Stop using the block, every view must be released first."""
+        self.__block.close()
+
+    def unlink(self):
+        """Free the block once every process closed it."""
+        self.__block.unlink()
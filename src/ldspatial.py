@@ -0,0 +1,250 @@
+# -*- coding: utf-8 -*-
+"""LDR Importer GPLv2 license.
+
+Bounding boxes of the imported parts and a uniform grid to find them.
+
+Boxes are (minX, minY, minZ, maxX, maxY, maxZ) tuples. Each part keeps
+its box in mesh space, as its object's `dimensions` would report it,
+and the box of its corners placed in world space for the queries.
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program; if not, write to the Free Software Foundation,
+Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+
+"""
+
+
+import math
+import itertools
+
+from . import ldmatrix
+
+
+__all__ = ("SpatialIndex", "boundsOf", "transformBounds", "overlaps")
+
+
+def boundsOf(points):
+    """Get the box around points.
+
+    @param {List} points The (x, y, z) points, at least one.
+    @return {Tuple} The box.
+    """
+    xs, ys, zs = zip(*points)
+    return (min(xs), min(ys), min(zs), max(xs), max(ys), max(zs))
+
+
+def transformBounds(m, bounds):
+    """Get the box around a transformed box.
+
+    @param {Tuple} m The transform.
+    @param {Tuple} bounds The box.
+    @return {Tuple} The box around the eight transformed corners.
+    """
+    corners = itertools.product(*zip(bounds[:3], bounds[3:]))
+    return boundsOf(ldmatrix.transformPoints(m, corners))
+
+
+def overlaps(a, b):
+    """Check if two boxes overlap, touching boxes do.
+
+    @param {Tuple} a The first box.
+    @param {Tuple} b The second box.
+    @return {Boolean} True if they overlap.
+    """
+    return (a[0] <= b[3] and b[0] <= a[3] and a[1] <= b[4] and
+            b[1] <= a[4] and a[2] <= b[5] and b[2] <= a[5])
+
+
+class SpatialIndex:
+    """The boxes of the imported parts in a uniform grid.
+
+    The grid is built at the first query, with cells the size of an
+    average part, and kept up to date as more parts are added.
+    """
+
+    def __init__(self, cellSize=None):
+        """Instance the class.
+
+        @param {!Number} cellSize The size of a grid cell,
+                                  from the parts added if not given.
+        """
+        self.__fixedCellSize = cellSize
+        self.__cellSize = cellSize
+        self.__keys = []
+        self.__local = []
+        self.__world = []
+        self.__slots = {}
+        self.__cells = None
+
+    def __len__(self):
+        """Count the parts.
+
+        @return {Number} The number of parts added and not removed.
+        """
+        return len(self.__slots)
+
+    def __contains__(self, key):
+        """Check if a part was added.
+
+        @param {Object} key The part.
+        @return {Boolean} True if it was added and not removed.
+        """
+        return key in self.__slots
+
+    def clear(self):
+        """Remove every part, the cell size is found again if not given."""
+        self.__cellSize = self.__fixedCellSize
+        self.__keys = []
+        self.__local = []
+        self.__world = []
+        self.__slots.clear()
+        self.__cells = None
+
+    def add(self, key, bounds, m=ldmatrix.IDENTITY):
+        """Add a part.
+
+        @param {Object} key The part, such as its object.
+        @param {Tuple} bounds The box of the part in mesh space.
+        @param {Tuple} m The transform of the part to world space.
+        """
+        if key in self.__slots:
+            self.remove(key)
+
+        slot = self.__slots[key] = len(self.__keys)
+        self.__keys.append(key)
+        self.__local.append(bounds)
+        self.__world.append(bounds if m == ldmatrix.IDENTITY
+                            else transformBounds(m, bounds))
+        if self.__cells is not None:
+            self.__insert(slot)
+
+    def remove(self, key):
+        """Remove a part, if it was added.
+
+        @param {Object} key The part.
+        """
+        slot = self.__slots.pop(key, None)
+        if slot is not None:
+            # Keep the slot so the others stay valid, queries skip it
+            self.__keys[slot] = None
+            if self.__cells is not None:
+                for cell in self.__cellRange(self.__world[slot]):
+                    self.__cells[cell].remove(slot)
+
+    def bounds(self, key):
+        """Get the world space box of a part.
+
+        @param {Object} key The part.
+        @return {!Tuple} The box, None if the part was not added.
+        """
+        slot = self.__slots.get(key)
+        return None if slot is None else self.__world[slot]
+
+    def dimensions(self, key):
+        """Get the size of a part in mesh space.
+
+        @param {Object} key The part.
+        @return {!Tuple} The (x, y, z) size, None if the part was not added.
+        """
+        slot = self.__slots.get(key)
+        if slot is None:
+            return None
+        bounds = self.__local[slot]
+        return (bounds[3] - bounds[0], bounds[4] - bounds[1],
+                bounds[5] - bounds[2])
+
+    def items(self):
+        """List the parts and their world space boxes.
+
+        @return {List} The (key, box) of each part, in the order added.
+        """
+        return [(key, bounds) for key, bounds in
+                zip(self.__keys, self.__world) if key is not None]
+
+    def query(self, bounds):
+        """Find the parts whose boxes overlap a box.
+
+        @param {Tuple} bounds The world space box.
+        @return {List} The parts, in the order added.
+        """
+        if self.__cells is None:
+            self.__build()
+
+        # Boxes covering more cells than the grid has are
+        # checked against every part
+        low, high = self.__cellBounds(bounds)
+        count = ((high[0] - low[0] + 1) * (high[1] - low[1] + 1) *
+                 (high[2] - low[2] + 1))
+        if count > len(self.__cells):
+            slots = self.__slots.values()
+        else:
+            slots = set()
+            for cell in self.__cellRange(bounds):
+                slots.update(self.__cells.get(cell, ()))
+        return [self.__keys[slot] for slot in sorted(slots)
+                if overlaps(bounds, self.__world[slot])]
+
+    def neighbors(self, key, margin=0.0):
+        """Find the parts near a part.
+
+        @param {Object} key The part.
+        @param {Number} margin The distance the box of the part is grown by.
+        @return {List} The other parts whose boxes overlap the grown box.
+        """
+        bounds = self.bounds(key)
+        if bounds is None:
+            return []
+        grown = tuple(value - margin for value in bounds[:3]) + \
+            tuple(value + margin for value in bounds[3:])
+        return [other for other in self.query(grown) if other != key]
+
+    def __build(self):
+        """Sort every part into grid cells."""
+        if self.__cellSize is None:
+            sizes = [max(bounds[3] - bounds[0], bounds[4] - bounds[1],
+                         bounds[5] - bounds[2]) for key, bounds in
+                     zip(self.__keys, self.__world) if key is not None]
+            average = sum(sizes) / len(sizes) if sizes else 0.0
+            self.__cellSize = average if average > 0.0 else 1.0
+
+        self.__cells = {}
+        for slot, key in enumerate(self.__keys):
+            if key is not None:
+                self.__insert(slot)
+
+    def __insert(self, slot):
+        """Add a part to the cells its box overlaps.
+
+        @param {Number} slot The index of the part.
+        """
+        for cell in self.__cellRange(self.__world[slot]):
+            self.__cells.setdefault(cell, set()).add(slot)
+
+    def __cellRange(self, bounds):
+        """List the cells a box overlaps.
+
+        @param {Tuple} bounds The box.
+        @return {Iterator} The (x, y, z) index of each cell.
+        """
+        return itertools.product(*(range(a, b + 1) for a, b in
+                                   zip(*self.__cellBounds(bounds))))
+
+    def __cellBounds(self, bounds):
+        """Get the first and last cells a box overlaps.
+
+        @param {Tuple} bounds The box.
+        @return {Tuple} The (x, y, z) indices of both cells.
+        """
+        size = self.__cellSize
+        return ([int(math.floor(value / size)) for value in bounds[:3]],
+                [int(math.floor(value / size)) for value in bounds[3:]])
@@ -0,0 +1,335 @@
+# -*- coding: utf-8 -*-
+"""LDR Importer GPLv2 license.
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program; if not, write to the Free Software Foundation,
+Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+
+"""
+
+
+import gc
+import sys
+import json
+import time
+import types
+import tracemalloc
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from .ldconsole import Console
+
+
+__all__ = ("ImportStats", "MemoryProfile")
+
+
+# Objects shared with the rest of Python, never counted as import data
+_skipTypes = (type, types.ModuleType, types.FunctionType,
+              types.BuiltinFunctionType, types.MethodType)
+
+
+def slotValues(obj):
+    """Get the values held in the slots of an object.
+
+    @param {Object} obj The object.
+    @return {List} The values of the slots that are set.
+    """
+    values = []
+    for cls in type(obj).__mro__:
+        slots = cls.__dict__.get("__slots__", ())
+        for name in ((slots,) if isinstance(slots, str) else slots):
+            if name in ("__dict__", "__weakref__"):
+                continue
+
+            # Private slots are stored under the mangled name
+            if name.startswith("__") and not name.endswith("__"):
+                name = "_{0}{1}".format(cls.__name__.lstrip("_"), name)
+            try:
+                values.append(getattr(obj, name))
+            except AttributeError:
+                continue
+    return values
+
+
+def estimateSize(obj, limit=1000000):
+    """Estimate the memory used by an object and everything it holds.
+
+    @param {*} obj The object to measure.
+    @param {Number} limit The maximum number of objects to visit.
+    @return {Number} The approximate size in bytes.
+    """
+    seen = set()
+    pending = [obj]
+    size = 0
+    while pending and len(seen) < limit:
+        cur = pending.pop()
+        if id(cur) in seen or isinstance(cur, _skipTypes):
+            continue
+        seen.add(id(cur))
+        size += sys.getsizeof(cur)
+
+        if isinstance(cur, dict):
+            pending.extend(cur.keys())
+            pending.extend(cur.values())
+        elif isinstance(cur, (list, tuple, set, frozenset)):
+            pending.extend(cur)
+        else:
+            if hasattr(cur, "__dict__"):
+                pending.append(cur.__dict__)
+            pending.extend(slotValues(cur))
+    return size
+
+
+class MemoryProfile:
+    """Follow memory usage through the import with tracemalloc."""
+
+    def __init__(self, topSites=10):
+        """Instance the class and start tracing allocations.
+
+        @param {Number} topSites The number of allocation sites
+                                 reported for each phase.
+        """
+        self.__topSites = topSites
+        self.__ownTracing = not tracemalloc.is_tracing()
+        if self.__ownTracing:
+            tracemalloc.start()
+
+        self.__phases = OrderedDict()
+        self.__retained = OrderedDict()
+        self.__finished = False
+        self.__snapshot = self.__takeSnapshot()
+
+    def __takeSnapshot(self):
+        """Take a snapshot of the allocations made by the import.
+
+        @return {Snapshot} The snapshot, without tracemalloc's own frames.
+        """
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<unknown>")
+        ))
+
+    def checkpoint(self, name):
+        """Record the memory used since the previous checkpoint.
+
+        @param {String} name The name of the phase that just finished.
+        """
+        snapshot = self.__takeSnapshot()
+        current, peak = tracemalloc.get_traced_memory()
+
+        sites = []
+        for stat in snapshot.compare_to(self.__snapshot, "lineno")[
+                :self.__topSites]:
+            frame = stat.traceback[0]
+            sites.append({
+                "site": "{0}:{1}".format(frame.filename, frame.lineno),
+                "size_diff": stat.size_diff,
+                "count_diff": stat.count_diff
+            })
+
+        self.__phases[name] = {
+            "current": current,
+            "peak": peak,
+            "top_sites": sites
+        }
+        self.__snapshot = snapshot
+
+        # Python 3.9+ can measure the peak of each phase separately
+        if hasattr(tracemalloc, "reset_peak"):
+            tracemalloc.reset_peak()
+
+    def retained(self, name, obj):
+        """Record a structure intentionally kept alive after the import.
+
+        @param {String} name A description of the structure.
+        @param {*} obj The structure, such as a module global.
+        """
+        self.__retained[name] = estimateSize(obj)
+
+    def finish(self, types=()):
+        """Check which structures outlived the import and stop tracing.
+
+        Only the first call has any effect.
+
+        @param {Tuple} types Classes whose remaining instances are counted.
+        """
+        if self.__finished:
+            return
+        self.__finished = True
+
+        gc.collect()
+        for cls in types:
+            alive = [obj for obj in gc.get_objects() if isinstance(obj, cls)]
+            if alive:
+                self.__retained["{0} instances ({1})".format(
+                    cls.__name__, len(alive))] = estimateSize(alive)
+
+        if self.__ownTracing:
+            tracemalloc.stop()
+
+    def report(self):
+        """Summarize the memory usage of the import.
+
+        @return {Dictionary} The usage of each phase and the
+                             structures still alive after the import.
+        """
+        return {
+            "phases": self.__phases,
+            "retained": self.__retained
+        }
+
+    def log(self):
+        """Display the memory summary in the console."""
+        lines = ["Memory usage per phase"]
+        for name, phase in self.__phases.items():
+            lines.append("  {0:<20} {1:>9.1f} MiB current {2:>9.1f} MiB "
+                         "peak".format(name, phase["current"] / 1048576,
+                                       phase["peak"] / 1048576))
+            for site in phase["top_sites"][:3]:
+                lines.append("    {0:+.1f} KiB {1}".format(
+                             site["size_diff"] / 1024, site["site"]))
+
+        for name, size in self.__retained.items():
+            lines.append("  Still alive: {0} ({1:.1f} MiB)".format(
+                         name, size / 1048576))
+        Console.log("\n".join(lines))
+
+
+class ImportStats:
+    """Collect the timings and counters of a single import."""
+
+    def __init__(self, traceMemory=False):
+        """Instance the class.
+
+        @param {Boolean} traceMemory True to follow memory usage
+                                     through the import as well.
+        """
+        self.__phases = OrderedDict()
+        self.__counters = OrderedDict()
+        self.__start = time.perf_counter()
+        self.memory = MemoryProfile() if traceMemory else None
+
+    @contextmanager
+    def phase(self, name):
+        """Time a phase of the import.
+
+        Phases may be entered any number of times,
+        the time spent in each is added up.
+
+        @param {String} name The name of the phase.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def add_time(self, name, seconds):
+        """Add time spent in a phase measured by the caller.
+
+        @param {String} name The name of the phase.
+        @param {Number} seconds The time spent in the phase.
+        """
+        phase = self.__phases.get(name)
+        if phase is None:
+            phase = self.__phases[name] = [0.0, 0]
+        phase[0] += seconds
+        phase[1] += 1
+
+    def count(self, name, amount=1):
+        """Increase a counter.
+
+        @param {String} name The name of the counter.
+        @param {Number} amount The amount to add.
+        """
+        self.__counters[name] = self.__counters.get(name, 0) + amount
+
+    def checkpoint(self, name):
+        """Record the memory used by a phase if memory is followed.
+
+        @param {String} name The name of the phase that just finished.
+        """
+        if self.memory is not None:
+            self.memory.checkpoint(name)
+
+    def finish(self, types=(), globalData=None):
+        """Report what outlived the import if memory is followed.
+
+        @param {Tuple} types Classes whose remaining instances are counted.
+        @param {!Dictionary} globalData Module globals that keep
+                                        import data alive, by name.
+        """
+        if self.memory is None:
+            return
+        for name, value in (globalData or {}).items():
+            if value:
+                self.memory.retained("global {0}".format(name), value)
+        self.memory.finish(types)
+
+    def get(self, name):
+        """Get the current value of a counter.
+
+        @param {String} name The name of the counter.
+        @return {Number} The value of the counter, 0 if never increased.
+        """
+        return self.__counters.get(name, 0)
+
+    def report(self):
+        """Summarize the import.
+
+        @return {Dictionary} The total time, the time and number
+                             of calls of each phase, and all counters.
+        """
+        report = {
+            "total": round(time.perf_counter() - self.__start, 4),
+            "phases": OrderedDict(
+                (name, {"seconds": round(phase[0], 4), "calls": phase[1]})
+                for name, phase in self.__phases.items()),
+            "counters": OrderedDict(self.__counters)
+        }
+        if self.memory is not None:
+            report["memory"] = self.memory.report()
+        return report
+
+    def log(self):
+        """Display the import summary in the console."""
+        report = self.report()
+        lines = ["Import finished in {0:.3f} seconds".format(
+                 report["total"])]
+
+        for name, phase in report["phases"].items():
+            lines.append("  {0:<20} {1:>9.3f} s {2:>9} calls".format(
+                         name, phase["seconds"], phase["calls"]))
+        for name, value in report["counters"].items():
+            lines.append("  {0:<20} {1:>9}".format(name, value))
+        Console.log("\n".join(lines))
+
+        if self.memory is not None:
+            self.memory.log()
+
+    def save(self, filepath):
+        """Write the import summary as JSON.
+
+        @param {String} filepath The file to write.
+        @return {Boolean} True if the summary was written, False otherwise.
+        """
+        try:
+            with open(filepath, "wt", encoding="utf_8") as f:
+                json.dump(self.report(), f, indent=2)
+            Console.log("Import report saved to\n{0}".format(filepath))
+            return True
+
+        # Silently fail
+        except OSError:
+            return False
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""LDR Importer GPLv2 license.
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program; if not, write to the Free Software Foundation,
+Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+
+"""
+
+
+from collections import OrderedDict
+
+
+__all__ = ("Reference", "diffReferences", "sameMatrix")
+
+
+class Reference:
+    """A placed part, from a model file or an imported object."""
+
+    __slots__ = ("part", "color", "matrix", "item")
+
+    def __init__(self, part, color, matrix, item=None):
+        """Instance the class.
+
+        @param {String} part The part file name, in lowercase.
+        @param {String} color The color code of the part.
+        @param {Tuple} matrix The 16 values of the placement
+                              matrix in LDraw space, by rows.
+        @param {*} item The object or model line the reference came from.
+        """
+        self.part = part
+        self.color = color
+        self.matrix = tuple(matrix)
+        self.item = item
+
+    @property
+    def key(self):
+        """The part and color, which decide the geometry."""
+        return (self.part, self.color)
+
+
+def sameMatrix(matA, matB, tolerance=1e-4):
+    """Compare two placement matrices.
+
+    @param {Tuple} matA The values of the first matrix.
+    @param {Tuple} matB The values of the second matrix.
+    @param {Number} tolerance The largest difference of equal values.
+    @return {Boolean} True if the matrices are equal.
+    """
+    return all(abs(a - b) <= tolerance for a, b in zip(matA, matB))
+
+
+def diffReferences(old, new):
+    """Find what changed between two imports of a model.
+
+    References of the same part and color are paired, first
+    those at the same place, then the moved ones in order.
+
+    @param {List} old The references of the previous import.
+    @param {List} new The references now in the model.
+    @return {Tuple} The unchanged pairs (old, new), the moved
+                    pairs (old, new), the added new references
+                    and the removed old references.
+    """
+    pending = OrderedDict()
+    for ref in old:
+        pending.setdefault(ref.key, []).append(ref)
+
+    kept, moved, added = [], [], []
+    unmatched = []
+    for ref in new:
+        candidates = pending.get(ref.key, [])
+        for i, candidate in enumerate(candidates):
+            if sameMatrix(candidate.matrix, ref.matrix):
+                kept.append((candidates.pop(i), ref))
+                break
+        else:
+            unmatched.append(ref)
+
+    # What is left of the same part and color was moved
+    for ref in unmatched:
+        candidates = pending.get(ref.key)
+        if candidates:
+            moved.append((candidates.pop(0), ref))
+        else:
+            added.append(ref)
+
+    removed = [ref for refs in pending.values() for ref in refs]
+    return (kept, moved, added, removed)